@@ -0,0 +1,44 @@
+"""Bounded thread pool for blocking work called from async routes.
+
+Route handlers are async, so any filesystem scan, JSON parse or subprocess call
+made directly inside them stalls every other request on the event loop
+(including HLS segment proxying). Such work goes through run_blocking() instead.
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+from app.config import settings
+
+T = TypeVar("T")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Return the shared executor, creating it on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.BLOCKING_WORKERS, thread_name_prefix="kanyo-blocking"
+            )
+        return _executor
+
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run func(*args, **kwargs) on the blocking pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+
+
+def shutdown_executor() -> None:
+    """Stop the pool (called on app shutdown); a later call recreates it."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
@@ -0,0 +1,409 @@
+"""In-process index of each stream's clips/YYYY-MM-DD directories.
+
+Every clip endpoint used to list the same day directories and re-run the same
+regexes on every request. The index keeps the parsed listing of each day and
+revalidates it with a single stat() of the day directory: creating, renaming or
+deleting a file updates the directory's mtime, so an unchanged mtime means an
+unchanged listing. Files the recorder has finished are renamed into place and
+never modified afterwards, so their size and mtime are safe to keep too.
+
+When app.clip_watcher keeps a clips directory current (inotify, or periodic
+rescans as a fallback) the directory is "trusted": lookups are answered from
+memory without touching the filesystem, and the watcher applies changes.
+"""
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, replace
+from datetime import datetime, tzinfo
+from pathlib import Path
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from app.metrics import DIRECTORY_SCANS
+
+# falcon_HHMMSS_type.ext - the only files the viewer cares about
+CLIP_PATTERN = re.compile(
+    r"^falcon_(\d{6})_(arrival|departure|visit)\.(mp4|avi|mov|mkv|jpg|jpeg|png)$"
+)
+VIDEO_EXTENSIONS = frozenset({"mp4", "avi", "mov", "mkv"})
+IMAGE_EXTENSIONS = frozenset({"jpg", "jpeg", "png"})
+DAY_DIR_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+# A listing taken within this long of the directory's last change may have
+# missed a write that landed in the same filesystem timestamp tick, so it is
+# not trusted until a later stat shows the directory has settled ("racy" entry).
+RACY_WINDOW_NS = 2_000_000_000
+
+
+def clip_datetime(tz: tzinfo, date_str: str, time_str: str) -> datetime:
+    """Aware datetime for a clip's YYYY-MM-DD folder and HHMMSS filename time."""
+    date_obj = datetime.strptime(date_str, "%Y-%m-%d")
+    naive = date_obj.replace(
+        hour=int(time_str[:2]), minute=int(time_str[2:4]), second=int(time_str[4:6])
+    )
+    return tz.localize(naive) if hasattr(tz, "localize") else naive.replace(tzinfo=tz)
+
+
+def list_dates(clips_dir: Path) -> List[str]:
+    """Names of the YYYY-MM-DD directories under clips_dir, oldest first."""
+    try:
+        with os.scandir(clips_dir) as it:
+            return sorted(e.name for e in it if DAY_DIR_PATTERN.match(e.name) and e.is_dir())
+    except OSError:
+        return []
+
+
+@dataclass(frozen=True)
+class ClipEntry:
+    """One finished clip or thumbnail in a day directory."""
+
+    name: str
+    time_str: str  # HHMMSS in the stream's local time
+    clip_type: str  # arrival | departure | visit
+    ext: str
+    size: int
+    mtime_ns: int
+
+    @property
+    def is_video(self) -> bool:
+        return self.ext in VIDEO_EXTENSIONS
+
+    @property
+    def is_image(self) -> bool:
+        return self.ext in IMAGE_EXTENSIONS
+
+
+@dataclass
+class DayIndex:
+    """Parsed listing of one clips/YYYY-MM-DD directory."""
+
+    date_str: str
+    path: Path
+    dir_mtime_ns: int
+    clips: Tuple[ClipEntry, ...]
+    names: FrozenSet[str]
+    racy: bool = False
+    # ClipIndex.generation when this listing was produced; changes on every update
+    generation: int = 0
+    # events_<date>.json summary, keyed by the json file's (mtime_ns, size)
+    events_json_state: Optional[Tuple[int, int]] = None
+    events_json_has_events: bool = False
+    # Summary checked while a watcher was following the directory; the watcher
+    # clears it when the json changes, so it can be used without a stat.
+    events_json_verified: bool = False
+
+    @property
+    def events_json_name(self) -> str:
+        return f"events_{self.date_str}.json"
+
+    def of_type(self, clip_type: str) -> List[ClipEntry]:
+        return [c for c in self.clips if c.clip_type == clip_type]
+
+
+class ClipIndex:
+    """Per-stream, per-day clip listings shared by every endpoint."""
+
+    def __init__(self) -> None:
+        self._days: Dict[Tuple[str, str], DayIndex] = {}
+        self._trusted: Set[str] = set()
+        # Latest generation of any change under each clips directory
+        self._dir_generations: Dict[str, int] = {}
+        # clips_dir -> (mtime_ns, racy, dates) listing of its day directories
+        self._date_lists: Dict[str, Tuple[int, bool, List[str]]] = {}
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.scans = 0
+        self.revalidations = 0
+        self.incremental_updates = 0
+
+    def day(self, clips_dir: Path, date_str: str) -> Optional[DayIndex]:
+        """Return the listing for clips_dir/date_str, or None if the day has no directory."""
+        if str(clips_dir) in self._trusted:
+            with self._lock:
+                return self._days.get((str(clips_dir), date_str))
+        return self.refresh(clips_dir, date_str)
+
+    def refresh(self, clips_dir: Path, date_str: str) -> Optional[DayIndex]:
+        """Revalidate one day against the filesystem (one stat; relist if changed)."""
+        key = (str(clips_dir), date_str)
+        day_dir = clips_dir / date_str
+        try:
+            st = os.stat(day_dir)
+        except OSError:
+            self._store(key, None)
+            return None
+
+        with self._lock:
+            cached = self._days.get(key)
+        if cached is not None and cached.dir_mtime_ns == st.st_mtime_ns and not cached.racy:
+            with self._lock:
+                self.revalidations += 1
+            return cached
+
+        day = self.scan(clips_dir, date_str, st.st_mtime_ns)
+        if cached is not None and cached.events_json_state is not None:
+            day.events_json_state = cached.events_json_state
+            day.events_json_has_events = cached.events_json_has_events
+        self._store(key, day)
+        return day
+
+    def dates(self, clips_dir: Path) -> List[str]:
+        """Day directories under clips_dir, relisted only when clips_dir's mtime changes."""
+        prefix = str(clips_dir)
+        try:
+            mtime_ns = os.stat(clips_dir).st_mtime_ns
+        except OSError:
+            return []
+        with self._lock:
+            cached = self._date_lists.get(prefix)
+        if cached is not None and cached[0] == mtime_ns and not cached[1]:
+            return cached[2]
+        racy = time.time_ns() - mtime_ns < RACY_WINDOW_NS
+        listed = list_dates(clips_dir)
+        with self._lock:
+            self._date_lists[prefix] = (mtime_ns, racy, listed)
+        return listed
+
+    def refresh_all(
+        self, clips_dir: Path, start_date: str = "", end_date: str = "9999-12-31"
+    ) -> List[str]:
+        """Revalidate the day directories in [start_date, end_date] and drop vanished ones.
+
+        Returns every day directory under clips_dir, in or out of the range.
+        """
+        listed = self.dates(clips_dir)
+        for date_str in listed:
+            if start_date <= date_str <= end_date:
+                self.refresh(clips_dir, date_str)
+        for date_str in set(self.known_dates(clips_dir)) - set(listed):
+            self.set_day(clips_dir, date_str, None)
+        return listed
+
+    def scan(self, clips_dir: Path, date_str: str, dir_mtime_ns: Optional[int] = None) -> DayIndex:
+        """List a day directory from scratch (does not store the result)."""
+        day_dir = clips_dir / date_str
+        if dir_mtime_ns is None:
+            dir_mtime_ns = os.stat(day_dir).st_mtime_ns
+        scanned_at_ns = time.time_ns()
+        clips = []
+        names = set()
+        with os.scandir(day_dir) as it:
+            for entry in it:
+                names.add(entry.name)
+                match = CLIP_PATTERN.match(entry.name)
+                if not match:
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    continue
+                time_str, clip_type, ext = match.groups()
+                clips.append(
+                    ClipEntry(entry.name, time_str, clip_type, ext, st.st_size, st.st_mtime_ns)
+                )
+        clips.sort(key=lambda c: c.name)
+        with self._lock:
+            self.scans += 1
+        DIRECTORY_SCANS.inc()
+        return DayIndex(
+            date_str=date_str,
+            path=day_dir,
+            dir_mtime_ns=dir_mtime_ns,
+            clips=tuple(clips),
+            names=frozenset(names),
+            racy=scanned_at_ns - dir_mtime_ns < RACY_WINDOW_NS,
+        )
+
+    def _store(self, key: Tuple[str, str], day: Optional[DayIndex]) -> None:
+        with self._lock:
+            if day is None:
+                if self._days.pop(key, None) is not None:
+                    self.generation += 1
+                    self._dir_generations[key[0]] = self.generation
+                return
+            self.generation += 1
+            day.generation = self.generation
+            self._days[key] = day
+            self._dir_generations[key[0]] = self.generation
+
+    def dir_generation(self, clips_dir: Path) -> int:
+        """Generation of the most recent change to any day under clips_dir."""
+        with self._lock:
+            return self._dir_generations.get(str(clips_dir), 0)
+
+    def days(self, clips_dir: Path) -> Dict[str, DayIndex]:
+        """Every indexed day under clips_dir, by date."""
+        prefix = str(clips_dir)
+        with self._lock:
+            return {date: day for (root, date), day in self._days.items() if root == prefix}
+
+    def last_modified_ns(self, clips_dir: Path, start_date: str, end_date: str) -> Optional[int]:
+        """Newest mtime (ns) of the indexed day directories and clips in [start_date, end_date]."""
+        prefix = str(clips_dir)
+        newest: Optional[int] = None
+        with self._lock:
+            for (root, date_str), day in self._days.items():
+                if root != prefix or not start_date <= date_str <= end_date:
+                    continue
+                stamp = max([day.dir_mtime_ns, *(clip.mtime_ns for clip in day.clips)])
+                if newest is None or stamp > newest:
+                    newest = stamp
+        return newest
+
+    # Incremental updates (used by app.clip_watcher)
+
+    def trust(self, clips_dir: Path, days: Optional[Dict[str, DayIndex]] = None) -> None:
+        """Answer clips_dir from memory from now on.
+
+        With days, the existing entries are replaced by that complete listing;
+        without, the current entries (e.g. just revalidated) are kept.
+        """
+        prefix = str(clips_dir)
+        with self._lock:
+            if days is not None:
+                for key in [k for k in self._days if k[0] == prefix]:
+                    del self._days[key]
+            self._trusted.add(prefix)
+            self.generation += 1
+            self._dir_generations[prefix] = self.generation
+        for date_str, day in (days or {}).items():
+            self._store((prefix, date_str), day)
+
+    def untrust(self, clips_dir: Path) -> None:
+        """Go back to stat-revalidated lookups for clips_dir."""
+        with self._lock:
+            self._trusted.discard(str(clips_dir))
+
+    def is_trusted(self, clips_dir: Path) -> bool:
+        return str(clips_dir) in self._trusted
+
+    def entries(self) -> List[Tuple[str, DayIndex]]:
+        """Every indexed (clips_dir, day), for persisting the index."""
+        with self._lock:
+            return [(root, day) for (root, _date), day in self._days.items()]
+
+    def known_dates(self, clips_dir: Path) -> List[str]:
+        prefix = str(clips_dir)
+        with self._lock:
+            return sorted(date for root, date in self._days if root == prefix)
+
+    def set_day(self, clips_dir: Path, date_str: str, day: Optional[DayIndex]) -> None:
+        self._store((str(clips_dir), date_str), day)
+
+    def add_file(self, clips_dir: Path, date_str: str, name: str) -> None:
+        """Record a file that was just closed or moved into a day directory."""
+        key = (str(clips_dir), date_str)
+        with self._lock:
+            day = self._days.get(key)
+        if day is None:
+            try:
+                self._store(key, self.scan(clips_dir, date_str))
+            except OSError:
+                pass
+            return
+
+        clips = [c for c in day.clips if c.name != name]
+        match = CLIP_PATTERN.match(name)
+        if match:
+            try:
+                st = os.stat(day.path / name)
+            except OSError:
+                return
+            time_str, clip_type, ext = match.groups()
+            clips.append(ClipEntry(name, time_str, clip_type, ext, st.st_size, st.st_mtime_ns))
+            clips.sort(key=lambda c: c.name)
+        updated = replace(day, clips=tuple(clips), names=day.names | {name})
+        if name == day.events_json_name:
+            updated.events_json_state = None
+            updated.events_json_verified = False
+        self._store(key, updated)
+        with self._lock:
+            self.incremental_updates += 1
+
+    def remove_file(self, clips_dir: Path, date_str: str, name: str) -> None:
+        """Forget a file that was deleted or moved out of a day directory."""
+        key = (str(clips_dir), date_str)
+        with self._lock:
+            day = self._days.get(key)
+        if day is None or name not in day.names:
+            return
+        updated = replace(
+            day,
+            clips=tuple(c for c in day.clips if c.name != name),
+            names=day.names - {name},
+        )
+        if name == day.events_json_name:
+            updated.events_json_state = None
+            updated.events_json_verified = False
+        self._store(key, updated)
+        with self._lock:
+            self.incremental_updates += 1
+
+    def has_recorded_events(self, clips_dir: Path, date_str: str) -> bool:
+        """Whether the day's events_<date>.json lists any arrival or departure."""
+        day = self.day(clips_dir, date_str)
+        if day is None or day.events_json_name not in day.names:
+            return False
+
+        trusted = self.is_trusted(clips_dir)
+        if trusted and day.events_json_verified:
+            return day.events_json_has_events
+
+        events_file = day.path / day.events_json_name
+        try:
+            st = os.stat(events_file)
+        except OSError:
+            return False
+        state = (st.st_mtime_ns, st.st_size)
+        if day.events_json_state != state:
+            has_events = False
+            try:
+                with open(events_file, "r") as f:
+                    events = json.load(f)
+                has_events = any(
+                    "_arrival" in e.get("thumbnail_path", "")
+                    or "_departure" in e.get("departure_clip_path", "")
+                    for e in events
+                )
+            except Exception:
+                pass
+            day.events_json_state = state
+            day.events_json_has_events = has_events
+        # The watcher resets the day whenever the json changes from here on
+        day.events_json_verified = trusted
+        return day.events_json_has_events
+
+    def forget(self, clips_dir: Optional[Path] = None) -> None:
+        """Drop cached days (and trust) for one clips directory, or everything."""
+        with self._lock:
+            self.generation += 1
+            if clips_dir is None:
+                self._days.clear()
+                self._trusted.clear()
+                self._dir_generations.clear()
+                self._date_lists.clear()
+                return
+            prefix = str(clips_dir)
+            self._trusted.discard(prefix)
+            self._dir_generations[prefix] = self.generation
+            self._date_lists.pop(prefix, None)
+            for key in [k for k in self._days if k[0] == prefix]:
+                del self._days[key]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "days": len(self._days),
+                "trusted_dirs": len(self._trusted),
+                "generation": self.generation,
+                "scans": self.scans,
+                "revalidations": self.revalidations,
+                "incremental_updates": self.incremental_updates,
+            }
+
+
+clip_index = ClipIndex()
@@ -0,0 +1,380 @@
+"""Keep the clip index current from filesystem change notifications.
+
+The recorder writes each clip under a temporary name and renames it into place
+once the file is closed. On Linux the watcher subscribes to those events with
+inotify (through ctypes, no extra dependency) on every clips/ directory and
+every clips/YYYY-MM-DD directory, and applies them to app.clip_index as they
+arrive. Watched directories are marked trusted in the index, so request
+handlers answer from memory without stat()ing anything.
+
+A clips directory that doesn't exist yet (a stream that hasn't recorded
+anything) is checked for again every CLIP_RESCAN_SECONDS and followed once it
+appears.
+
+Where inotify is unavailable (other platforms, fs.inotify.max_user_watches
+exhausted, network filesystems that don't deliver events) the clips directory
+is rescanned periodically instead and still trusted; new files then appear
+within CLIP_RESCAN_SECONDS rather than immediately.
+"""
+import asyncio
+import ctypes
+import ctypes.util
+import logging
+import os
+import struct
+import threading
+from collections import deque
+from contextlib import suppress
+from pathlib import Path
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.blocking import run_blocking
+from app.clip_index import DAY_DIR_PATTERN, ClipIndex, clip_index, list_dates
+
+logger = logging.getLogger(__name__)
+
+# <linux/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+# clips/: day directories appearing and disappearing
+CLIPS_DIR_MASK = IN_CREATE | IN_MOVED_TO | IN_DELETE | IN_MOVED_FROM | IN_ONLYDIR
+# clips/YYYY-MM-DD/: finished files. IN_CREATE is deliberately absent - a file
+# is only indexed once it has been closed or renamed into place.
+DAY_DIR_MASK = (
+    IN_CLOSE_WRITE
+    | IN_MOVED_TO
+    | IN_DELETE
+    | IN_MOVED_FROM
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+    | IN_ONLYDIR
+)
+
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+_READ_SIZE = 64 * 1024
+PARTIAL_SUFFIXES = (".tmp", ".part")
+
+
+class Inotify:
+    """Minimal non-blocking inotify instance."""
+
+    def __init__(self) -> None:
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self.fd = fd
+
+    def add_watch(self, path: Path, mask: int) -> int:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(str(path)), ctypes.c_uint32(mask))
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), str(path))
+        return wd
+
+    def rm_watch(self, wd: int) -> None:
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read_events(self) -> List[Tuple[int, int, str]]:
+        """Drain pending events as (wd, mask, name) tuples."""
+        events: List[Tuple[int, int, str]] = []
+        while True:
+            try:
+                buf = os.read(self.fd, _READ_SIZE)
+            except BlockingIOError:
+                return events
+            if not buf:
+                return events
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(buf):
+                wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(buf, offset)
+                offset += _EVENT_HEADER.size
+                name = buf[offset : offset + length].split(b"\0", 1)[0]
+                offset += length
+                events.append((wd, mask, os.fsdecode(name)))
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def _is_partial(name: str) -> bool:
+    return name.endswith(PARTIAL_SUFFIXES) or name.startswith(".")
+
+
+class ClipWatcher:
+    """Applies filesystem changes under each stream's clips/ directory to a ClipIndex."""
+
+    def __init__(self, index: ClipIndex = clip_index, rescan_seconds: float = 30.0):
+        self.index = index
+        self.rescan_seconds = rescan_seconds
+        self.watched: Set[Path] = set()
+        self.polled: Set[Path] = set()
+        # Clips directories that don't exist yet, retried by the rescan loop
+        self.missing: Set[Path] = set()
+        self.events = 0
+        self.overflows = 0
+        self.rescans = 0
+        self._inotify: Optional[Inotify] = None
+        # wd -> (clips_dir, date_str or None for the clips dir itself)
+        self._targets: Dict[int, Tuple[Path, Optional[str]]] = {}
+        self._wds: Dict[Tuple[Path, Optional[str]], int] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._rescan_task: Optional["asyncio.Task[None]"] = None
+        self._resync_task: Optional["asyncio.Task[None]"] = None
+        # Events read from inotify, applied in order on the blocking pool
+        self._pending: Deque[Tuple[int, int, str]] = deque()
+        self._apply_task: Optional["asyncio.Task[None]"] = None
+
+    async def start(self, clips_dirs: Iterable[Path]) -> None:
+        """Index every clips directory and start following changes."""
+        self._loop = asyncio.get_running_loop()
+        try:
+            self._inotify = Inotify()
+        except (OSError, AttributeError) as exc:
+            logger.info(
+                "inotify unavailable (%s); rescanning clips every %ss", exc, self.rescan_seconds
+            )
+
+        for clips_dir in clips_dirs:
+            await self.add(clips_dir)
+
+        # Events queued during the initial scans are applied now; applying one
+        # the scan already saw is harmless.
+        if self._inotify is not None:
+            self._loop.add_reader(self._inotify.fd, self._on_readable)
+            self._on_readable()
+        self._rescan_task = asyncio.create_task(self._rescan_loop())
+
+    async def stop(self) -> None:
+        for task in (self._rescan_task, self._resync_task, self._apply_task):
+            if task is not None:
+                task.cancel()
+                with suppress(asyncio.CancelledError):
+                    await task
+        if self._inotify is not None:
+            if self._loop is not None:
+                self._loop.remove_reader(self._inotify.fd)
+            self._inotify.close()
+            self._inotify = None
+        for clips_dir in self.watched | self.polled:
+            self.index.untrust(clips_dir)
+        self.watched.clear()
+        self.polled.clear()
+        self.missing.clear()
+        self._targets.clear()
+        self._wds.clear()
+        self._pending.clear()
+
+    async def add(self, clips_dir: Path) -> None:
+        """Start following a clips directory (a stream was added), or wait for it to exist."""
+        if clips_dir in self.watched or clips_dir in self.polled:
+            return
+        if not await run_blocking(clips_dir.is_dir):
+            self.missing.add(clips_dir)
+            return
+        self.missing.discard(clips_dir)
+        await run_blocking(self._attach, clips_dir)
+
+    def remove(self, clips_dir: Path) -> None:
+        """Stop following a clips directory and drop its index entries."""
+        if self._inotify is not None:
+            self._unwatch_all(clips_dir)
+        self.watched.discard(clips_dir)
+        self.polled.discard(clips_dir)
+        self.missing.discard(clips_dir)
+        self.index.forget(clips_dir)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "watched_dirs": len(self.watched),
+            "polled_dirs": len(self.polled),
+            "missing_dirs": len(self.missing),
+            "watches": len(self._targets),
+            "events": self.events,
+            "overflows": self.overflows,
+            "rescans": self.rescans,
+        }
+
+    # Setup and resynchronisation (blocking; run on the blocking pool)
+
+    def _attach(self, clips_dir: Path) -> None:
+        if self._inotify is not None:
+            try:
+                self._watch(clips_dir, None)
+                for date_str in list_dates(clips_dir):
+                    self._watch(clips_dir, date_str)
+                self.watched.add(clips_dir)
+            except OSError as exc:
+                logger.warning("Cannot watch %s (%s); falling back to rescans", clips_dir, exc)
+                self._unwatch_all(clips_dir)
+                self.polled.add(clips_dir)
+        else:
+            self.polled.add(clips_dir)
+
+        # Days loaded from a snapshot are kept if their directory is unchanged
+        self.index.refresh_all(clips_dir)
+        self.index.trust(clips_dir)
+
+    def _sync(self, clips_dir: Path) -> None:
+        """Bring clips_dir's index entries up to date by stat and rescan."""
+        with self._lock:
+            self.rescans += 1
+        if clips_dir in self.watched:
+            for date_str in list_dates(clips_dir):
+                if (clips_dir, date_str) not in self._wds:
+                    with suppress(OSError):
+                        self._watch(clips_dir, date_str)
+        self.index.refresh_all(clips_dir)
+
+    def _watch(self, clips_dir: Path, date_str: Optional[str]) -> None:
+        path = clips_dir / date_str if date_str else clips_dir
+        mask = DAY_DIR_MASK if date_str else CLIPS_DIR_MASK
+        inotify = self._inotify
+        if inotify is None:
+            raise OSError(f"Not watching {path}: the watcher was stopped")
+        wd = inotify.add_watch(path, mask)
+        with self._lock:
+            self._targets[wd] = (clips_dir, date_str)
+            self._wds[(clips_dir, date_str)] = wd
+
+    def _unwatch_all(self, clips_dir: Path) -> None:
+        with self._lock:
+            for key in [k for k in self._wds if k[0] == clips_dir]:
+                wd = self._wds.pop(key)
+                self._targets.pop(wd, None)
+                if self._inotify is not None:
+                    with suppress(OSError):
+                        self._inotify.rm_watch(wd)
+
+    async def _rescan_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.rescan_seconds)
+            for clips_dir in list(self.missing):
+                try:
+                    await self.add(clips_dir)
+                except Exception:
+                    logger.exception("Cannot follow %s", clips_dir)
+            for clips_dir in list(self.polled):
+                try:
+                    await run_blocking(self._sync, clips_dir)
+                except Exception:
+                    logger.exception("Rescan of %s failed", clips_dir)
+
+    async def _resync_watched(self) -> None:
+        """Recover from a dropped event queue: pause events, rescan, resume."""
+        loop, inotify = self._loop, self._inotify
+        if loop is None or inotify is None:
+            return
+        loop.remove_reader(inotify.fd)
+        try:
+            for clips_dir in list(self.watched):
+                await run_blocking(self._sync, clips_dir)
+        finally:
+            # Unless stop() closed it meanwhile
+            if self._inotify is inotify:
+                loop.add_reader(inotify.fd, self._on_readable)
+                self._on_readable()
+
+    # Event handling: read on the event loop, applied on the blocking pool, since
+    # applying an event can stat a file or list a new day directory
+
+    def _on_readable(self) -> None:
+        if self._inotify is None:
+            return
+        for wd, mask, name in self._inotify.read_events():
+            self.events += 1
+            if mask & IN_Q_OVERFLOW:
+                self.overflows += 1
+                logger.warning("inotify queue overflowed; rescanning watched clips directories")
+                if self._resync_task is None or self._resync_task.done():
+                    self._resync_task = asyncio.ensure_future(self._resync_watched())
+                return
+            self._pending.append((wd, mask, name))
+        if self._pending and (self._apply_task is None or self._apply_task.done()):
+            self._apply_task = asyncio.ensure_future(self._apply_pending())
+
+    async def _apply_pending(self) -> None:
+        """Apply queued events batch by batch, in the order they arrived."""
+        while self._pending:
+            batch = list(self._pending)
+            self._pending.clear()
+            await run_blocking(self._apply_events, batch)
+
+    def _apply_events(self, batch: List[Tuple[int, int, str]]) -> None:
+        for wd, mask, name in batch:
+            try:
+                self._handle(wd, mask, name)
+            except Exception:
+                logger.exception("Failed to apply inotify event %#x for %s", mask, name)
+
+    def _handle(self, wd: int, mask: int, name: str) -> None:
+        target = self._targets.get(wd)
+        if target is None:
+            return
+        clips_dir, date_str = target
+
+        if mask & IN_IGNORED:
+            with self._lock:
+                self._targets.pop(wd, None)
+                if self._wds.get(target) == wd:
+                    del self._wds[target]
+            return
+
+        if date_str is None:
+            # A day directory under clips/
+            if not DAY_DIR_PATTERN.match(name):
+                return
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                # Watch before listing so no file can slip in between the two
+                with suppress(OSError):
+                    self._watch(clips_dir, name)
+                with suppress(OSError):
+                    self.index.set_day(clips_dir, name, self.index.scan(clips_dir, name))
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self.index.set_day(clips_dir, name, None)
+            return
+
+        if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+            self.index.set_day(clips_dir, date_str, None)
+        elif _is_partial(name):
+            return
+        elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+            self.index.add_file(clips_dir, date_str, name)
+        elif mask & (IN_DELETE | IN_MOVED_FROM):
+            self.index.remove_file(clips_dir, date_str, name)
+
+
+_watcher: Optional[ClipWatcher] = None
+
+
+def get_clip_watcher() -> Optional[ClipWatcher]:
+    """The running watcher, if the app started one."""
+    return _watcher
+
+
+async def start_clip_watcher(clips_dirs: Iterable[Path], rescan_seconds: float) -> ClipWatcher:
+    global _watcher
+    watcher = ClipWatcher(clip_index, rescan_seconds)
+    await watcher.start(clips_dirs)
+    _watcher = watcher
+    return watcher
+
+
+async def stop_clip_watcher() -> None:
+    global _watcher
+    if _watcher is not None:
+        await _watcher.stop()
+        _watcher = None
@@ -1,10 +1,31 @@
 """Configuration for Kanyo Viewer backend."""
 import os
+import threading
+import time
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 import yaml
 
 
+# A directory modified this recently may still change within its mtime tick
+_RACY_NS = 2 * 10**9
+
+
+@dataclass
+class StreamChanges:
+    """What a registry reload changed, by stream id."""
+
+    added: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    # Configs before the reload, for the removed and changed streams
+    previous: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+
 class Settings:
     """Application settings."""
 
@@ -34,7 +55,127 @@ class Settings:
         # Root directory scanned for stream subdirectories.
         # Each subdir containing config.yaml is treated as a stream.
         self.DATA_DIR: Path = Path(os.getenv("KANYO_DATA_DIR", "/data"))
+        # Writable directory for derived data (duration cache etc.).
+        # DATA_DIR is mounted read-only in production, so this lives elsewhere.
+        self.CACHE_DIR: Path = Path(os.getenv("KANYO_CACHE_DIR", "/tmp/kanyo-viewer"))
+        # Threads for blocking filesystem/subprocess work called from async routes.
+        # Kept separate from Starlette's default pool so a burst of slow yt-dlp or
+        # directory scans can't starve file serving.
+        self.BLOCKING_WORKERS: int = int(os.getenv("KANYO_BLOCKING_WORKERS", "8"))
+        # Connection pool for the shared upstream (YouTube CDN) HTTP client.
+        self.UPSTREAM_MAX_CONNECTIONS: int = int(os.getenv("KANYO_UPSTREAM_MAX_CONNECTIONS", "100"))
+        self.UPSTREAM_MAX_KEEPALIVE: int = int(os.getenv("KANYO_UPSTREAM_MAX_KEEPALIVE", "20"))
+        self.UPSTREAM_KEEPALIVE_EXPIRY: float = float(
+            os.getenv("KANYO_UPSTREAM_KEEPALIVE_EXPIRY", "60")
+        )
+        # Shared cache of proxied HLS segments (see app.segment_cache).
+        self.SEGMENT_CACHE_MAX_BYTES: int = int(
+            os.getenv("KANYO_SEGMENT_CACHE_MAX_BYTES", str(128 * 1024 * 1024))
+        )
+        self.SEGMENT_CACHE_MAX_ITEM_BYTES: int = int(
+            os.getenv("KANYO_SEGMENT_CACHE_MAX_ITEM_BYTES", str(16 * 1024 * 1024))
+        )
+        self.SEGMENT_CACHE_TTL_SECONDS: float = float(
+            os.getenv("KANYO_SEGMENT_CACHE_TTL_SECONDS", "120")
+        )
+        # Rewritten HLS playlists are shared for this fraction of their target
+        # duration (or the default when a playlist doesn't declare one).
+        self.PLAYLIST_CACHE_TTL_FRACTION: float = float(
+            os.getenv("KANYO_PLAYLIST_CACHE_TTL_FRACTION", "0.5")
+        )
+        self.PLAYLIST_CACHE_DEFAULT_TTL_SECONDS: float = float(
+            os.getenv("KANYO_PLAYLIST_CACHE_DEFAULT_TTL_SECONDS", "1.0")
+        )
+        # Follow clips directories with inotify (app.clip_watcher) so new clips are
+        # listed as soon as they are written; rescan interval where that's unavailable.
+        self.CLIP_WATCHER: bool = os.getenv("KANYO_CLIP_WATCHER", "1").lower() not in (
+            "0",
+            "false",
+            "no",
+        )
+        self.CLIP_RESCAN_SECONDS: float = float(os.getenv("KANYO_CLIP_RESCAN_SECONDS", "30"))
+        # The clip index is saved to CACHE_DIR this often (and on shutdown) so a
+        # restart starts warm; 0 saves on shutdown only.
+        self.INDEX_SNAPSHOT_SECONDS: float = float(os.getenv("KANYO_INDEX_SNAPSHOT_SECONDS", "300"))
+        # Landing-page stream cards are reused this long before being revalidated.
+        self.STREAM_SUMMARY_TTL_SECONDS: float = float(
+            os.getenv("KANYO_STREAM_SUMMARY_TTL_SECONDS", "5")
+        )
+        # Browsers reuse events/stats/calendar JSON for finished days this long
+        # without asking; retention pruning is the only thing that changes them.
+        self.PAST_DAY_MAX_AGE_SECONDS: float = float(
+            os.getenv("KANYO_PAST_DAY_MAX_AGE_SECONDS", "86400")
+        )
+        # Finished clips and thumbnails never change, so browsers and proxies may keep
+        # them this long without asking; the latest snapshot is revalidated this often.
+        self.CLIP_MAX_AGE_SECONDS: float = float(
+            os.getenv("KANYO_CLIP_MAX_AGE_SECONDS", str(365 * 24 * 60 * 60))
+        )
+        self.SNAPSHOT_MAX_AGE_SECONDS: float = float(
+            os.getenv("KANYO_SNAPSHOT_MAX_AGE_SECONDS", "30")
+        )
+        # Resized frames for the timeline and event cards (see app.thumbnails),
+        # kept under CACHE_DIR up to this many bytes.
+        self.THUMBNAIL_CACHE_MAX_BYTES: int = int(
+            os.getenv("KANYO_THUMBNAIL_CACHE_MAX_BYTES", str(256 * 1024 * 1024))
+        )
+        # Visitor timezones come from this IP range table (see app.geoip); the
+        # public geolocation APIs are only asked when it has no answer, if enabled.
+        # Not under DATA_DIR: that is the recorder's tree, mounted read-only.
+        self.GEOIP_DB: Path = Path(
+            os.getenv("KANYO_GEOIP_DB", str(self.CACHE_DIR / "ip-timezones.bin"))
+        )
+        self.VISITOR_TZ_ONLINE_FALLBACK: bool = os.getenv(
+            "KANYO_VISITOR_TZ_ONLINE_FALLBACK", "1"
+        ).lower() not in ("0", "false", "no")
+        # Online lookups (see app.timezone_lookup) are cached per /24 or /48 network
+        # (or per address), failures briefly; a provider failing this many times in
+        # a row is skipped for the cooldown.
+        self.VISITOR_TZ_TIMEOUT_SECONDS: float = float(
+            os.getenv("KANYO_VISITOR_TZ_TIMEOUT_SECONDS", "2")
+        )
+        self.VISITOR_TZ_CACHE_MAX_ENTRIES: int = int(
+            os.getenv("KANYO_VISITOR_TZ_CACHE_MAX_ENTRIES", "10000")
+        )
+        self.VISITOR_TZ_CACHE_TTL_SECONDS: float = float(
+            os.getenv("KANYO_VISITOR_TZ_CACHE_TTL_SECONDS", str(24 * 60 * 60))
+        )
+        self.VISITOR_TZ_NEGATIVE_TTL_SECONDS: float = float(
+            os.getenv("KANYO_VISITOR_TZ_NEGATIVE_TTL_SECONDS", "300")
+        )
+        self.VISITOR_TZ_CACHE_BY_PREFIX: bool = os.getenv(
+            "KANYO_VISITOR_TZ_CACHE_BY_PREFIX", "1"
+        ).lower() not in ("0", "false", "no")
+        self.VISITOR_TZ_BREAKER_FAILURES: int = int(
+            os.getenv("KANYO_VISITOR_TZ_BREAKER_FAILURES", "3")
+        )
+        self.VISITOR_TZ_BREAKER_COOLDOWN_SECONDS: float = float(
+            os.getenv("KANYO_VISITOR_TZ_BREAKER_COOLDOWN_SECONDS", "300")
+        )
+        # Opt-in event loop monitor (see app.loop_monitor): loop lag is sampled every
+        # interval, and a stall longer than the threshold logs the blocking stack.
+        self.LOOP_MONITOR: bool = os.getenv("KANYO_LOOP_MONITOR", "0").lower() not in (
+            "0",
+            "false",
+            "no",
+        )
+        self.LOOP_MONITOR_INTERVAL_SECONDS: float = float(
+            os.getenv("KANYO_LOOP_MONITOR_INTERVAL_SECONDS", "0.1")
+        )
+        self.LOOP_BLOCK_THRESHOLD_SECONDS: float = float(
+            os.getenv("KANYO_LOOP_BLOCK_THRESHOLD_SECONDS", "0.25")
+        )
+        # Stream configs are revalidated this often (by stat; see reload_streams),
+        # so streams can be added, removed or retuned without a restart. 0 disables.
+        self.STREAM_RELOAD_SECONDS: float = float(os.getenv("KANYO_STREAM_RELOAD_SECONDS", "10"))
         self._streams: Optional[Dict[str, Any]] = None
+        # (DATA_DIR, its mtime_ns, subdirectory names) from the last listing
+        self._data_dir_listing: Optional[Tuple[Path, int, List[str]]] = None
+        # config.yaml path -> (stat key or None to reparse, parsed stream)
+        self._stream_files: Dict[Path, Tuple[Optional[Tuple[int, int, int]], Dict[str, Any]]] = {}
+        self._reload_lock = threading.Lock()
+        self.stream_reloads = 0
+        self.stream_parses = 0
 
     def _load_stream_from_dir(self, stream_dir: Path) -> Dict[str, Any]:
         """Parse config.yaml from a stream directory into a stream config dict."""
@@ -58,36 +199,103 @@ class Settings:
             "youtube_id": youtube_id,
         }
 
+    def _stream_dirs(self) -> List[Path]:
+        """Subdirectories of DATA_DIR, listed again only when its mtime changes."""
+        try:
+            mtime_ns = self.DATA_DIR.stat().st_mtime_ns
+        except OSError:
+            self._data_dir_listing = None
+            return []
+        listing = self._data_dir_listing
+        if listing is None or listing[0] != self.DATA_DIR or listing[1] != mtime_ns:
+            with os.scandir(self.DATA_DIR) as it:
+                names = sorted(entry.name for entry in it if entry.is_dir())
+            listing = (self.DATA_DIR, mtime_ns, names)
+            # A listing taken within the directory's mtime tick may miss a change
+            racy = time.time_ns() - mtime_ns < _RACY_NS
+            self._data_dir_listing = None if racy else listing
+        return [self.DATA_DIR / name for name in listing[2]]
+
     def _discover_streams(self) -> Dict[str, Any]:
         """Scan DATA_DIR for subdirectories containing config.yaml.
 
         Streams are ordered by display.order (integer) when present, then
         alphabetically by directory name. This lets operators control card
         order on the landing page via config.yaml without touching the viewer.
+
+        A config.yaml is only parsed again when its stat changes; one that stops
+        parsing (e.g. mid-edit) keeps its last good config until it is fixed.
         """
         candidates = []
-        if not self.DATA_DIR.exists():
-            return {}
-        for subdir in sorted(self.DATA_DIR.iterdir()):
-            if not subdir.is_dir():
-                continue
-            if not (subdir / "config.yaml").exists():
+        files: Dict[Path, Tuple[Optional[Tuple[int, int, int]], Dict[str, Any]]] = {}
+        for subdir in self._stream_dirs():
+            path = subdir / "config.yaml"
+            try:
+                st = path.stat()
+            except OSError:
                 continue
+            key: Optional[Tuple[int, int, int]] = (st.st_mtime_ns, st.st_size, st.st_ino)
+            cached = self._stream_files.get(path)
+            if cached is not None and cached[0] == key:
+                stream = cached[1]
+            else:
+                try:
+                    stream = self._load_stream_from_dir(subdir)
+                    self.stream_parses += 1
+                except Exception:
+                    if cached is None:
+                        continue
+                    stream, key = cached[1], None
+            files[path] = (key, stream)
             try:
-                stream = self._load_stream_from_dir(subdir)
                 order = stream.get("display", {}).get("order", 999)
                 candidates.append((order, subdir.name, stream))
             except Exception:
                 continue
+        self._stream_files = files
         candidates.sort(key=lambda x: (x[0], x[1]))
         return {name: stream for _, name, stream in candidates}
 
+    def reload_streams(self) -> StreamChanges:
+        """Revalidate the stream registry against DATA_DIR (blocking).
+
+        Costs one stat of DATA_DIR and one per config.yaml; unchanged files aren't
+        reparsed. The new mapping replaces the old one in a single assignment, so
+        readers of streams see one or the other, never a mix.
+        """
+        with self._reload_lock:
+            self.stream_reloads += 1
+            old = self._streams or {}
+            new = self._discover_streams()
+            changes = StreamChanges(
+                added=[sid for sid in new if sid not in old],
+                removed=[sid for sid in old if sid not in new],
+                changed=[sid for sid in new if sid in old and new[sid] != old[sid]],
+            )
+            changes.previous = {sid: old[sid] for sid in changes.removed + changes.changed}
+            if changes or self._streams is None or list(new) != list(old):
+                self._streams = new
+            return changes
+
+    def stream_registry_stats(self) -> Dict[str, int]:
+        return {
+            "streams": len(self._streams or {}),
+            "reloads": self.stream_reloads,
+            "parses": self.stream_parses,
+        }
+
     @property
     def streams(self) -> Dict[str, Any]:
-        """All stream configs, discovered from DATA_DIR on first access."""
-        if self._streams is None:
-            self._streams = self._discover_streams()
-        return self._streams
+        """All stream configs, discovered from DATA_DIR on first access.
+
+        Kept current by reload_streams(), which the app runs in the background.
+        """
+        streams = self._streams
+        if streams is None:
+            self.reload_streams()
+            streams = self._streams
+            assert streams is not None
+        return streams
 
 
 settings = Settings()
@@ -0,0 +1,182 @@
+"""Persistent clip-duration cache.
+
+Finished clips never change once the recorder has renamed them into place, so
+a clip's duration only needs probing once. Results are stored in a small SQLite
+database under settings.CACHE_DIR keyed by (path, size, mtime), which survives
+restarts and is shared by every request.
+
+MP4 clips are measured in-process from their moov box (see app.mp4); ffprobe
+is only spawned for other containers or files the native reader can't parse.
+"""
+import sqlite3
+import subprocess
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from app.config import settings
+from app.metrics import SUBPROCESS_LATENCY, SUBPROCESS_RUNS, subprocess_outcome
+from app.mp4 import read_mp4_duration_us
+
+DB_FILENAME = "durations.sqlite3"
+
+
+class DurationCache:
+    """SQLite-backed map of clip file -> duration in seconds."""
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self.parsed = 0
+        self.probes = 0
+        self._lock = threading.Lock()
+        self._conn = self._connect(db_path)
+
+    @staticmethod
+    def _connect(db_path: Path) -> sqlite3.Connection:
+        """Open the database, falling back to memory if the cache dir is unwritable."""
+        try:
+            db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(db_path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+        except (OSError, sqlite3.Error):
+            conn = sqlite3.connect(":memory:", check_same_thread=False)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS durations ("
+            " path TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " duration REAL NOT NULL)"
+        )
+        conn.commit()
+        return conn
+
+    def lookup(self, path: Path, size: int, mtime_ns: int) -> Optional[float]:
+        """Return the cached duration if the file is unchanged since it was probed."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT duration FROM durations WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (str(path), size, mtime_ns),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def store(self, path: Path, size: int, mtime_ns: int, duration: float) -> None:
+        """Record a probed duration, replacing any entry for an older version of the file."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO durations (path, size, mtime_ns, duration)"
+                " VALUES (?, ?, ?, ?)",
+                (str(path), size, mtime_ns, duration),
+            )
+            self._conn.commit()
+
+    def get_duration(
+        self, clip_file: Path, size: Optional[int] = None, mtime_ns: Optional[int] = None
+    ) -> float:
+        """Return the duration of clip_file, probing and caching it on first sight.
+
+        Callers that already know the file's size and mtime (e.g. from the clip
+        index) can pass them to skip the stat() call.
+        """
+        if size is None or mtime_ns is None:
+            st = clip_file.stat()
+            size, mtime_ns = st.st_size, st.st_mtime_ns
+        cached = self.lookup(clip_file, size, mtime_ns)
+        if cached is not None:
+            return cached
+
+        duration: Optional[float] = None
+        if clip_file.suffix.lower() == ".mp4":
+            duration_us = read_mp4_duration_us(clip_file)
+            if duration_us is not None:
+                duration = duration_us / 1_000_000
+                with self._lock:
+                    self.parsed += 1
+
+        if duration is None:
+            with self._lock:
+                self.probes += 1
+            duration = probe_duration(clip_file)
+
+        if duration is None:
+            # Probe could not run (timeout, missing ffprobe) - estimate, don't persist
+            file_size_mb = size / (1024 * 1024)
+            return file_size_mb * 10  # Rough estimate: ~10s per MB
+
+        self.store(clip_file, size, mtime_ns, duration)
+        return duration
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for diagnostics."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM durations").fetchone()[0]
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "parsed": self.parsed,
+                "probes": self.probes,
+                "entries": entries,
+                "path": str(self.db_path),
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def probe_duration(clip_file: Path) -> Optional[float]:
+    """Run ffprobe on a clip.
+
+    Returns the duration in seconds, 0.0 if ffprobe ran but could not read the
+    file, or None if ffprobe could not be run at all.
+    """
+    try:
+        with SUBPROCESS_LATENCY.time(command="ffprobe"):
+            result = subprocess.run(
+                [
+                    "ffprobe",
+                    "-v",
+                    "error",
+                    "-show_entries",
+                    "format=duration",
+                    "-of",
+                    "default=noprint_wrappers=1:nokey=1",
+                    str(clip_file),
+                ],
+                capture_output=True,
+                text=True,
+                timeout=5,
+            )
+    except Exception as exc:
+        SUBPROCESS_RUNS.inc(command="ffprobe", outcome=subprocess_outcome(exc))
+        return None
+
+    if result.returncode != 0:
+        SUBPROCESS_RUNS.inc(command="ffprobe", outcome="error")
+        return 0.0
+    SUBPROCESS_RUNS.inc(command="ffprobe", outcome="ok")
+    try:
+        return float(result.stdout.strip())
+    except ValueError:
+        return 0.0
+
+
+_cache: Optional[DurationCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_duration_cache() -> DurationCache:
+    """Return the process-wide duration cache for the current CACHE_DIR."""
+    global _cache
+    db_path = Path(settings.CACHE_DIR) / DB_FILENAME
+    with _cache_lock:
+        if _cache is None or _cache.db_path != db_path:
+            if _cache is not None:
+                _cache.close()
+            _cache = DurationCache(db_path)
+        return _cache
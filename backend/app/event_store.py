@@ -0,0 +1,399 @@
+"""Indexed table of every clip, for queries that span many days.
+
+Stats windows, the calendar's dates-with-events, the landing page's last event
+and the snapshot lookup used to walk one day directory after another. The
+event store mirrors the clip index into a SQLite (WAL) table indexed on
+(stream_id, utc_timestamp, type), so each of those is a single range query
+regardless of how many days a season has.
+
+The table is derived data: it lives under settings.CACHE_DIR, is brought up to
+date from app.clip_index before each query (only days whose index generation
+changed are rewritten), and is rebuilt from the clip tree if the file is
+deleted. Each day's row set carries a fingerprint so that a restart only
+rewrites days that changed while the viewer was down.
+"""
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime, tzinfo
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.clip_index import DayIndex, clip_datetime, clip_index
+from app.config import settings
+
+DB_FILENAME = "events.sqlite3"
+SCHEMA_VERSION = 1
+# How often (at most) to check that the database file still exists
+EXISTS_CHECK_SECONDS = 1.0
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS clips ("
+    " stream_id TEXT NOT NULL,"
+    " date TEXT NOT NULL,"
+    " name TEXT NOT NULL,"
+    " utc_timestamp INTEGER NOT NULL,"
+    " type TEXT NOT NULL,"
+    " ext TEXT NOT NULL,"
+    " time_str TEXT NOT NULL,"
+    " PRIMARY KEY (stream_id, date, name)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS clips_by_time ON clips (stream_id, utc_timestamp, type)",
+    "CREATE TABLE IF NOT EXISTS days ("
+    " stream_id TEXT NOT NULL,"
+    " date TEXT NOT NULL,"
+    " fingerprint INTEGER NOT NULL,"
+    " has_recorded_events INTEGER NOT NULL,"
+    " PRIMARY KEY (stream_id, date)) WITHOUT ROWID",
+)
+
+
+@dataclass
+class ClipRow:
+    date: str
+    name: str
+    utc_timestamp: int
+    type: str
+    ext: str
+    time_str: str
+
+
+@dataclass
+class _StreamState:
+    """What this process has already written for one stream."""
+
+    clips_dir: Path
+    tz_name: str
+    dir_generation: int = -1
+    day_generations: Dict[str, int] = field(default_factory=dict)
+    fingerprints: Dict[str, int] = field(default_factory=dict)
+    # (mtime_ns, size) of each day's events json at the last sync, when unwatched
+    events_json_states: Dict[str, Optional[Tuple[int, int]]] = field(default_factory=dict)
+
+
+def _events_json_state(day: DayIndex) -> Optional[Tuple[int, int]]:
+    if day.events_json_name not in day.names:
+        return None
+    try:
+        st = os.stat(day.path / day.events_json_name)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _fingerprint(tz_name: str, day: DayIndex, has_events: bool) -> int:
+    parts = [tz_name, "1" if has_events else "0"]
+    parts.extend(f"{c.name}:{c.size}:{c.mtime_ns}" for c in day.clips)
+    return zlib.crc32("|".join(parts).encode())
+
+
+class EventStore:
+    """SQLite mirror of the clip index, one row per clip."""
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self.day_writes = 0
+        self.rebuilds = 0
+        self.syncs = 0
+        self._lock = threading.RLock()
+        self._streams: Dict[str, _StreamState] = {}
+        self._last_exists_check = time.monotonic()
+        self._conn, self._in_memory = self._connect(db_path)
+
+    @staticmethod
+    def _connect(db_path: Path) -> Tuple[sqlite3.Connection, bool]:
+        """Open the database, falling back to memory if the cache dir is unwritable."""
+        in_memory = False
+        try:
+            db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(db_path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        except (OSError, sqlite3.Error):
+            conn = sqlite3.connect(":memory:", check_same_thread=False)
+            in_memory = True
+        if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            conn.execute("DROP TABLE IF EXISTS clips")
+            conn.execute("DROP TABLE IF EXISTS days")
+        for statement in _SCHEMA:
+            conn.execute(statement)
+        conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        conn.commit()
+        return conn, in_memory
+
+    def _check_exists(self) -> None:
+        """Start over from the clip tree if the database file was deleted."""
+        if self._in_memory:
+            return
+        now = time.monotonic()
+        if now - self._last_exists_check < EXISTS_CHECK_SECONDS:
+            return
+        self._last_exists_check = now
+        if self.db_path.exists():
+            return
+        self._conn.close()
+        self._conn, self._in_memory = self._connect(self.db_path)
+        self._streams.clear()
+        self.rebuilds += 1
+
+    # Synchronisation with the clip index
+
+    def sync(
+        self,
+        stream_id: str,
+        clips_dir: Path,
+        tz: tzinfo,
+        start_date: str = "",
+        end_date: str = "9999-12-31",
+    ) -> None:
+        """Bring stream_id's rows for [start_date, end_date] up to date with the clip index.
+
+        When a watcher keeps clips_dir current this only compares in-memory
+        generations (and covers every day); otherwise clips_dir and the day
+        directories in the range are revalidated by stat first, and only days
+        whose listing or events json changed are fingerprinted.
+        """
+        tz_name = str(getattr(tz, "zone", tz))
+        with self._lock:
+            self._check_exists()
+            state = self._streams.get(stream_id)
+            if state is None or state.clips_dir != clips_dir or state.tz_name != tz_name:
+                state = _StreamState(clips_dir, tz_name, fingerprints=self._load(stream_id))
+                self._streams[stream_id] = state
+
+            trusted = clip_index.is_trusted(clips_dir)
+            if trusted and state.dir_generation == clip_index.dir_generation(clips_dir):
+                return
+            present: Optional[Set[str]] = None
+            if not trusted:
+                present = set(clip_index.refresh_all(clips_dir, start_date, end_date))
+
+            self.syncs += 1
+            generation = clip_index.dir_generation(clips_dir)
+            days = clip_index.days(clips_dir)
+            if present is None:
+                present = set(days)
+            for date_str, day in days.items():
+                changed = state.day_generations.get(date_str) != day.generation
+                if not trusted and start_date <= date_str <= end_date:
+                    json_state = _events_json_state(day)
+                    known = state.events_json_states
+                    if date_str not in known or known[date_str] != json_state:
+                        known[date_str] = json_state
+                        changed = True
+                if changed:
+                    self._sync_day(stream_id, state, tz, day)
+            # Days outside the range that were never indexed keep their rows
+            for date_str in set(state.fingerprints) - present:
+                self._conn.execute(
+                    "DELETE FROM clips WHERE stream_id = ? AND date = ?", (stream_id, date_str)
+                )
+                self._conn.execute(
+                    "DELETE FROM days WHERE stream_id = ? AND date = ?", (stream_id, date_str)
+                )
+                del state.fingerprints[date_str]
+                state.day_generations.pop(date_str, None)
+                state.events_json_states.pop(date_str, None)
+            self._conn.commit()
+            state.dir_generation = generation
+
+    def _load(self, stream_id: str) -> Dict[str, int]:
+        rows = self._conn.execute(
+            "SELECT date, fingerprint FROM days WHERE stream_id = ?", (stream_id,)
+        )
+        return dict(rows.fetchall())
+
+    def _sync_day(self, stream_id: str, state: _StreamState, tz: tzinfo, day: DayIndex) -> None:
+        has_events = clip_index.has_recorded_events(state.clips_dir, day.date_str)
+        fingerprint = _fingerprint(state.tz_name, day, has_events)
+        state.day_generations[day.date_str] = day.generation
+        if state.fingerprints.get(day.date_str) == fingerprint:
+            return
+
+        rows = []
+        for clip in day.clips:
+            try:
+                utc_timestamp = int(clip_datetime(tz, day.date_str, clip.time_str).timestamp())
+            except ValueError:
+                continue
+            rows.append(
+                (
+                    stream_id,
+                    day.date_str,
+                    clip.name,
+                    utc_timestamp,
+                    clip.clip_type,
+                    clip.ext,
+                    clip.time_str,
+                )
+            )
+        self._conn.execute(
+            "DELETE FROM clips WHERE stream_id = ? AND date = ?", (stream_id, day.date_str)
+        )
+        self._conn.executemany("INSERT INTO clips VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO days VALUES (?, ?, ?, ?)",
+            (stream_id, day.date_str, fingerprint, int(has_events)),
+        )
+        state.fingerprints[day.date_str] = fingerprint
+        self.day_writes += 1
+
+    def forget(self, stream_id: str) -> None:
+        """Drop a stream's rows (it was removed or its clips moved)."""
+        with self._lock:
+            self._conn.execute("DELETE FROM clips WHERE stream_id = ?", (stream_id,))
+            self._conn.execute("DELETE FROM days WHERE stream_id = ?", (stream_id,))
+            self._conn.commit()
+            self._streams.pop(stream_id, None)
+
+    # Queries
+
+    def _select(self, sql: str, params: Iterable[Any]) -> List[Tuple[Any, ...]]:
+        with self._lock:
+            return self._conn.execute(sql, tuple(params)).fetchall()
+
+    @staticmethod
+    def _between(
+        stream_id: str,
+        start: datetime,
+        end: Optional[datetime],
+        extensions: Optional[Iterable[str]],
+    ) -> Tuple[str, List[Any]]:
+        sql = " WHERE stream_id = ? AND utc_timestamp >= ?"
+        params: List[Any] = [stream_id, int(start.timestamp())]
+        if end is not None:
+            sql += " AND utc_timestamp < ?"
+            params.append(int(end.timestamp()))
+        if extensions is not None:
+            extensions = list(extensions)
+            sql += f" AND ext IN ({', '.join('?' * len(extensions))})"
+            params.extend(extensions)
+        return sql, params
+
+    def clips_between(
+        self,
+        stream_id: str,
+        start: datetime,
+        end: Optional[datetime] = None,
+        extensions: Optional[Iterable[str]] = None,
+    ) -> List[ClipRow]:
+        """Clips with start <= timestamp (< end), oldest first."""
+        where, params = self._between(stream_id, start, end, extensions)
+        sql = "SELECT date, name, utc_timestamp, type, ext, time_str FROM clips" + where
+        sql += " ORDER BY utc_timestamp, name"
+        return [ClipRow(*row) for row in self._select(sql, params)]
+
+    def extent_between(
+        self,
+        stream_id: str,
+        start: datetime,
+        end: Optional[datetime] = None,
+        extensions: Optional[Iterable[str]] = None,
+    ) -> Tuple[int, Optional[int]]:
+        """Number and oldest timestamp of the clips clips_between() would return.
+
+        Answered from the index, without reading the rows.
+        """
+        where, params = self._between(stream_id, start, end, extensions)
+        count, oldest = self._select(
+            "SELECT COUNT(*), MIN(utc_timestamp) FROM clips" + where, params
+        )[0]
+        return count, oldest
+
+    def day_fingerprints(
+        self, stream_id: str, start_date: str, end_date: str
+    ) -> List[Tuple[str, int]]:
+        """(date, fingerprint) of stream_id's synced days in [start_date, end_date].
+
+        A fingerprint changes whenever anything the day's rows or recorded-events
+        flag derive from changes, and survives restarts, so it can version
+        responses built from those days.
+        """
+        with self._lock:
+            state = self._streams.get(stream_id)
+            if state is None:
+                return []
+            return sorted(
+                (date_str, fingerprint)
+                for date_str, fingerprint in state.fingerprints.items()
+                if start_date <= date_str <= end_date
+            )
+
+    def dates_with_clips(
+        self,
+        stream_id: str,
+        start_date: str,
+        end_date: str,
+        clip_type: str,
+        extensions: Iterable[str],
+    ) -> List[str]:
+        """Dates in [start_date, end_date] with at least one clip of this type."""
+        extensions = list(extensions)
+        rows = self._select(
+            "SELECT DISTINCT date FROM clips WHERE stream_id = ? AND date BETWEEN ? AND ?"
+            f" AND type = ? AND ext IN ({', '.join('?' * len(extensions))}) ORDER BY date",
+            [stream_id, start_date, end_date, clip_type, *extensions],
+        )
+        return [row[0] for row in rows]
+
+    def latest_recorded_date(self, stream_id: str, on_or_before: str, after: str) -> Optional[str]:
+        """Most recent date in (after, on_or_before] whose events json lists an event."""
+        rows = self._select(
+            "SELECT date FROM days WHERE stream_id = ? AND has_recorded_events = 1"
+            " AND date <= ? AND date > ? ORDER BY date DESC LIMIT 1",
+            [stream_id, on_or_before, after],
+        )
+        return rows[0][0] if rows else None
+
+    def latest_clip(
+        self,
+        stream_id: str,
+        clip_type: str,
+        extensions: Iterable[str],
+        since_date: str,
+        until_date: str,
+    ) -> Optional[ClipRow]:
+        """Newest clip of a type between two dates (inclusive), by date then filename."""
+        extensions = list(extensions)
+        rows = self._select(
+            "SELECT date, name, utc_timestamp, type, ext, time_str FROM clips"
+            " WHERE stream_id = ? AND date BETWEEN ? AND ? AND type = ?"
+            f" AND ext IN ({', '.join('?' * len(extensions))})"
+            " ORDER BY date DESC, name DESC LIMIT 1",
+            [stream_id, since_date, until_date, clip_type, *extensions],
+        )
+        return ClipRow(*rows[0]) if rows else None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            clips = self._conn.execute("SELECT COUNT(*) FROM clips").fetchone()[0]
+            return {
+                "clips": clips,
+                "streams": len(self._streams),
+                "syncs": self.syncs,
+                "day_writes": self.day_writes,
+                "rebuilds": self.rebuilds,
+                "path": str(self.db_path),
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_store: Optional[EventStore] = None
+_store_lock = threading.Lock()
+
+
+def get_event_store() -> EventStore:
+    """Return the process-wide event store for the current CACHE_DIR."""
+    global _store
+    db_path = Path(settings.CACHE_DIR) / DB_FILENAME
+    with _store_lock:
+        if _store is None or _store.db_path != db_path:
+            if _store is not None:
+                _store.close()
+            _store = EventStore(db_path)
+        return _store
@@ -0,0 +1,289 @@
+"""File responses that honour HTTP range requests (RFC 9110 section 14).
+
+Starlette's FileResponse (0.35) always sends the whole file, so seeking in a
+long visit clip, or iOS Safari's "bytes=0-1" probe before playback, downloaded
+it from the start. RangeFileResponse answers Range with 206 Partial Content (a
+single range, or multipart/byteranges for several), 416 when none of the
+ranges overlap the file, and falls back to the full file when If-Range no
+longer matches. If-None-Match and If-Modified-Since are answered with 304.
+
+Bodies are handed to the server for sendfile() when it offers an ASGI
+extension for it: http.response.pathsend for whole files, and
+http.response.zerocopysend (file descriptor, offset, count) for ranges. Servers
+without either (uvicorn included) get the file in large chunks read on a worker
+thread.
+"""
+import os
+import secrets
+import stat
+from typing import List, Optional, Tuple
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.types import Message, Receive, Scope, Send
+
+from app.http_cache import etag_matches, modified_since
+from app.metrics import FILE_BYTES_SERVED
+
+# More ranges than this (after merging) are answered with the whole file
+MAX_RANGES = 16
+
+PATHSEND = "http.response.pathsend"
+ZEROCOPYSEND = "http.response.zerocopysend"
+
+# Headers a 304 repeats from the full response (RFC 9110 section 15.4.5)
+NOT_MODIFIED_HEADERS = {
+    "cache-control",
+    "content-location",
+    "etag",
+    "expires",
+    "last-modified",
+    "vary",
+}
+
+ByteRange = Tuple[int, int]  # inclusive first and last byte
+
+
+class RangeNotSatisfiable(Exception):
+    """None of the requested ranges overlap the file."""
+
+
+def parse_range(header: str, size: int) -> Optional[List[ByteRange]]:
+    """Byte ranges requested by a Range header, sorted and merged.
+
+    Returns None when the header should be ignored (not bytes, malformed, or too
+    many ranges) and raises RangeNotSatisfiable when no range overlaps the file.
+    """
+    unit, _, specs = header.partition("=")
+    if unit.strip().lower() != "bytes" or not specs.strip():
+        return None
+
+    ranges: List[ByteRange] = []
+    for spec in specs.split(","):
+        first, dash, last = spec.strip().partition("-")
+        if not dash:
+            return None
+        try:
+            if first:
+                start = int(first)
+                end = int(last) if last else size - 1
+                if start < 0 or (last and end < start):
+                    return None
+            else:
+                suffix = int(last)
+                if suffix < 0:
+                    return None
+                if suffix == 0:
+                    continue
+                start, end = max(size - suffix, 0), size - 1
+        except ValueError:
+            return None
+        if start < size:
+            ranges.append((start, min(end, size - 1)))
+
+    if not ranges:
+        raise RangeNotSatisfiable()
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    return merged if len(merged) <= MAX_RANGES else None
+
+
+def if_range_matches(if_range: str, etag: Optional[str], last_modified: Optional[str]) -> bool:
+    """Whether If-Range still names the current representation (strong comparison)."""
+    if_range = if_range.strip()
+    if if_range.startswith('"'):
+        return etag is not None and if_range == etag
+    return last_modified is not None and if_range == last_modified
+
+
+class RangeFileResponse(FileResponse):
+    """FileResponse with conditional requests, Accept-Ranges, Range, If-Range and 416."""
+
+    # Copying fallback: each read is a thread hop plus an event loop round trip,
+    # so fewer, larger reads cost far less CPU per byte than Starlette's 64 KiB
+    chunk_size = 1024 * 1024
+    zero_copy = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.stat_result is None:
+            try:
+                self.stat_result = await anyio.to_thread.run_sync(os.stat, self.path)
+            except FileNotFoundError:
+                raise RuntimeError(f"File at path {self.path} does not exist.")
+            if not stat.S_ISREG(self.stat_result.st_mode):
+                raise RuntimeError(f"File at path {self.path} is not a file.")
+            self.set_stat_headers(self.stat_result)
+        self.headers["accept-ranges"] = "bytes"
+
+        size = self.stat_result.st_size
+        send = self.counting_bytes(send, size)
+        headers = Headers(scope=scope)
+        ranges = self.requested_ranges(headers, size)
+        send_body = scope["method"].upper() != "HEAD"
+        extensions = scope.get("extensions") or {}
+        self.zero_copy = ZEROCOPYSEND in extensions
+        if self.is_not_modified(headers):
+            self.status_code = 304
+            self.raw_headers = [
+                (name, value)
+                for name, value in self.raw_headers
+                if name.decode("latin-1") in NOT_MODIFIED_HEADERS
+            ]
+            await send({"type": "http.response.start", "status": 304, "headers": self.raw_headers})
+            send_body = False
+        elif ranges == []:
+            self.status_code = 416
+            self.headers["content-range"] = f"bytes */{size}"
+            await self.send_start(send, 0)
+            send_body = False
+        elif ranges is None:
+            await self.send_start(send, size)
+            if send_body and PATHSEND in extensions:
+                await send({"type": PATHSEND, "path": os.path.abspath(self.path)})
+            elif send_body:
+                await self.send_file(send, [(0, size - 1)] if size else [])
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            self.status_code = 206
+            self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+            await self.send_start(send, end - start + 1)
+            if send_body:
+                await self.send_file(send, ranges)
+        else:
+            await self.send_multipart(send, ranges, size, send_body)
+
+        if not send_body:
+            await send({"type": "http.response.body", "body": b""})
+        if self.background is not None:
+            await self.background()
+
+    def counting_bytes(self, send: Send, size: int) -> Send:
+        """Wrap send to add the file bytes it hands over to FILE_BYTES_SERVED."""
+        kind = (self.media_type or "application/octet-stream").partition("/")[0]
+
+        async def counted(message: Message) -> None:
+            await send(message)
+            if message["type"] == "http.response.body":
+                sent = len(message.get("body", b""))
+            elif message["type"] == ZEROCOPYSEND:
+                sent = message["count"]
+            elif message["type"] == PATHSEND:
+                sent = size
+            else:
+                return
+            if sent:
+                FILE_BYTES_SERVED.inc(sent, kind=kind)
+
+        return counted
+
+    def is_not_modified(self, headers: Headers) -> bool:
+        """Whether the client's copy is current; If-None-Match wins over If-Modified-Since."""
+        if self.status_code != 200:
+            return False
+        if_none_match = headers.get("if-none-match")
+        if if_none_match is not None:
+            return etag_matches(if_none_match, self.headers["etag"])
+        since = headers.get("if-modified-since")
+        if since is None or self.stat_result is None:
+            return False
+        return not modified_since(since, self.stat_result.st_mtime)
+
+    def requested_ranges(self, headers: Headers, size: int) -> Optional[List[ByteRange]]:
+        """Ranges to send: None for the whole file, [] if unsatisfiable."""
+        header = headers.get("range")
+        if header is None or self.status_code != 200:
+            return None
+        if_range = headers.get("if-range")
+        if if_range is not None and not if_range_matches(
+            if_range, self.headers.get("etag"), self.headers.get("last-modified")
+        ):
+            return None
+        try:
+            return parse_range(header, size)
+        except RangeNotSatisfiable:
+            return []
+
+    async def send_start(self, send: Send, content_length: int) -> None:
+        self.headers["content-length"] = str(content_length)
+        await send(
+            {"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers}
+        )
+
+    async def send_file(self, send: Send, ranges: List[ByteRange], more_body: bool = False) -> None:
+        """Send byte ranges of the file, ending the body unless more_body."""
+        if self.zero_copy:
+            await self.send_zero_copy(send, ranges, more_body)
+            return
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            for index, (start, end) in enumerate(ranges):
+                await file.seek(start)
+                remaining = end - start + 1
+                while remaining:
+                    chunk = await file.read(min(self.chunk_size, remaining))
+                    if not chunk:
+                        raise RuntimeError(f"File at path {self.path} shrank while being sent.")
+                    remaining -= len(chunk)
+                    last = not remaining and index == len(ranges) - 1
+                    await send(
+                        {
+                            "type": "http.response.body",
+                            "body": chunk,
+                            "more_body": more_body or not last,
+                        }
+                    )
+        if not ranges and not more_body:
+            await send({"type": "http.response.body", "body": b""})
+
+    async def send_zero_copy(self, send: Send, ranges: List[ByteRange], more_body: bool) -> None:
+        """Let the server sendfile() each range straight from the page cache."""
+        file = await anyio.to_thread.run_sync(open, self.path, "rb")
+        try:
+            for index, (start, end) in enumerate(ranges):
+                last = index == len(ranges) - 1
+                await send(
+                    {
+                        "type": ZEROCOPYSEND,
+                        "file": file,
+                        "offset": start,
+                        "count": end - start + 1,
+                        "more_body": more_body or not last,
+                    }
+                )
+        finally:
+            file.close()
+        if not ranges and not more_body:
+            await send({"type": "http.response.body", "body": b""})
+
+    async def send_multipart(
+        self, send: Send, ranges: List[ByteRange], size: int, send_body: bool
+    ) -> None:
+        boundary = secrets.token_hex(16)
+        part_type = self.media_type or "application/octet-stream"
+        heads = [
+            (
+                f"--{boundary}\r\nContent-Type: {part_type}\r\n"
+                f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+            ).encode()
+            for start, end in ranges
+        ]
+        tail = f"\r\n--{boundary}--\r\n".encode()
+        length = sum(len(head) + end - start + 1 for head, (start, end) in zip(heads, ranges))
+        length += 2 * (len(ranges) - 1) + len(tail)
+
+        self.status_code = 206
+        self.headers["content-type"] = f"multipart/byteranges; boundary={boundary}"
+        await self.send_start(send, length)
+        if not send_body:
+            return
+        for index, (head, byte_range) in enumerate(zip(heads, ranges)):
+            separator = b"\r\n" if index else b""
+            await send({"type": "http.response.body", "body": separator + head, "more_body": True})
+            await self.send_file(send, [byte_range], more_body=True)
+        await send({"type": "http.response.body", "body": tail})
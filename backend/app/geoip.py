@@ -0,0 +1,274 @@
+"""Offline IP -> timezone lookup from a compact on-disk range table.
+
+The table is built once from a CSV of address ranges (python -m app.geoip) and
+memory-mapped at startup; a lookup is a binary search over the mapped range
+starts, so it takes microseconds, needs no network and costs no heap beyond the
+timezone names. The operating system shares the mapped pages between workers.
+
+File layout (little-endian):
+
+    header   b"KTZ1", u32 IPv4 ranges, u32 IPv6 ranges, u32 name bytes
+    IPv4     u32 range starts (sorted), then u16 timezone indexes
+    IPv6     16-byte big-endian range starts (sorted), then u16 timezone indexes
+    names    timezone names, newline-separated
+
+Each range runs from its start to the next range's start; address space with no
+timezone is a range with index NO_TIMEZONE.
+"""
+import argparse
+import array
+import bisect
+import csv
+import ipaddress
+import logging
+import mmap
+import struct
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"KTZ1"
+HEADER = struct.Struct("<4sIII")
+NO_TIMEZONE = 0xFFFF
+# ::ffff:0:0/96, where IPv6-format databases keep the IPv4 address space
+IPV4_MAPPED = 0xFFFF << 32
+IPV4_MAPPED_LAST = IPV4_MAPPED + (1 << 32) - 1
+
+IPAddress = Union[ipaddress.IPv4Address, ipaddress.IPv6Address]
+
+
+class TableError(ValueError):
+    """The file is not a valid timezone table."""
+
+
+class _IPv6Starts:
+    """Sequence view of the packed 16-byte IPv6 range starts, for bisect."""
+
+    def __init__(self, view: memoryview):
+        self.view = view
+
+    def __len__(self) -> int:
+        return len(self.view) // 16
+
+    def __getitem__(self, index: int) -> bytes:
+        return bytes(self.view[index * 16 : index * 16 + 16])
+
+
+class TimezoneTable:
+    """A memory-mapped range table; see the module docstring for the format."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < HEADER.size:
+            self._mmap.close()
+            raise TableError(f"{path}: truncated header")
+        magic, v4_count, v6_count, names_size = HEADER.unpack_from(self._mmap)
+        expected = HEADER.size + v4_count * 6 + v6_count * 18 + names_size
+        if magic != MAGIC or len(self._mmap) != expected:
+            size = len(self._mmap)
+            self._mmap.close()
+            raise TableError(f"{path}: not a timezone table ({size} bytes, expected {expected})")
+
+        view = memoryview(self._mmap)
+        offset = HEADER.size
+        v4_starts = view[offset : offset + v4_count * 4]
+        offset += v4_count * 4
+        v4_zones = view[offset : offset + v4_count * 2]
+        offset += v4_count * 2
+        v6_starts = view[offset : offset + v6_count * 16]
+        offset += v6_count * 16
+        v6_zones = view[offset : offset + v6_count * 2]
+        offset += v6_count * 2
+
+        if sys.byteorder == "little":
+            self._v4_starts: Sequence[int] = v4_starts.cast("I")
+            self._v4_zones: Sequence[int] = v4_zones.cast("H")
+            self._v6_zones: Sequence[int] = v6_zones.cast("H")
+        else:
+            # Big-endian hosts get byte-swapped copies; the rest is read from the map
+            self._v4_starts = _swapped("I", v4_starts)
+            self._v4_zones = _swapped("H", v4_zones)
+            self._v6_zones = _swapped("H", v6_zones)
+        self._v6_starts = _IPv6Starts(v6_starts)
+        self.names = bytes(view[offset:]).decode().split("\n") if names_size else []
+        self.ranges = v4_count + v6_count
+
+    def lookup(self, address: IPAddress) -> Optional[str]:
+        """Timezone of address, or None if the table doesn't cover it."""
+        if address.version == 4:
+            index = bisect.bisect_right(self._v4_starts, int(address)) - 1
+            zone = self._v4_zones[index] if index >= 0 else NO_TIMEZONE
+        else:
+            index = bisect.bisect_right(self._v6_starts, address.packed) - 1
+            zone = self._v6_zones[index] if index >= 0 else NO_TIMEZONE
+        return self.names[zone] if zone != NO_TIMEZONE else None
+
+
+def _swapped(code: str, view: memoryview) -> "array.array[int]":
+    values = array.array(code, view.tobytes())
+    values.byteswap()
+    return values
+
+
+def build_table(rows: Iterable[Tuple[str, str, str]]) -> bytes:
+    """Pack (first address, last address, timezone) rows into a table.
+
+    Addresses may be written as IPs or as integers (as in IP2Location-style
+    CSVs). Integers are IPv4 unless any integer in the file needs more than 32
+    bits, in which case all of them are IPv6, as in the IPv6 editions of those
+    databases. Ranges in ::ffff:0:0/96 are stored as IPv4 ranges, since that is
+    how IPv4-mapped visitors are looked up. Ranges must not overlap; blank
+    timezones and "-" are left as gaps.
+    """
+    rows = list(rows)
+    integers_are_v6 = any(
+        value.strip().isdigit() and int(value) >= 1 << 32
+        for first, last, _timezone in rows
+        for value in (first, last)
+    )
+    spans: Dict[int, List[Tuple[int, int, str]]] = {4: [], 6: []}
+    for first, last, timezone in rows:
+        first_ip, last_ip = _address(first, integers_are_v6), _address(last, integers_are_v6)
+        if first_ip.version != last_ip.version or int(last_ip) < int(first_ip):
+            raise ValueError(f"Invalid range: {first} - {last}")
+        timezone = timezone.strip()
+        if timezone in ("", "-"):
+            continue
+        start, end = int(first_ip), int(last_ip)
+        if first_ip.version == 4:
+            spans[4].append((start, end, timezone))
+            continue
+        # Split off the part in ::ffff:0:0/96 as IPv4
+        if start < IPV4_MAPPED:
+            spans[6].append((start, min(end, IPV4_MAPPED - 1), timezone))
+        if start <= IPV4_MAPPED_LAST and end >= IPV4_MAPPED:
+            spans[4].append(
+                (
+                    max(start, IPV4_MAPPED) - IPV4_MAPPED,
+                    min(end, IPV4_MAPPED_LAST) - IPV4_MAPPED,
+                    timezone,
+                )
+            )
+        if end > IPV4_MAPPED_LAST:
+            spans[6].append((max(start, IPV4_MAPPED_LAST + 1), end, timezone))
+
+    names: List[str] = []
+    indexes: Dict[str, int] = {}
+    tables = {}
+    for version, bits in ((4, 32), (6, 128)):
+        starts: List[int] = []
+        zones: List[int] = []
+        next_start = 0  # first address not yet covered
+        for start, end, timezone in sorted(spans[version]):
+            if start < next_start:
+                raise ValueError(f"Overlapping ranges at {_format(version, start)}")
+            if timezone not in indexes:
+                if len(names) >= NO_TIMEZONE:
+                    raise ValueError("Too many distinct timezones")
+                indexes[timezone] = len(names)
+                names.append(timezone)
+            zone = indexes[timezone]
+            if start > next_start and zones:
+                starts.append(next_start)
+                zones.append(NO_TIMEZONE)
+            if not zones or zones[-1] != zone:
+                starts.append(start)
+                zones.append(zone)
+            next_start = end + 1
+        if zones and next_start < 1 << bits:
+            starts.append(next_start)
+            zones.append(NO_TIMEZONE)
+        tables[version] = starts, zones
+
+    (v4_starts, v4_zones), (v6_starts, v6_zones) = tables[4], tables[6]
+    name_bytes = "\n".join(names).encode()
+    return b"".join(
+        [
+            HEADER.pack(MAGIC, len(v4_starts), len(v6_starts), len(name_bytes)),
+            struct.pack(f"<{len(v4_starts)}I", *v4_starts),
+            struct.pack(f"<{len(v4_zones)}H", *v4_zones),
+            b"".join(start.to_bytes(16, "big") for start in v6_starts),
+            struct.pack(f"<{len(v6_zones)}H", *v6_zones),
+            name_bytes,
+        ]
+    )
+
+
+def _format(version: int, number: int) -> str:
+    return str(ipaddress.IPv4Address(number) if version == 4 else ipaddress.IPv6Address(number))
+
+
+def _address(value: str, integers_are_v6: bool = False) -> IPAddress:
+    value = value.strip()
+    if value.isdigit():
+        number = int(value)
+        return ipaddress.IPv6Address(number) if integers_are_v6 else ipaddress.IPv4Address(number)
+    return ipaddress.ip_address(value)
+
+
+_table: Optional[TimezoneTable] = None
+_table_path: Optional[Path] = None
+_table_lock = threading.Lock()
+
+
+def get_timezone_table() -> Optional[TimezoneTable]:
+    """The table at settings.GEOIP_DB, or None if there isn't a usable one."""
+    global _table, _table_path
+    path = settings.GEOIP_DB
+    if _table_path == path:
+        return _table
+    with _table_lock:
+        if _table_path != path:
+            _table = None
+            try:
+                _table = TimezoneTable(path)
+                logger.info("Loaded %d IP ranges from %s", _table.ranges, path)
+            except FileNotFoundError:
+                logger.info("No IP timezone table at %s", path)
+            except (OSError, ValueError) as e:
+                logger.warning("Cannot load IP timezone table: %s", e)
+            _table_path = path
+        return _table
+
+
+def lookup_timezone(address: IPAddress) -> Optional[str]:
+    """Timezone of address from the local table, if there is one."""
+    table = get_timezone_table()
+    return table.lookup(address) if table is not None else None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build an IP -> timezone table from a CSV of first,last,timezone rows."
+    )
+    parser.add_argument("csv", type=Path, help="input CSV (extra columns are ignored)")
+    parser.add_argument("output", type=Path, help="table to write (KANYO_GEOIP_DB)")
+    parser.add_argument(
+        "--columns",
+        default="0,1,2",
+        help="indexes of the first address, last address and timezone columns",
+    )
+    parser.add_argument("--skip-header", action="store_true")
+    args = parser.parse_args()
+
+    first, last, timezone = (int(i) for i in args.columns.split(","))
+    with open(args.csv, newline="") as f:
+        reader = csv.reader(f)
+        if args.skip_header:
+            next(reader, None)
+        data = build_table((row[first], row[last], row[timezone]) for row in reader)
+    tmp = args.output.with_name(args.output.name + ".tmp")
+    tmp.write_bytes(data)
+    tmp.replace(args.output)
+    print(f"Wrote {len(data)} bytes to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""HLS playlist rewriting and short-lived playlist caching.
+
+Live playlists are polled by every viewer once per target duration. The
+rewritten playlist is therefore cached per upstream URL for a fraction of its
+#EXT-X-TARGETDURATION and shared by all viewers, with concurrent misses
+coalesced into a single upstream fetch.
+"""
+import asyncio
+import re
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import quote, urlparse
+
+from app.config import settings
+
+# Absolute URLs on their own line (segments, variant playlists) or inside a
+# URI="..." tag attribute (EXT-X-MEDIA, EXT-X-MAP, EXT-X-KEY).
+_URL_LINE = re.compile(r"^[ \t]*(https?://[^\s]+)[ \t]*$", re.MULTILINE)
+_URI_ATTR = re.compile(r'URI="(https?://[^"]+)"')
+_TARGET_DURATION = re.compile(r"^#EXT-X-TARGETDURATION:\s*([\d.]+)", re.MULTILINE)
+
+# Path markers of YouTube playlist URLs (as opposed to media segments)
+_PLAYLIST_PATH_MARKERS = (".m3u8", "/hls_playlist/", "/hls_variant/")
+
+
+def segment_proxy_prefix(stream_id: str) -> str:
+    """Same-origin URL prefix that proxied upstream URLs are appended to."""
+    return f"/api/streams/{stream_id}/hls/seg?u="
+
+
+def rewrite_playlist(text: str, prefix: str) -> str:
+    """Point every absolute URL in a playlist at the segment proxy."""
+    text = _URL_LINE.sub(lambda m: prefix + quote(m.group(1), safe=""), text)
+    return _URI_ATTR.sub(lambda m: f'URI="{prefix}{quote(m.group(1), safe="")}"', text)
+
+
+def target_duration(text: str) -> Optional[float]:
+    match = _TARGET_DURATION.search(text)
+    return float(match.group(1)) if match else None
+
+
+def looks_like_playlist(url: str) -> bool:
+    """Whether an upstream URL is a (sub-)playlist rather than a media segment."""
+    path = urlparse(url).path
+    return any(marker in path for marker in _PLAYLIST_PATH_MARKERS)
+
+
+class PlaylistCache:
+    """Rewritten playlists keyed by (stream_id, upstream URL), with single-flight loads."""
+
+    def __init__(self, ttl_fraction: float, default_ttl: float, max_entries: int = 256):
+        self.ttl_fraction = ttl_fraction
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[str, float]]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, str], "asyncio.Task[str]"] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def ttl_for(self, text: str) -> float:
+        duration = target_duration(text)
+        return duration * self.ttl_fraction if duration else self.default_ttl
+
+    async def get(self, key: Tuple[str, str], load: Callable[[], Awaitable[str]]) -> str:
+        """Return the cached playlist for key, calling load() at most once per miss.
+
+        Errors raised by load() reach every waiter and are not cached.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() < entry[1]:
+            self.hits += 1
+            return entry[0]
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._load(key, load))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    async def _load(self, key: Tuple[str, str], load: Callable[[], Awaitable[str]]) -> str:
+        body = await load()
+        self._entries[key] = (body, time.monotonic() + self.ttl_for(body))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return body
+
+    def _finish(self, key: Tuple[str, str], task: "asyncio.Task[str]") -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()
+
+    def invalidate(self, stream_id: str) -> None:
+        """Drop every cached playlist for a stream."""
+        for key in [k for k in self._entries if k[0] == stream_id]:
+            del self._entries[key]
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+        }
+
+
+_cache: Optional[PlaylistCache] = None
+
+
+def get_playlist_cache() -> PlaylistCache:
+    """Return the process-wide playlist cache."""
+    global _cache
+    if _cache is None:
+        _cache = PlaylistCache(
+            ttl_fraction=settings.PLAYLIST_CACHE_TTL_FRACTION,
+            default_ttl=settings.PLAYLIST_CACHE_DEFAULT_TTL_SECONDS,
+        )
+    return _cache
+
+
+def reset_playlist_cache() -> None:
+    global _cache
+    _cache = None
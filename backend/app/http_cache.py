@@ -0,0 +1,117 @@
+"""HTTP validators and conditional responses for the JSON API.
+
+Responses carry a strong ETag; a request whose If-None-Match lists it gets an
+empty 304 instead of the body, so polling clients only download changes. Where
+the ETag can be derived from the data's version (see Validators), the 304 is
+answered before the body is built at all.
+"""
+import hashlib
+from dataclasses import dataclass
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+# Revalidate on every use; with an ETag that's a cheap 304 when unchanged
+NO_CACHE = "no-cache"
+
+
+def immutable(max_age: float) -> str:
+    """Cache-Control for content that won't change; reused without revalidation."""
+    return f"public, max-age={int(max_age)}, immutable"
+
+
+def fresh_for(seconds: float) -> str:
+    """Cache-Control for content reused briefly, then revalidated with its validators."""
+    return f"public, max-age={int(seconds)}"
+
+
+def http_date(timestamp: float) -> str:
+    return formatdate(timestamp, usegmt=True)
+
+
+def make_etag(*parts: Any) -> str:
+    """Strong ETag from bytes or any values with a stable str()."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+        digest.update(b"\0")
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header value matches etag (weak comparison, RFC 9110)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == wanted:
+            return True
+    return False
+
+
+def modified_since(if_modified_since: Optional[str], last_modified: float) -> bool:
+    """Whether last_modified is newer than an If-Modified-Since header (True if unparsable)."""
+    if not if_modified_since:
+        return True
+    try:
+        since = parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return True
+    return int(last_modified) > since
+
+
+@dataclass
+class Validators:
+    """ETag, Last-Modified and caching policy of a response, known before its body."""
+
+    etag: str
+    cache_control: str = NO_CACHE
+    last_modified: Optional[float] = None  # POSIX seconds
+
+    def headers(self) -> Dict[str, str]:
+        headers = {"ETag": self.etag, "Cache-Control": self.cache_control}
+        if self.last_modified is not None:
+            headers["Last-Modified"] = http_date(self.last_modified)
+        return headers
+
+    def is_fresh(self, request: Request) -> bool:
+        """Whether the client's copy is current; If-None-Match wins over If-Modified-Since."""
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            return etag_matches(if_none_match, self.etag)
+        if self.last_modified is None:
+            return False
+        since = request.headers.get("if-modified-since")
+        return since is not None and not modified_since(since, self.last_modified)
+
+    def not_modified(self) -> Response:
+        return Response(status_code=304, headers=self.headers())
+
+    def json(self, content: Any) -> JSONResponse:
+        return JSONResponse(content, headers=self.headers())
+
+
+def not_modified(etag: str, cache_control: str, **headers: str) -> Response:
+    return Response(
+        status_code=304, headers={"ETag": etag, "Cache-Control": cache_control, **headers}
+    )
+
+
+def conditional_json(
+    request: Request, content: Any, cache_control: str = NO_CACHE, etag: Optional[str] = None
+) -> Response:
+    """JSON response with an ETag (of the body unless given), or 304 if the client has it."""
+    response = JSONResponse(content)
+    etag = etag or make_etag(response.body)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag, cache_control)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    return response
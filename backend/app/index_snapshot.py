@@ -0,0 +1,211 @@
+"""On-disk snapshot of the clip index for fast cold starts.
+
+After a redeploy every in-memory cache is empty, so the first requests used to
+pay for listing every day directory again. The clip index is saved to
+settings.CACHE_DIR on shutdown and periodically, and loaded in one read on
+startup. Loaded days are still revalidated against their directory's mtime on
+first use (see ClipIndex.refresh), so a stale snapshot only costs a rescan of
+the days that changed. Clip durations persist separately (app.durations).
+
+File layout (little-endian), version 1:
+
+    header   magic b"KVIX" | u16 version | u32 crc32(payload) | u32 len(payload)
+    payload  zlib-compressed records:
+             u32 day count, then per day
+               str clips_dir | str date | i64 dir_mtime_ns | u8 flags
+               [i64 json_mtime_ns | i64 json_size]      (if flags & HAS_JSON_STATE)
+               u32 name count | str name ...
+               u32 clip count | (u32 name index | u64 size | i64 mtime_ns) ...
+    str      u16 length | utf-8 bytes
+
+Clip time, type and extension are re-derived from the file name on load.
+"""
+import asyncio
+import logging
+import os
+import struct
+import tempfile
+import zlib
+from pathlib import Path
+from typing import List, Tuple
+
+from app.blocking import run_blocking
+from app.clip_index import CLIP_PATTERN, ClipEntry, ClipIndex, DayIndex
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILENAME = "clip_index.bin"
+MAGIC = b"KVIX"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sHII")
+_DAY = struct.Struct("<qB")
+_JSON_STATE = struct.Struct("<qq")
+_COUNT = struct.Struct("<I")
+_CLIP = struct.Struct("<IQq")
+_STR_LEN = struct.Struct("<H")
+
+FLAG_RACY = 0x01
+FLAG_HAS_JSON_STATE = 0x02
+FLAG_JSON_HAS_EVENTS = 0x04
+
+
+class SnapshotError(Exception):
+    """The snapshot file is missing, from another version, or damaged."""
+
+
+def snapshot_path() -> Path:
+    return Path(settings.CACHE_DIR) / SNAPSHOT_FILENAME
+
+
+def _pack_str(out: List[bytes], value: str) -> None:
+    data = value.encode("utf-8")
+    out.append(_STR_LEN.pack(len(data)))
+    out.append(data)
+
+
+def encode(entries: List[Tuple[str, DayIndex]]) -> bytes:
+    """Serialize (clips_dir, day) pairs to the snapshot format."""
+    out: List[bytes] = [_COUNT.pack(len(entries))]
+    for clips_dir, day in entries:
+        flags = FLAG_RACY if day.racy else 0
+        if day.events_json_state is not None:
+            flags |= FLAG_HAS_JSON_STATE
+            if day.events_json_has_events:
+                flags |= FLAG_JSON_HAS_EVENTS
+        _pack_str(out, clips_dir)
+        _pack_str(out, day.date_str)
+        out.append(_DAY.pack(day.dir_mtime_ns, flags))
+        if day.events_json_state is not None:
+            out.append(_JSON_STATE.pack(*day.events_json_state))
+
+        names = sorted(day.names)
+        positions = {name: i for i, name in enumerate(names)}
+        out.append(_COUNT.pack(len(names)))
+        for name in names:
+            _pack_str(out, name)
+        out.append(_COUNT.pack(len(day.clips)))
+        for clip in day.clips:
+            out.append(_CLIP.pack(positions[clip.name], clip.size, clip.mtime_ns))
+
+    payload = zlib.compress(b"".join(out), 6)
+    return _HEADER.pack(MAGIC, VERSION, zlib.crc32(payload), len(payload)) + payload
+
+
+def decode(data: bytes) -> List[Tuple[str, DayIndex]]:
+    """Parse a snapshot produced by encode(); raise SnapshotError if it can't be used."""
+    if len(data) < _HEADER.size:
+        raise SnapshotError("truncated header")
+    magic, version, crc, length = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise SnapshotError("not a clip index snapshot")
+    if version != VERSION:
+        raise SnapshotError(f"unsupported snapshot version {version}")
+    payload = data[_HEADER.size :]
+    if len(payload) != length or zlib.crc32(payload) != crc:
+        raise SnapshotError("checksum mismatch")
+
+    try:
+        buf = zlib.decompress(payload)
+        offset = 0
+
+        def read(fmt: struct.Struct) -> tuple:
+            nonlocal offset
+            values = fmt.unpack_from(buf, offset)
+            offset += fmt.size
+            return values
+
+        def read_str() -> str:
+            nonlocal offset
+            (size,) = read(_STR_LEN)
+            value = buf[offset : offset + size].decode("utf-8")
+            offset += size
+            return value
+
+        entries = []
+        (day_count,) = read(_COUNT)
+        for _ in range(day_count):
+            clips_dir = read_str()
+            date_str = read_str()
+            dir_mtime_ns, flags = read(_DAY)
+            json_state = read(_JSON_STATE) if flags & FLAG_HAS_JSON_STATE else None
+            (name_count,) = read(_COUNT)
+            names = [read_str() for _ in range(name_count)]
+            (clip_count,) = read(_COUNT)
+            clips = []
+            for _ in range(clip_count):
+                position, size, mtime_ns = read(_CLIP)
+                name = names[position]
+                match = CLIP_PATTERN.match(name)
+                if match is None:
+                    raise SnapshotError(f"unexpected clip name {name!r}")
+                time_str, clip_type, ext = match.groups()
+                clips.append(ClipEntry(name, time_str, clip_type, ext, size, mtime_ns))
+            day = DayIndex(
+                date_str=date_str,
+                path=Path(clips_dir) / date_str,
+                dir_mtime_ns=dir_mtime_ns,
+                clips=tuple(clips),
+                names=frozenset(names),
+                racy=bool(flags & FLAG_RACY),
+                events_json_state=json_state,
+                events_json_has_events=bool(flags & FLAG_JSON_HAS_EVENTS),
+            )
+            entries.append((clips_dir, day))
+    except (struct.error, zlib.error, UnicodeDecodeError, IndexError) as exc:
+        raise SnapshotError(f"corrupt snapshot: {exc}")
+    return entries
+
+
+def save_snapshot(index: ClipIndex, path: Path) -> int:
+    """Write the index to path atomically; return the number of bytes written."""
+    data = encode(index.entries())
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".clip_index.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return len(data)
+
+
+def load_snapshot(index: ClipIndex, path: Path) -> int:
+    """Install days from a snapshot into index; return how many were loaded.
+
+    A missing or unusable snapshot loads nothing (the index simply starts cold).
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return 0
+    except OSError as exc:
+        logger.warning("Cannot read clip index snapshot %s: %s", path, exc)
+        return 0
+    try:
+        entries = decode(data)
+    except SnapshotError as exc:
+        logger.warning("Ignoring clip index snapshot %s: %s", path, exc)
+        return 0
+    for clips_dir, day in entries:
+        index.set_day(Path(clips_dir), day.date_str, day)
+    return len(entries)
+
+
+async def run_snapshot_writer(index: ClipIndex, path: Path, interval: float) -> None:
+    """Save the index every interval seconds while it keeps changing (background task)."""
+    saved_generation = index.generation
+    while True:
+        await asyncio.sleep(interval)
+        generation = index.generation
+        if generation == saved_generation:
+            continue
+        try:
+            await run_blocking(save_snapshot, index, path)
+            saved_generation = generation
+        except OSError as exc:
+            logger.warning("Cannot write clip index snapshot %s: %s", path, exc)
@@ -0,0 +1,152 @@
+"""Event loop lag monitor and blocking-call watchdog (opt-in: KANYO_LOOP_MONITOR).
+
+A heartbeat task sleeps for a short interval and records how late it woke up
+as kanyo_event_loop_lag_seconds: anything that holds the loop (synchronous I/O
+in an async route, a long computation) shows up there, and delays every HLS
+playlist and segment being served at the same time.
+
+Lag alone doesn't say what held the loop, so a watchdog thread checks the
+heartbeat too. When it is overdue by more than the threshold, the watchdog
+takes the loop thread's current stack from sys._current_frames() while the
+loop is still stuck, and logs it with the route of the request being handled
+by the running task. Each stall is reported once and counted in
+kanyo_event_loop_blocks_total.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from contextlib import suppress
+from typing import Any, Dict, Optional
+
+from app.metrics import active_requests, counter, histogram, route_label
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG = histogram(
+    "kanyo_event_loop_lag_seconds",
+    "How late the event loop heartbeat woke up (only with KANYO_LOOP_MONITOR).",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+LOOP_BLOCKS = counter(
+    "kanyo_event_loop_blocks_total",
+    "Event loop stalls past the threshold, by the route that was running.",
+    ("route",),
+)
+
+
+class LoopMonitor:
+    """Samples event loop lag and reports the stack behind each long stall."""
+
+    def __init__(self, interval: float, threshold: float):
+        self.interval = interval
+        self.threshold = threshold
+        self.blocks = 0
+        self.max_lag = 0.0
+        self.last_block: Optional[Dict[str, Any]] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = 0.0
+        self._stopping = threading.Event()
+        self._heartbeat_task: Optional["asyncio.Task[None]"] = None
+        self._watchdog: Optional[threading.Thread] = None
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._heartbeat_task
+        if self._watchdog is not None:
+            # Wakes within one poll of the stop event
+            self._watchdog.join()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "lag_ms_max": self.max_lag * 1000,
+            "blocks": self.blocks,
+            "last_block": self.last_block,
+        }
+
+    async def _heartbeat(self) -> None:
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(now - start - self.interval, 0.0)
+            LOOP_LAG.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+            self._last_beat = now
+
+    def _watch(self) -> None:
+        reported = None
+        while not self._stopping.wait(self.interval / 2):
+            beat = self._last_beat
+            overdue = time.monotonic() - beat - self.interval
+            if overdue >= self.threshold and beat != reported:
+                reported = beat
+                try:
+                    self._report(overdue)
+                except Exception:
+                    logger.exception("Event loop watchdog failed to report a stall")
+
+    def _report(self, overdue: float) -> None:
+        """Log what the loop thread is running right now (watchdog thread)."""
+        if self._loop_thread_id is None:
+            return
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else "(unavailable)\n"
+        task = asyncio.current_task(self._loop)
+        scope = active_requests.get(task) if task is not None else None
+        if scope is not None:
+            route = route_label(scope)
+            running = f"{scope['method']} {scope['path']} (route {route})"
+        else:
+            # A background task, or a task spawned by a request (e.g. a streamed body)
+            route = ""
+            running = f"task {task.get_name()}" if task is not None else "no task"
+
+        self.blocks += 1
+        LOOP_BLOCKS.inc(route=route)
+        self.last_block = {"at": time.time(), "ms": round(overdue * 1000), "running": running}
+        logger.warning(
+            "Event loop blocked for over %.0f ms in %s; loop thread stack:\n%s",
+            overdue * 1000,
+            running,
+            stack.rstrip(),
+        )
+
+
+_monitor: Optional[LoopMonitor] = None
+
+
+def get_loop_monitor() -> Optional[LoopMonitor]:
+    """The running monitor, if the app started one."""
+    return _monitor
+
+
+async def start_loop_monitor(interval: float, threshold: float) -> LoopMonitor:
+    global _monitor
+    monitor = LoopMonitor(interval, threshold)
+    await monitor.start()
+    _monitor = monitor
+    return monitor
+
+
+async def stop_loop_monitor() -> None:
+    global _monitor
+    if _monitor is not None:
+        await _monitor.stop()
+        _monitor = None
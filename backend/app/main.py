@@ -1,16 +1,72 @@
 """Main FastAPI application for Kanyo Viewer."""
+import asyncio
+import logging
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
 from pathlib import Path
 
+from app import upstream
+from app.blocking import run_blocking, shutdown_executor
+from app.clip_index import clip_index
+from app.clip_watcher import get_clip_watcher, start_clip_watcher, stop_clip_watcher
 from app.config import settings
+from app.durations import get_duration_cache
+from app.event_store import get_event_store
+from app.hls import get_playlist_cache
+from app.index_snapshot import load_snapshot, run_snapshot_writer, save_snapshot, snapshot_path
+from app.loop_monitor import get_loop_monitor, start_loop_monitor, stop_loop_monitor
+from app.metrics import CONTENT_TYPE, REGISTRY, MetricsMiddleware
+from app.segment_cache import get_segment_cache
+from app.thumbnails import get_thumbnail_cache
+from app.timezone_lookup import get_timezone_lookup
 from app.routers import streams, clips, visitor
 
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open shared resources on startup and release them on shutdown."""
+    upstream.open_client()
+    if settings.LOOP_MONITOR:
+        await start_loop_monitor(
+            settings.LOOP_MONITOR_INTERVAL_SECONDS, settings.LOOP_BLOCK_THRESHOLD_SECONDS
+        )
+    refresher = asyncio.create_task(streams.run_live_url_refresher())
+    await run_blocking(load_snapshot, clip_index, snapshot_path())
+    if settings.CLIP_WATCHER:
+        await start_clip_watcher(streams.all_clips_dirs(), settings.CLIP_RESCAN_SECONDS)
+    background = [refresher]
+    if settings.STREAM_RELOAD_SECONDS > 0:
+        background.append(asyncio.create_task(streams.run_stream_reloader()))
+    if settings.INDEX_SNAPSHOT_SECONDS > 0:
+        background.append(
+            asyncio.create_task(
+                run_snapshot_writer(clip_index, snapshot_path(), settings.INDEX_SNAPSHOT_SECONDS)
+            )
+        )
+    yield
+    for task in background:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    await stop_clip_watcher()
+    try:
+        await run_blocking(save_snapshot, clip_index, snapshot_path())
+    except OSError as exc:
+        logger.warning("Cannot write clip index snapshot: %s", exc)
+    await upstream.close_client()
+    await stop_loop_monitor()
+    shutdown_executor()
+
 
 # Create FastAPI app
-app = FastAPI(title=settings.APP_NAME, version=settings.VERSION, debug=settings.DEBUG)
+app = FastAPI(
+    title=settings.APP_NAME, version=settings.VERSION, debug=settings.DEBUG, lifespan=lifespan
+)
 
 # CORS middleware
 app.add_middleware(
@@ -21,11 +77,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so requests are timed through CORS handling too
+app.add_middleware(MetricsMiddleware)
+
 # API routes
 app.include_router(streams.router, prefix=f"{settings.API_PREFIX}/streams", tags=["streams"])
 app.include_router(clips.router, prefix=f"{settings.API_PREFIX}/clips", tags=["clips"])
 app.include_router(visitor.router, prefix=f"{settings.API_PREFIX}/visitor", tags=["visitor"])
 
+
+# Registered before the frontend's catch-all route, which would otherwise shadow it
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics in the text exposition format."""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
 # Serve frontend static files (built by Vite)
 static_dir = Path(__file__).parent.parent / "frontend" / "dist"
 if static_dir.exists():
@@ -46,12 +113,31 @@ if static_dir.exists():
         return FileResponse(static_dir / "index.html")
 
 
+def _cache_stats() -> dict:
+    """Every cache's stats; some count SQLite rows or open the cache directory."""
+    watcher = get_clip_watcher()
+    return {
+        "streams": settings.stream_registry_stats(),
+        "durations": get_duration_cache().stats(),
+        "clip_index": clip_index.stats(),
+        "clip_watcher": watcher.stats() if watcher else None,
+        "events": get_event_store().stats(),
+        "segments": get_segment_cache().stats(),
+        "playlists": get_playlist_cache().stats(),
+        "thumbnails": get_thumbnail_cache().stats(),
+        "visitor_timezones": get_timezone_lookup().stats(),
+    }
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
+    monitor = get_loop_monitor()
     return {
         "status": "ok",
         "app": settings.APP_NAME,
         "version": settings.VERSION,
         "env": settings.ENV,
+        "caches": await run_blocking(_cache_stats),
+        "event_loop": monitor.stats() if monitor else None,
     }
@@ -0,0 +1,313 @@
+"""Prometheus metrics in the text exposition format, without a client library.
+
+Counters and histograms are kept in process and rendered by GET /metrics.
+MetricsMiddleware times every HTTP request and labels it with the route
+template (not the raw path) and the stream it was for, so label cardinality is
+bounded by the app's routes and the configured streams. Other modules count
+their own work: subprocesses (ffprobe, yt-dlp), upstream HLS fetches, file
+bytes served, directory scans and visitor timezone lookups.
+
+Metrics can be updated from worker threads; each one has its own lock.
+"""
+import asyncio
+import bisect
+import math
+import subprocess
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Request latencies, from a cached JSON answer to a 30s yt-dlp resolution
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class Metric(ABC):
+    """A named metric family with a fixed set of label names."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> List[Tuple[str, Sequence[str], Sequence[str], float]]:
+        """(name suffix, label names, label values, value) for every series."""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, names, values, value in self.samples():
+            labels = _format_labels(names, values)
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """A monotonically increasing count per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [("", self.labelnames, key, value) for key, value in items]
+
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets per label set, with sum and count."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last is +Inf), sum]
+        self._series: Dict[LabelValues, List] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the duration of the with block, even if it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return sum(series[0]) if series else 0
+
+    def samples(self):
+        with self._lock:
+            items = sorted(
+                (key, (list(counts), total)) for key, (counts, total) in self._series.items()
+            )
+        bucket_names = self.labelnames + ("le",)
+        samples = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                samples.append(("_bucket", bucket_names, key + (_format_value(bound),), cumulative))
+            samples.append(("_sum", self.labelnames, key, total))
+            samples.append(("_count", self.labelnames, key, cumulative))
+        return samples
+
+
+M = TypeVar("M", bound=Metric)
+
+
+class Registry:
+    """The metrics exported by /metrics, in registration order."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: M) -> M:
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def histogram(
+    name: str,
+    documentation: str,
+    labelnames: Sequence[str] = (),
+    buckets: Sequence[float] = LATENCY_BUCKETS,
+) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+HTTP_REQUESTS = counter(
+    "kanyo_http_requests_total",
+    "HTTP requests by route template, stream and status code.",
+    ("method", "route", "stream", "status"),
+)
+HTTP_LATENCY = histogram(
+    "kanyo_http_request_duration_seconds",
+    "Time from request to the end of the response body.",
+    ("method", "route", "stream"),
+)
+SUBPROCESS_RUNS = counter(
+    "kanyo_subprocess_runs_total",
+    "External commands run, by outcome (ok, error, timeout, missing).",
+    ("command", "outcome"),
+)
+SUBPROCESS_LATENCY = histogram(
+    "kanyo_subprocess_duration_seconds",
+    "Wall time of external commands.",
+    ("command",),
+)
+HLS_UPSTREAM_BYTES = counter(
+    "kanyo_hls_upstream_bytes_total",
+    "Bytes received from the HLS CDN, by kind (manifest, playlist, segment).",
+    ("kind",),
+)
+HLS_UPSTREAM_LATENCY = histogram(
+    "kanyo_hls_upstream_duration_seconds",
+    "Time to fetch a manifest, playlist or whole segment from the HLS CDN.",
+    ("kind", "outcome"),
+)
+DIRECTORY_SCANS = counter(
+    "kanyo_directory_scans_total",
+    "Day directories listed to (re)build the clip index.",
+)
+FILE_BYTES_SERVED = counter(
+    "kanyo_file_bytes_served_total",
+    "File bytes sent to clients (clips, frames, thumbnails, sprites, snapshots), by media type.",
+    ("kind",),
+)
+VISITOR_TIMEZONE_LOOKUPS = counter(
+    "kanyo_visitor_timezone_lookups_total",
+    "Visitor timezone detections, by where the answer came from (table, online, none, private).",
+    ("source",),
+)
+
+
+def subprocess_outcome(exc: BaseException) -> str:
+    """The SUBPROCESS_RUNS outcome for a command that could not finish."""
+    if isinstance(exc, subprocess.TimeoutExpired):
+        return "timeout"
+    if isinstance(exc, FileNotFoundError):
+        return "missing"
+    return "error"
+
+
+def stream_label(stream_id: Optional[str]) -> str:
+    """The stream label for a request: configured stream ids only, so it stays bounded."""
+    if not stream_id:
+        return ""
+    return stream_id if stream_id in settings.streams else "unknown"
+
+
+def route_label(scope: Scope) -> str:
+    """The matched route's template (e.g. /api/streams/{stream_id}/events)."""
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    if path is None:
+        return "unmatched"
+    # The frontend's catch-all serves every client-side route; one series is enough
+    return "/{frontend}" if path == "/{full_path:path}" else path
+
+
+# Task serving each in-flight request -> its scope, so app.loop_monitor can name
+# the route that was running when the event loop stalled
+active_requests: Dict["asyncio.Task[Any]", Scope] = {}
+
+
+class MetricsMiddleware:
+    """Counts and times HTTP requests by route template and stream.
+
+    Pure ASGI so streamed bodies are timed to their last byte, without the
+    buffering BaseHTTPMiddleware adds.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+        task = asyncio.current_task()
+        if task is not None:
+            active_requests[task] = scope
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            if task is not None and active_requests.get(task) is scope:
+                del active_requests[task]
+            # The router fills in the matched route and its path parameters
+            route = route_label(scope)
+            stream = stream_label((scope.get("path_params") or {}).get("stream_id"))
+            method = scope["method"]
+            HTTP_LATENCY.observe(
+                time.perf_counter() - start, method=method, route=route, stream=stream
+            )
+            HTTP_REQUESTS.inc(method=method, route=route, stream=stream, status=str(status))
@@ -0,0 +1,130 @@
+"""Minimal ISO-BMFF (MP4) reader for clip durations.
+
+Only box headers are walked; media data is skipped with seek(), so reading a
+duration costs a handful of small reads regardless of clip size. This works
+whether the recorder wrote moov before mdat (faststart) or after it.
+"""
+import struct
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+# Refuse to buffer absurd moov boxes; recorder clips have moov well under 1 MB.
+MAX_MOOV_SIZE = 16 * 1024 * 1024
+
+
+def _iter_boxes(
+    data: bytes, start: int = 0, end: Optional[int] = None
+) -> Iterator[Tuple[bytes, int, int]]:
+    """Yield (type, payload_start, payload_end) for boxes in an in-memory buffer."""
+    end = len(data) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, pos)
+        header = 8
+        if size == 1:
+            if pos + 16 > end:
+                return
+            size = struct.unpack_from(">Q", data, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            return
+        yield box_type, pos + header, pos + size
+        pos += size
+
+
+def _find_moov(f: BinaryIO, file_size: int) -> Optional[bytes]:
+    """Seek through top-level boxes and return the moov payload."""
+    pos = 0
+    while pos + 8 <= file_size:
+        f.seek(pos)
+        header = f.read(16)
+        if len(header) < 8:
+            return None
+        size, box_type = struct.unpack_from(">I4s", header)
+        header_len = 8
+        if size == 1:
+            if len(header) < 16:
+                return None
+            size = struct.unpack_from(">Q", header, 8)[0]
+            header_len = 16
+        elif size == 0:
+            size = file_size - pos
+        if size < header_len:
+            return None
+        if box_type == b"moov":
+            payload_size = size - header_len
+            if payload_size > MAX_MOOV_SIZE:
+                return None
+            f.seek(pos + header_len)
+            payload = f.read(payload_size)
+            return payload if len(payload) == payload_size else None
+        pos += size
+    return None
+
+
+def _parse_time_box(data: bytes, start: int, end: int) -> Optional[Tuple[int, int]]:
+    """Return (timescale, duration) from an mvhd or mdhd payload."""
+    if end - start < 4:
+        return None
+    version = data[start]
+    if version == 1:
+        if end - start < 32:
+            return None
+        timescale, duration = struct.unpack_from(">IQ", data, start + 20)
+        unknown = 0xFFFFFFFFFFFFFFFF
+    else:
+        if end - start < 20:
+            return None
+        timescale, duration = struct.unpack_from(">II", data, start + 12)
+        unknown = 0xFFFFFFFF
+    if timescale == 0 or duration == unknown:
+        return None
+    return timescale, duration
+
+
+def _to_us(timescale: int, duration: int) -> int:
+    return duration * 1_000_000 // timescale
+
+
+def parse_moov_duration_us(moov: bytes) -> Optional[int]:
+    """Duration in microseconds from a moov payload.
+
+    Uses mvhd, falling back to the longest track's mdhd when the movie header
+    carries no duration (e.g. fragmented files written incrementally).
+    """
+    movie: Optional[Tuple[int, int]] = None
+    track_durations = []
+    for box_type, start, end in _iter_boxes(moov):
+        if box_type == b"mvhd":
+            movie = _parse_time_box(moov, start, end)
+        elif box_type == b"trak":
+            for trak_child, t_start, t_end in _iter_boxes(moov, start, end):
+                if trak_child != b"mdia":
+                    continue
+                for mdia_child, m_start, m_end in _iter_boxes(moov, t_start, t_end):
+                    if mdia_child == b"mdhd":
+                        parsed = _parse_time_box(moov, m_start, m_end)
+                        if parsed and parsed[1]:
+                            track_durations.append(_to_us(*parsed))
+
+    if movie and movie[1]:
+        return _to_us(*movie)
+    if track_durations:
+        return max(track_durations)
+    return None
+
+
+def read_mp4_duration_us(path: Path) -> Optional[int]:
+    """Read a clip's duration in microseconds, or None if it can't be determined."""
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, 2)
+            file_size = f.tell()
+            moov = _find_moov(f, file_size)
+    except OSError:
+        return None
+    if moov is None:
+        return None
+    return parse_moov_duration_us(moov)
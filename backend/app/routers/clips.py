@@ -1,13 +1,23 @@
 """Clip serving endpoints."""
 from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse
 from pathlib import Path
+import os
 import re
+import stat
+import time
+from typing import Optional, Tuple
 
+from app.blocking import run_blocking
 from app.config import settings
+from app.file_responses import RangeFileResponse
+from app.http_cache import NO_CACHE, immutable, make_etag
+from app.thumbnails import FORMATS, get_thumbnail_cache, size_bucket
 
 router = APIRouter()
 
+# A file modified more recently than this may still be being written
+_CLIP_SETTLE_SECONDS = 60
+
 
 def is_safe_path(base_path: Path, requested_path: Path) -> bool:
     """Check if requested path is within base path (prevent path traversal)."""
@@ -19,12 +29,10 @@ def is_safe_path(base_path: Path, requested_path: Path) -> bool:
         return False
 
 
-@router.get("/{stream_id}/{date}/{filename}")
-async def serve_clip(stream_id: str, date: str, filename: str):
-    """
-    Serve a clip or thumbnail file.
+def clip_path(stream_id: str, date: str, filename: str) -> Tuple[Path, Path]:
+    """Validate a clip request; return the clips directory and the file's path.
 
-    Security: Validates path to prevent directory traversal attacks.
+    Neither is checked on disk yet: stat_clip does that, off the event loop.
     """
     # Validate stream exists
     stream_config = settings.streams.get(stream_id)
@@ -46,16 +54,95 @@ async def serve_clip(stream_id: str, date: str, filename: str):
 
     # Construct file path
     clips_dir = Path(data_path) / "clips"
-    file_path = clips_dir / date / filename
+    return clips_dir, clips_dir / date / filename
+
+
+def _stat_within(base_path: Path, file_path: Path) -> Tuple[bool, Optional[os.stat_result]]:
+    """(whether file_path resolves inside base_path, its stat or None) (blocking)."""
+    if not is_safe_path(base_path, file_path):
+        return False, None
+    try:
+        return True, os.stat(file_path)
+    except OSError:
+        return True, None
 
+
+async def stat_clip(clips_dir: Path, file_path: Path) -> os.stat_result:
+    """Stat a clip file: 403 if it resolves outside clips_dir, 404 if it doesn't exist."""
     # Security check: ensure path is within clips directory
-    if not is_safe_path(clips_dir, file_path):
+    safe, stat_result = await run_blocking(_stat_within, clips_dir, file_path)
+    if not safe:
         raise HTTPException(status_code=403, detail="Access denied")
-
-    # Check if file exists
-    if not file_path.exists():
+    if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
         raise HTTPException(status_code=404, detail="File not found")
+    return stat_result
+
+
+def clip_cache_control(stat_result: os.stat_result) -> str:
+    """Immutable once a file has settled; revalidated while it may still be written."""
+    settled = time.time() - stat_result.st_mtime >= _CLIP_SETTLE_SECONDS
+    return immutable(settings.CLIP_MAX_AGE_SECONDS) if settled else NO_CACHE
+
+
+@router.get("/{stream_id}/{date}/thumbnails/{size}/{filename}")
+async def serve_thumbnail(stream_id: str, date: str, size: int, filename: str):
+    """
+    Serve a frame scaled down to a width bucket, as JPEG or WebP by extension.
+
+    size is snapped up to the nearest of SIZE_BUCKETS so arbitrary widths can't
+    fill the cache. Variants are rendered once and served from disk after that.
+    """
+    match = re.match(r"^(falcon_\d{6}_(?:arrival|departure|visit))\.(jpg|webp)$", filename)
+    if not match:
+        raise HTTPException(status_code=400, detail="Invalid filename")
+    if size <= 0:
+        raise HTTPException(status_code=400, detail="Invalid size")
+    stem, fmt = match.groups()
+
+    clips_dir, source = clip_path(stream_id, date, f"{stem}.jpg")
+    source_stat = await stat_clip(clips_dir, source)
+    try:
+        path, variant_stat = await get_thumbnail_cache().get(
+            source, source_stat, size_bucket(size), fmt
+        )
+    except OSError as e:
+        raise HTTPException(status_code=500, detail=f"Cannot make thumbnail: {e}")
+
+    headers = {
+        "ETag": make_etag(path.name),
+        "Cache-Control": clip_cache_control(source_stat),
+    }
+    return RangeFileResponse(
+        path=path,
+        media_type=FORMATS[fmt][1],
+        stat_result=variant_stat,
+        headers=headers,
+    )
+
+
+@router.get("/{stream_id}/{date}/{filename}")
+async def serve_clip(stream_id: str, date: str, filename: str):
+    """
+    Serve a clip or thumbnail file, honouring Range and conditional requests.
+
+    Finished files never change under their name, so they are cacheable as
+    immutable; one still being written is revalidated instead.
+
+    Security: Validates path to prevent directory traversal attacks.
+    """
+    clips_dir, file_path = clip_path(stream_id, date, filename)
+    stat_result = await stat_clip(clips_dir, file_path)
 
-    # Serve file
+    # Serve file; Range requests get 206 so players can seek without downloading it all
     media_type = "video/mp4" if filename.endswith(".mp4") else "image/jpeg"
-    return FileResponse(path=file_path, media_type=media_type, filename=filename)
+    headers = {
+        "ETag": make_etag(date, filename, stat_result.st_size, stat_result.st_mtime_ns),
+        "Cache-Control": clip_cache_control(stat_result),
+    }
+    return RangeFileResponse(
+        path=file_path,
+        media_type=media_type,
+        filename=filename,
+        stat_result=stat_result,
+        headers=headers,
+    )
@@ -1,46 +1,96 @@
 """Stream information endpoints."""
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import Response
+import asyncio
+from dataclasses import dataclass
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
 from pathlib import Path
 from datetime import datetime, timedelta, tzinfo
-from typing import List, Dict, Any, Optional
-import json
+from typing import List, Dict, Any, Optional, Tuple
+import logging
 import os
+import random
 import subprocess
 import tempfile
 import shutil
 import time
-from urllib.parse import urlparse, quote
+from urllib.parse import urlparse
 import httpx
 import pytz
 
-from app.config import settings
+from app import upstream
+from app.blocking import run_blocking
+from app.clip_index import (
+    IMAGE_EXTENSIONS,
+    VIDEO_EXTENSIONS,
+    DayIndex,
+    clip_datetime,
+    clip_index,
+)
+from app.clip_watcher import get_clip_watcher
+from app.config import StreamChanges, settings
+from app.durations import get_duration_cache
+from app.event_store import EventStore, get_event_store
+from app.file_responses import RangeFileResponse
+from app.http_cache import (
+    NO_CACHE,
+    Validators,
+    conditional_json,
+    fresh_for,
+    immutable,
+    make_etag,
+)
+from app.metrics import (
+    HLS_UPSTREAM_BYTES,
+    HLS_UPSTREAM_LATENCY,
+    SUBPROCESS_LATENCY,
+    SUBPROCESS_RUNS,
+)
+from app.hls import get_playlist_cache, looks_like_playlist, rewrite_playlist, segment_proxy_prefix
+from app.segment_cache import SegmentFetchError, get_segment_cache
+from app.thumbnails import (
+    FORMATS,
+    SPRITE_COLUMNS,
+    SPRITE_TILE,
+    get_thumbnail_cache,
+    render_sprite,
+    sprite_grid,
+)
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
-# In-memory cache for resolved HLS URLs: {stream_id: {"url": str, "resolved_at": float}}
+# In-memory cache for resolved HLS URLs:
+# {stream_id: {"url": str, "resolved_at": float, "refresh_at": float}}
 _live_url_cache: Dict[str, Dict[str, Any]] = {}
 _LIVE_URL_TTL_SECONDS = 4 * 60 * 60  # 4 hours (YouTube URLs expire ~6h)
 
+# yt-dlp resolutions in progress: {stream_id: task}. Viewers that miss the cache
+# while a resolution is running wait for it instead of starting their own.
+_live_url_inflight: Dict[str, "asyncio.Task[str]"] = {}
 
-async def _resolve_or_get_live_url(stream_id: str) -> str:
-    """Return the cached HLS manifest URL for a stream, resolving via yt-dlp if needed."""
-    stream_config = settings.streams.get(stream_id)
-    if not stream_config:
-        raise HTTPException(status_code=404, detail=f"Stream {stream_id} not found")
+# Background pre-refresh: URLs of streams watched recently are re-resolved shortly
+# before their TTL runs out (jittered so streams don't all refresh at once), and
+# past the TTL the old URL keeps being served for a grace period while a refresh runs.
+_LIVE_URL_REFRESH_LEAD_SECONDS = 15 * 60
+_LIVE_URL_REFRESH_JITTER_SECONDS = 5 * 60
+_LIVE_URL_REFRESH_RETRY_SECONDS = 60
+_LIVE_URL_STALE_SECONDS = 60 * 60
+_LIVE_URL_ACTIVE_WINDOW_SECONDS = 30 * 60
+_LIVE_URL_REFRESH_POLL_SECONDS = 30
 
-    youtube_id = stream_config.get("youtube_id")
-    if not youtube_id:
-        raise HTTPException(
-            status_code=422, detail=f"Stream {stream_id} has no YouTube video source"
-        )
+# A finished day can still gain the clip of a visit that began before midnight,
+# so its responses are only cached as immutable once it has been over this long.
+_DAY_SETTLE_SECONDS = 60 * 60
+
+# {stream_id: last time a viewer asked for the live URL}
+_live_url_activity: Dict[str, float] = {}
+# {stream_id: {"at": float, "outcome": "ok" | "error", "error": str | None}}
+_live_url_refresh_status: Dict[str, Dict[str, Any]] = {}
 
-    # Return cached URL if still valid
-    cached = _live_url_cache.get(stream_id)
-    if cached and (time.time() - cached["resolved_at"]) < _LIVE_URL_TTL_SECONDS:
-        return cached["url"]
 
-    # Resolve fresh URL via yt-dlp
+def _run_ytdlp(youtube_id: str) -> str:
+    """Resolve a YouTube live video to its HLS manifest URL (blocking)."""
     youtube_url = f"https://www.youtube.com/watch?v={youtube_id}"
     cookies_path = "/app/cookies.txt"
 
@@ -59,10 +109,13 @@ async def _resolve_or_get_live_url(stream_id: str) -> str:
         cmd = ["yt-dlp", "--js-runtimes", "node", "-f", "best[height<=720]", "-g", youtube_url]
 
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+        with SUBPROCESS_LATENCY.time(command="yt-dlp"):
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
     except subprocess.TimeoutExpired:
+        SUBPROCESS_RUNS.inc(command="yt-dlp", outcome="timeout")
         raise HTTPException(status_code=504, detail="yt-dlp timed out resolving stream URL")
     except FileNotFoundError:
+        SUBPROCESS_RUNS.inc(command="yt-dlp", outcome="missing")
         raise HTTPException(status_code=503, detail="yt-dlp not available in this environment")
     finally:
         if tmp_cookies:
@@ -71,6 +124,7 @@ async def _resolve_or_get_live_url(stream_id: str) -> str:
             except OSError:
                 pass
 
+    SUBPROCESS_RUNS.inc(command="yt-dlp", outcome="ok" if result.returncode == 0 else "error")
     if result.returncode != 0:
         raise HTTPException(
             status_code=502,
@@ -80,11 +134,121 @@ async def _resolve_or_get_live_url(stream_id: str) -> str:
     resolved_url = result.stdout.strip().splitlines()[0]
     if not resolved_url:
         raise HTTPException(status_code=502, detail="yt-dlp returned empty URL")
+    return resolved_url
+
+
+async def _resolve_or_get_live_url(stream_id: str) -> str:
+    """Return the cached HLS manifest URL for a stream, resolving via yt-dlp if needed."""
+    stream_config = settings.streams.get(stream_id)
+    if not stream_config:
+        raise HTTPException(status_code=404, detail=f"Stream {stream_id} not found")
+
+    youtube_id = stream_config.get("youtube_id")
+    if not youtube_id:
+        raise HTTPException(
+            status_code=422, detail=f"Stream {stream_id} has no YouTube video source"
+        )
 
-    _live_url_cache[stream_id] = {"url": resolved_url, "resolved_at": time.time()}
+    now = time.time()
+    _live_url_activity[stream_id] = now
+
+    # Return cached URL if still usable, kicking off a refresh if one is due
+    cached = _live_url_cache.get(stream_id)
+    if cached and _is_servable(cached, now):
+        if now >= _refresh_at(cached):
+            _start_live_url_resolution(stream_id, youtube_id)
+        return cached["url"]
+
+    # Shielded so one viewer disconnecting doesn't cancel the resolution for the rest
+    return await asyncio.shield(_start_live_url_resolution(stream_id, youtube_id))
+
+
+def _is_servable(entry: Dict[str, Any], now: float) -> bool:
+    """Fresh, or expired but within the stale grace period while a refresh is due."""
+    return now - entry["resolved_at"] < _LIVE_URL_TTL_SECONDS + _LIVE_URL_STALE_SECONDS
+
+
+def _refresh_at(entry: Dict[str, Any]) -> float:
+    return entry.get(
+        "refresh_at", entry["resolved_at"] + _LIVE_URL_TTL_SECONDS - _LIVE_URL_REFRESH_LEAD_SECONDS
+    )
+
+
+def _start_live_url_resolution(stream_id: str, youtube_id: str) -> "asyncio.Task[str]":
+    """Single-flight: only one yt-dlp per stream, every waiter gets its result or error."""
+    task = _live_url_inflight.get(stream_id)
+    if task is None:
+        task = asyncio.ensure_future(_resolve_live_url(stream_id, youtube_id))
+        _live_url_inflight[stream_id] = task
+        task.add_done_callback(lambda t: _finish_live_url_resolution(stream_id, t))
+    return task
+
+
+async def _resolve_live_url(stream_id: str, youtube_id: str) -> str:
+    """Run yt-dlp for a stream and cache the resulting URL."""
+    try:
+        # Off the event loop: yt-dlp can take up to 30s
+        resolved_url = await run_blocking(_run_ytdlp, youtube_id)
+    except HTTPException as exc:
+        _live_url_refresh_status[stream_id] = {
+            "at": time.time(),
+            "outcome": "error",
+            "error": exc.detail,
+        }
+        # Keep serving any still-usable URL and retry the refresh shortly
+        stale = _live_url_cache.get(stream_id)
+        if stale:
+            stale["refresh_at"] = time.time() + _LIVE_URL_REFRESH_RETRY_SECONDS
+        raise
+
+    resolved_at = time.time()
+    _live_url_cache[stream_id] = {
+        "url": resolved_url,
+        "resolved_at": resolved_at,
+        "refresh_at": resolved_at
+        + _LIVE_URL_TTL_SECONDS
+        - _LIVE_URL_REFRESH_LEAD_SECONDS
+        - random.uniform(0, _LIVE_URL_REFRESH_JITTER_SECONDS),
+    }
+    _live_url_refresh_status[stream_id] = {"at": resolved_at, "outcome": "ok", "error": None}
     return resolved_url
 
 
+async def refresh_live_urls() -> None:
+    """Pre-refresh due URLs for streams with recent viewers (one pass)."""
+    now = time.time()
+    due = []
+    for stream_id, entry in list(_live_url_cache.items()):
+        if now - _live_url_activity.get(stream_id, 0) > _LIVE_URL_ACTIVE_WINDOW_SECONDS:
+            continue
+        if now < _refresh_at(entry) or stream_id in _live_url_inflight:
+            continue
+        stream_config = settings.streams.get(stream_id)
+        if not stream_config or not stream_config.get("youtube_id"):
+            continue
+        due.append(_start_live_url_resolution(stream_id, stream_config["youtube_id"]))
+    # Failures are recorded in _live_url_refresh_status
+    await asyncio.gather(*due, return_exceptions=True)
+
+
+async def run_live_url_refresher() -> None:
+    """Background task (started by the app lifespan) keeping watched streams warm."""
+    while True:
+        await asyncio.sleep(_LIVE_URL_REFRESH_POLL_SECONDS)
+        try:
+            await refresh_live_urls()
+        except Exception:
+            logger.exception("Live URL refresh pass failed")
+
+
+def _finish_live_url_resolution(stream_id: str, task: "asyncio.Task[str]") -> None:
+    if _live_url_inflight.get(stream_id) is task:
+        del _live_url_inflight[stream_id]
+    # Mark the error as retrieved even if every waiter has gone away
+    if not task.cancelled():
+        task.exception()
+
+
 def get_stream_timezone(stream_id: str) -> tzinfo:
     """Get timezone for a stream."""
     stream_config = settings.streams.get(stream_id)
@@ -106,136 +270,121 @@ def get_clips_dir(stream_id: str) -> Path:
         raise HTTPException(status_code=500, detail=f"No data_path configured for {stream_id}")
 
     clips_dir = Path(data_path) / "clips"
-    if not clips_dir.exists():
+    # A watched clips directory is known to exist; only unwatched ones are checked
+    if not clip_index.is_trusted(clips_dir) and not clips_dir.exists():
         raise HTTPException(status_code=500, detail=f"Clips directory not found: {clips_dir}")
 
     return clips_dir
 
 
-def find_most_recent_date_with_events(
-    clips_dir: Path, start_date: datetime, tz: tzinfo
-) -> Optional[str]:
-    """Find the most recent date with events, searching backwards from start_date."""
-    current_date = start_date
-
-    # Search up to 30 days back
-    for _ in range(30):
-        date_str = current_date.strftime("%Y-%m-%d")
-        date_dir = clips_dir / date_str
-
-        if date_dir.exists():
-            events_file = date_dir / f"events_{date_str}.json"
-            if events_file.exists():
-                # Check if it has any arrival/departure events
-                try:
-                    with open(events_file, "r") as f:
-                        events = json.load(f)
-                        # Filter for arrivals/departures
-                        filtered = [
-                            e
-                            for e in events
-                            if "_arrival" in e.get("thumbnail_path", "")
-                            or "_departure" in e.get("departure_clip_path", "")
-                        ]
-                        if filtered:
-                            return date_str
-                except Exception:
-                    pass
-
-        # Move to previous day
-        current_date = current_date - timedelta(days=1)
-
-    return None
+def all_clips_dirs() -> List[Path]:
+    """Clips directories of every configured stream."""
+    return [
+        Path(config["data_path"]) / "clips"
+        for config in settings.streams.values()
+        if config.get("data_path")
+    ]
+
+
+def synced_event_store(
+    stream_id: str, start_date: str = "", end_date: str = "9999-12-31"
+) -> EventStore:
+    """The event store, brought up to date for one stream's days in a range (blocking)."""
+    store = get_event_store()
+    tz = get_stream_timezone(stream_id)
+    store.sync(stream_id, get_clips_dir(stream_id), tz, start_date, end_date)
+    return store
+
+
+def localize(tz: tzinfo, naive: datetime) -> datetime:
+    return tz.localize(naive) if hasattr(tz, "localize") else naive.replace(tzinfo=tz)
+
+
+def day_is_settled(date_str: str, tz: tzinfo) -> bool:
+    """Whether date_str ended, in the stream's timezone, long enough ago to be final."""
+    try:
+        end = localize(tz, datetime.strptime(date_str, "%Y-%m-%d") + timedelta(days=1))
+    except (ValueError, OverflowError):
+        return False
+    return datetime.now(tz) >= end + timedelta(seconds=_DAY_SETTLE_SECONDS)
+
+
+def day_range_validators(
+    store: EventStore, stream_id: str, kind: str, start_date: str, end_date: str, *extra: Any
+) -> Validators:
+    """Validators for a response built only from stream_id's days in [start_date, end_date].
+
+    The ETag comes from the event store's day fingerprints (store must be synced),
+    so it is known without building the response and survives restarts.
+    Ranges that ended before today are served as immutable; the rest revalidate.
+    """
+    tz = get_stream_timezone(stream_id)
+    fingerprints = store.day_fingerprints(stream_id, start_date, end_date)
+    mtime_ns = clip_index.last_modified_ns(get_clips_dir(stream_id), start_date, end_date)
+    settled = day_is_settled(end_date, tz)
+    return Validators(
+        etag=make_etag(kind, stream_id, start_date, end_date, *extra, *fingerprints),
+        cache_control=immutable(settings.PAST_DAY_MAX_AGE_SECONDS) if settled else NO_CACHE,
+        last_modified=mtime_ns / 1e9 if mtime_ns is not None else None,
+    )
+
+
+def find_most_recent_date_with_events(stream_id: str, start_date: datetime) -> Optional[str]:
+    """Most recent date with recorded events, up to 30 days back from start_date."""
+    newest, oldest = start_date.strftime("%Y-%m-%d"), start_date - timedelta(days=30)
+    store = synced_event_store(stream_id, oldest.strftime("%Y-%m-%d"), newest)
+    return store.latest_recorded_date(stream_id, newest, oldest.strftime("%Y-%m-%d"))
+
+
+def event_id(date_str: str, time_str: str) -> str:
+    return f"{date_str.replace('-', '')}_{time_str}"
+
+
+def event_thumbnail(day: DayIndex, time_str: str) -> str:
+    """Frame shown for the visit at time_str, or "" if it has none."""
+    # Check for thumbnail: try _visit.jpg first, then _arrival.jpg
+    # (recording system saves arrival captures as _arrival.jpg)
+    thumbnail = f"falcon_{time_str}_visit.jpg"
+    if thumbnail not in day.names:
+        thumbnail = f"falcon_{time_str}_arrival.jpg"
+    if thumbnail not in day.names:
+        thumbnail = ""
+    return thumbnail
 
 
 def load_events_for_date(stream_id: str, date_str: str) -> List[Dict[str, Any]]:
     """Load visit clips with duration for HKSV-style timeline."""
     clips_dir = get_clips_dir(stream_id)
-    date_dir = clips_dir / date_str
-
-    if not date_dir.exists():
-        return []
 
     try:
-        import re
-        import subprocess
-
-        # Pattern: falcon_HHMMSS_visit.mp4 (only visit clips)
-        pattern = re.compile(r"falcon_(\d{6})_visit\.(mp4|avi|mov|mkv)$")
+        day = clip_index.day(clips_dir, date_str)
+        if day is None:
+            return []
 
+        durations = get_duration_cache()
+        tz = get_stream_timezone(stream_id)
         filtered_events = []
 
-        # Scan all visit video files in the directory
-        for clip_file in sorted(date_dir.iterdir()):
-            if not clip_file.is_file():
+        # Only visit video clips (falcon_HHMMSS_visit.mp4 etc.)
+        for clip in day.clips:
+            if clip.clip_type != "visit" or not clip.is_video:
                 continue
 
-            match = pattern.match(clip_file.name)
-            if not match:
-                continue
+            timestamp_dt = clip_datetime(tz, date_str, clip.time_str)
 
-            time_str, ext = match.groups()
-
-            # Parse time to create timestamp
-            hour = time_str[:2]
-            minute = time_str[2:4]
-            second = time_str[4:6]
-
-            # Get stream timezone for proper timestamp
-            tz = get_stream_timezone(stream_id)
-            date_obj = datetime.strptime(date_str, "%Y-%m-%d")
-            timestamp_dt = (
-                tz.localize(
-                    date_obj.replace(hour=int(hour), minute=int(minute), second=int(second))
-                )
-                if hasattr(tz, "localize")
-                else date_obj.replace(
-                    hour=int(hour), minute=int(minute), second=int(second), tzinfo=tz
-                )
+            # Duration is probed once per clip and cached across requests/restarts
+            duration = durations.get_duration(
+                day.path / clip.name, size=clip.size, mtime_ns=clip.mtime_ns
             )
 
-            # Get video duration using ffprobe
-            duration = 0.0
-            try:
-                result = subprocess.run(
-                    [
-                        "ffprobe",
-                        "-v",
-                        "error",
-                        "-show_entries",
-                        "format=duration",
-                        "-of",
-                        "default=noprint_wrappers=1:nokey=1",
-                        str(clip_file),
-                    ],
-                    capture_output=True,
-                    text=True,
-                    timeout=5,
-                )
-                if result.returncode == 0:
-                    duration = float(result.stdout.strip())
-            except Exception:
-                # Fallback: estimate from file size (very rough)
-                file_size_mb = clip_file.stat().st_size / (1024 * 1024)
-                duration = file_size_mb * 10  # Rough estimate: ~10s per MB
-
-            # Check for thumbnail: try _visit.jpg first, then _arrival.jpg
-            # (recording system saves arrival captures as _arrival.jpg)
-            thumb_file = clip_file.with_suffix(".jpg")
-            if not thumb_file.exists():
-                thumb_file = clip_file.with_name(
-                    clip_file.stem.replace("_visit", "_arrival") + ".jpg"
-                )
-            thumbnail = thumb_file.name if thumb_file.exists() else ""
-
             filtered_events.append(
                 {
                     "type": "visit",
                     "timestamp": timestamp_dt.isoformat(),
-                    "thumbnail": thumbnail,
-                    "clip": clip_file.name,
+                    "thumbnail": event_thumbnail(day, clip.time_str),
+                    "clip": clip.name,
                     "duration": duration,
-                    "event_id": f"{date_str.replace('-', '')}_{time_str}",
+                    "event_id": event_id(date_str, clip.time_str),
                 }
             )
 
@@ -244,9 +393,35 @@ def load_events_for_date(stream_id: str, date_str: str) -> List[Dict[str, Any]]:
         raise HTTPException(status_code=500, detail=f"Error loading events: {str(e)}")
 
 
-def get_stats_for_range(stream_id: str, range_str: str) -> Dict[str, Any]:
-    """Get stats by scanning clips directory directly."""
-    import re
+def parse_range_bound(value: str, tz: tzinfo, end: bool = False) -> datetime:
+    """Parse a stats window bound: an ISO date (whole day) or datetime (stream-local if naive)."""
+    try:
+        if len(value) == 10:
+            parsed = datetime.strptime(value, "%Y-%m-%d")
+            if end:
+                parsed += timedelta(days=1)
+        else:
+            parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid date or datetime: {value}")
+    if parsed.tzinfo is None:
+        parsed = localize(tz, parsed)
+    return parsed
+
+
+def stats_window(
+    stream_id: str, range_str: str, start: Optional[str], end: Optional[str]
+) -> Tuple[datetime, Optional[datetime], str]:
+    """[cutoff, upper) of a stats request, and the range label reported for it.
+
+    A sliding window ("24h", "7d") ends now, so clips dated in the future wait
+    until their time comes.
+    """
+    tz = get_stream_timezone(stream_id)
+    if start:
+        cutoff = parse_range_bound(start, tz)
+        upper = parse_range_bound(end, tz, end=True) if end else None
+        return cutoff, upper, f"{start}/{end or ''}"
 
     # Parse range (e.g., "24h", "7d")
     hours = 24  # default
@@ -254,85 +429,80 @@ def get_stats_for_range(stream_id: str, range_str: str) -> Dict[str, Any]:
         hours = int(range_str[:-1])
     elif range_str.endswith("d"):
         hours = int(range_str[:-1]) * 24
-
-    clips_dir = get_clips_dir(stream_id)
-    tz = get_stream_timezone(stream_id)
     now = datetime.now(tz)
-    cutoff = now - timedelta(hours=hours)
+    return now - timedelta(hours=hours), now, range_str
 
-    # Get date folders to check
-    dates_to_check = set()
-    current = cutoff
-    while current <= now:
-        dates_to_check.add(current.strftime("%Y-%m-%d"))
-        current += timedelta(days=1)
 
-    # Pattern: falcon_HHMMSS_type.ext (completed files only)
-    # Only count .mp4 files (not .tmp, .log, or thumbnails)
-    pattern = re.compile(r"falcon_(\d{6})_(arrival|departure|visit)\.mp4$")
+def stats_dates(stream_id: str, cutoff: datetime, upper: Optional[datetime]) -> Tuple[str, str]:
+    """The stream-local days a stats window touches."""
+    tz = get_stream_timezone(stream_id)
+    start_date = cutoff.astimezone(tz).strftime("%Y-%m-%d")
+    if upper is None:
+        return start_date, "9999-12-31"
+    return start_date, (upper - timedelta(microseconds=1)).astimezone(tz).strftime("%Y-%m-%d")
+
+
+def stats_validators(
+    stream_id: str, range_str: str, start: Optional[str], end: Optional[str]
+) -> Validators:
+    """Validators for /stats, computed from the index without building the stats."""
+    cutoff, upper, label = stats_window(stream_id, range_str, start, end)
+    start_date, end_date = stats_dates(stream_id, cutoff, upper)
+    store = synced_event_store(stream_id, start_date, end_date)
+    extra: List[Any] = [label]
+    if not start:
+        # While its days are unchanged, a sliding window holds a run of the stream's
+        # clips in time order, pinned down by its length and its first clip.
+        extra.extend(store.extent_between(stream_id, cutoff, upper, extensions=("mp4",)))
+    validators = day_range_validators(store, stream_id, "stats", start_date, end_date, *extra)
+    if not start:
+        # The newest clip's mtime doesn't change when old clips leave the window;
+        # only the ETag tells a sliding window's responses apart.
+        validators.last_modified = None
+    return validators
+
+
+def get_stats_for_range(
+    stream_id: str, range_str: str, start: Optional[str] = None, end: Optional[str] = None
+) -> Dict[str, Any]:
+    """Get stats from the event store (completed .mp4 files only).
+
+    The window is either the last range_str ("24h", "7d") or [start, end).
+    """
+    tz = get_stream_timezone(stream_id)
+    cutoff, upper, range_str = stats_window(stream_id, range_str, start, end)
+    store = synced_event_store(stream_id, *stats_dates(stream_id, cutoff, upper))
 
     visits = 0
     events_by_time: dict = {}  # deduplicate by time
 
-    for date_str in sorted(dates_to_check):
-        date_path = clips_dir / date_str
-        if not date_path.exists():
-            continue
-
-        for clip_file in date_path.iterdir():
-            if not clip_file.is_file():
-                continue
-
-            match = pattern.match(clip_file.name)
-            if not match:
-                continue
-
-            time_str, clip_type = match.groups()
-
-            # Parse clip datetime
-            hour = int(time_str[:2])
-            minute = int(time_str[2:4])
-            second = int(time_str[4:6])
-
-            try:
-                clip_date = datetime.strptime(date_str, "%Y-%m-%d")
-                clip_dt = (
-                    tz.localize(clip_date.replace(hour=hour, minute=minute, second=second))
-                    if hasattr(tz, "localize")
-                    else clip_date.replace(hour=hour, minute=minute, second=second, tzinfo=tz)
-                )
-            except Exception:
+    # Only count .mp4 files (not .tmp, .log, or thumbnails)
+    for clip in store.clips_between(stream_id, cutoff, upper, extensions=("mp4",)):
+        time_str, clip_type = clip.time_str, clip.type
+
+        # Only count visit files for the visits stat
+        if clip_type == "visit":
+            visits += 1
+
+        # Track events (deduplicate by time, prefer arrival/departure over visit)
+        time_key = f"{time_str[:2]}:{time_str[2:4]}:{time_str[4:6]}"
+        if time_key in events_by_time:
+            existing = events_by_time[time_key]
+            # Prefer arrival/departure over visit
+            if existing["type"] in ["arrival", "departure"]:
                 continue
 
-            # Filter by cutoff time
-            if clip_dt < cutoff:
-                continue
+        events_by_time[time_key] = {
+            "time": time_key,
+            "type": clip_type,
+            "timestamp": clip_datetime(tz, clip.date, time_str).isoformat(),
+            "utc_timestamp": clip.utc_timestamp,
+        }
 
-            # Only count visit files for the visits stat
-            if clip_type == "visit":
-                visits += 1
-
-            # Track events (deduplicate by time, prefer arrival/departure over visit)
-            time_key = f"{time_str[:2]}:{time_str[2:4]}:{time_str[4:6]}"
-            if time_key in events_by_time:
-                existing = events_by_time[time_key]
-                # Prefer arrival/departure over visit
-                if existing["type"] in ["arrival", "departure"]:
-                    continue
-
-            events_by_time[time_key] = {
-                "time": time_key,
-                "type": clip_type,
-                "timestamp": clip_dt.isoformat(),
-                "datetime": clip_dt,
-            }
-
-    # Sort events by datetime (most recent first)
-    last_events = sorted(events_by_time.values(), key=lambda x: x["datetime"], reverse=True)
-
-    # Remove datetime object before returning (not JSON serializable)
+    # Sort events by time (most recent first)
+    last_events = sorted(events_by_time.values(), key=lambda x: x["utc_timestamp"], reverse=True)
     for event in last_events:
-        event.pop("datetime", None)
+        event.pop("utc_timestamp", None)
 
     return {
         "visits": visits,  # Only completed visit.mp4 files
@@ -341,50 +511,207 @@ def get_stats_for_range(stream_id: str, range_str: str) -> Dict[str, Any]:
     }
 
 
-@router.get("")
-async def list_streams():
-    """List all available streams with last 24h stats."""
-    streams_list = []
+def summarize_stream(stream_id: str, stream_config: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the landing-page card for one stream (blocking: scans clip folders)."""
+    # Get last 24h stats
+    stats_24h = get_stats_for_range(stream_id, "24h")
+    visits = stats_24h.get("visits", 0)
+    last_events = stats_24h.get("last_events", [])
+
+    # Determine date to show (today or most recent with events)
+    tz = get_stream_timezone(stream_id)
+    today = datetime.now(tz).date()
+    date_str = today.strftime("%Y-%m-%d")
 
-    for stream_id, stream_config in settings.streams.items():
+    # If no events in last 24h, find most recent date
+    if not last_events:
+        recent_date = find_most_recent_date_with_events(stream_id, datetime.now(tz))
+        if recent_date:
+            date_str = recent_date
+
+    return {
+        "id": stream_id,
+        "name": stream_config.get("name"),
+        "display": stream_config.get("display", {}),
+        "youtube_id": stream_config.get("youtube_id"),
+        "timezone": stream_config.get("timezone"),
+        "stats": {
+            "date": date_str,
+            "visits": visits,
+            "last_event": last_events[0] if last_events else None,
+        },
+    }
+
+
+# Landing-page cards, per stream: {summary, validator, fresh_until}. A card is
+# served as-is for STREAM_SUMMARY_TTL_SECONDS, then revalidated against
+# summary_validator() and only rebuilt if that changed.
+_stream_summaries: Dict[str, Dict[str, Any]] = {}
+_stream_summary_inflight: Dict[str, "asyncio.Task[Dict[str, Any]]"] = {}
+
+
+def summary_validator(stream_id: str) -> Tuple[Any, ...]:
+    """Cheap fingerprint of everything a stream's card depends on (blocking).
+
+    The minute bucket bounds how stale the sliding 24h window can get. A watched
+    clips directory is covered by the index generation (no I/O); otherwise the
+    clips directory, today's and yesterday's day directories and today's events
+    json are stat()ed.
+    """
+    clips_dir = get_clips_dir(stream_id)
+    tz = get_stream_timezone(stream_id)
+    minute = int(time.time() // 60)
+    if clip_index.is_trusted(clips_dir):
+        return (minute, clip_index.dir_generation(clips_dir))
+
+    today = datetime.now(tz)
+    today_str = today.strftime("%Y-%m-%d")
+    paths = [
+        clips_dir,
+        clips_dir / today_str,
+        clips_dir / (today - timedelta(days=1)).strftime("%Y-%m-%d"),
+        clips_dir / today_str / f"events_{today_str}.json",
+    ]
+    stamps: List[Any] = [minute]
+    for path in paths:
         try:
-            # Get last 24h stats
-            stats_24h = get_stats_for_range(stream_id, "24h")
-            visits = stats_24h.get("visits", 0)
-            last_events = stats_24h.get("last_events", [])
-
-            # Determine date to show (today or most recent with events)
-            tz = get_stream_timezone(stream_id)
-            today = datetime.now(tz).date()
-            date_str = today.strftime("%Y-%m-%d")
-
-            # If no events in last 24h, find most recent date
-            if not last_events:
-                recent_date = find_most_recent_date_with_events(
-                    get_clips_dir(stream_id), datetime.now(tz), tz
-                )
-                if recent_date:
-                    date_str = recent_date
-
-            streams_list.append(
-                {
-                    "id": stream_id,
-                    "name": stream_config.get("name"),
-                    "display": stream_config.get("display", {}),
-                    "youtube_id": stream_config.get("youtube_id"),
-                    "timezone": stream_config.get("timezone"),
-                    "stats": {
-                        "date": date_str,
-                        "visits": visits,
-                        "last_event": last_events[0] if last_events else None,
-                    },
-                }
-            )
+            st = os.stat(path)
+            stamps.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            stamps.append(None)
+    return tuple(stamps)
+
+
+def _revalidate_summary(stream_id: str, stream_config: Dict[str, Any]) -> Dict[str, Any]:
+    validator = summary_validator(stream_id)
+    entry = _stream_summaries.get(stream_id)
+    if entry is None or entry["validator"] != validator:
+        entry = {"summary": summarize_stream(stream_id, stream_config), "validator": validator}
+    entry["fresh_until"] = time.monotonic() + settings.STREAM_SUMMARY_TTL_SECONDS
+    _stream_summaries[stream_id] = entry
+    return entry["summary"]
+
+
+async def get_stream_summary(stream_id: str, stream_config: Dict[str, Any]) -> Dict[str, Any]:
+    """A stream's landing-page card, memoized; concurrent refreshes are coalesced."""
+    entry = _stream_summaries.get(stream_id)
+    if entry is not None and time.monotonic() < entry["fresh_until"]:
+        return entry["summary"]
+
+    task = _stream_summary_inflight.get(stream_id)
+    if task is None:
+        task = asyncio.ensure_future(run_blocking(_revalidate_summary, stream_id, stream_config))
+        _stream_summary_inflight[stream_id] = task
+        task.add_done_callback(lambda t: _finish_summary(stream_id, t))
+    return await asyncio.shield(task)
+
+
+def _finish_summary(stream_id: str, task: "asyncio.Task[Dict[str, Any]]") -> None:
+    if _stream_summary_inflight.get(stream_id) is task:
+        del _stream_summary_inflight[stream_id]
+    if not task.cancelled():
+        task.exception()
+
+
+def invalidate_stream_summaries(stream_id: Optional[str] = None) -> None:
+    """Forget memoized cards for one stream, or all of them."""
+    if stream_id is None:
+        _stream_summaries.clear()
+    else:
+        _stream_summaries.pop(stream_id, None)
+
+
+def _clips_dir_of(stream_config: Dict[str, Any]) -> Optional[Path]:
+    data_path = stream_config.get("data_path")
+    return Path(data_path) / "clips" if data_path else None
+
+
+def _forget_live_url(stream_id: str) -> None:
+    _live_url_cache.pop(stream_id, None)
+    _live_url_refresh_status.pop(stream_id, None)
+    get_playlist_cache().invalidate(stream_id)
+
+
+async def apply_stream_changes(changes: StreamChanges) -> None:
+    """Drop per-stream state that a registry reload made stale.
+
+    Only the streams in changes are touched: a changed stream loses its card,
+    and its live URL if youtube_id changed (the event store notices timezone and
+    data_path changes itself); a removed one loses everything, and an added
+    one's clips directory is followed by the watcher.
+    """
+    watcher = get_clip_watcher()
+    for stream_id in changes.changed:
+        old, new = changes.previous[stream_id], settings.streams.get(stream_id, {})
+        if old.get("youtube_id") != new.get("youtube_id"):
+            _forget_live_url(stream_id)
+        invalidate_stream_summaries(stream_id)
+        old_dir, new_dir = _clips_dir_of(old), _clips_dir_of(new)
+        if watcher is not None and old_dir != new_dir:
+            if old_dir is not None:
+                watcher.remove(old_dir)
+            if new_dir is not None:
+                await watcher.add(new_dir)
+
+    for stream_id in changes.removed:
+        _forget_live_url(stream_id)
+        _live_url_activity.pop(stream_id, None)
+        invalidate_stream_summaries(stream_id)
+        await run_blocking(get_event_store().forget, stream_id)
+        clips_dir = _clips_dir_of(changes.previous[stream_id])
+        if clips_dir is not None:
+            if watcher is not None:
+                watcher.remove(clips_dir)
+            else:
+                clip_index.forget(clips_dir)
+
+    if watcher is not None:
+        for stream_id in changes.added:
+            clips_dir = _clips_dir_of(settings.streams.get(stream_id, {}))
+            if clips_dir is not None:
+                await watcher.add(clips_dir)
+
+
+async def reload_streams() -> StreamChanges:
+    """Revalidate the stream registry off the event loop and apply what changed."""
+    changes = await run_blocking(settings.reload_streams)
+    if changes:
+        logger.info(
+            "Streams reloaded: added %s, removed %s, changed %s",
+            changes.added,
+            changes.removed,
+            changes.changed,
+        )
+        await apply_stream_changes(changes)
+    return changes
+
+
+async def run_stream_reloader() -> None:
+    """Background task (started by the app lifespan) following config.yaml edits."""
+    while True:
+        await asyncio.sleep(settings.STREAM_RELOAD_SECONDS)
+        try:
+            await reload_streams()
         except Exception:
-            # Skip streams that error out
-            continue
+            logger.exception("Stream registry reload failed")
+
+
+@router.get("")
+async def list_streams(request: Request):
+    """List all available streams with last 24h stats.
+
+    Cards are built concurrently on the blocking pool; the response carries an
+    ETag so an unchanged list is revalidated with a 304.
+    """
+    items = list(settings.streams.items())
+    results = await asyncio.gather(
+        *(get_stream_summary(stream_id, config) for stream_id, config in items),
+        return_exceptions=True,
+    )
+    # Skip streams that error out
+    streams_list = [r for r in results if not isinstance(r, BaseException)]
 
-    return {"streams": streams_list}
+    return conditional_json(request, {"streams": streams_list})
 
 
 @router.get("/{stream_id}")
@@ -395,7 +722,7 @@ async def get_stream_detail(stream_id: str):
         raise HTTPException(status_code=404, detail=f"Stream {stream_id} not found")
 
     # Get today's stats
-    stats = get_stats_for_range(stream_id, "24h")
+    stats = await run_blocking(get_stats_for_range, stream_id, "24h")
 
     return {
         "id": stream_id,
@@ -408,104 +735,237 @@ async def get_stream_detail(stream_id: str):
     }
 
 
+def check_date(value: str) -> None:
+    try:
+        datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid date: {value}")
+
+
+def dates_validators(stream_id: str, start_date: str, end_date: str) -> Validators:
+    check_date(start_date)
+    check_date(end_date)
+    store = synced_event_store(stream_id, start_date, end_date)
+    return day_range_validators(store, stream_id, "dates", start_date, end_date)
+
+
+def list_dates_with_events(stream_id: str, start_date: str, end_date: str) -> List[str]:
+    """Dates in [start_date, end_date] that have at least one visit clip."""
+    check_date(start_date)
+    check_date(end_date)
+    store = synced_event_store(stream_id, start_date, end_date)
+    return store.dates_with_clips(stream_id, start_date, end_date, "visit", VIDEO_EXTENSIONS)
+
+
 @router.get("/{stream_id}/dates-with-events")
-async def get_dates_with_events(stream_id: str, start_date: str, end_date: str):
+async def get_dates_with_events(request: Request, stream_id: str, start_date: str, end_date: str):
     """Get list of dates that have visit clips in a date range."""
-    import re
+    validators = await run_blocking(dates_validators, stream_id, start_date, end_date)
+    if validators.is_fresh(request):
+        return validators.not_modified()
+    dates = await run_blocking(list_dates_with_events, stream_id, start_date, end_date)
+    return validators.json({"dates": dates})
 
-    clips_dir = get_clips_dir(stream_id)
 
-    dates_with_events = []
-    start = datetime.strptime(start_date, "%Y-%m-%d")
-    end = datetime.strptime(end_date, "%Y-%m-%d")
+def resolve_events_date(stream_id: str, date: Optional[str]) -> Optional[str]:
+    """The date /events serves: date if it has visits, else the most recent date with events."""
+    if date:
+        store = synced_event_store(stream_id, date, date)
+        if store.dates_with_clips(stream_id, date, date, "visit", VIDEO_EXTENSIONS):
+            return date
 
-    current = start
-    pattern = re.compile(r"falcon_(\d{6})_visit\.(mp4|avi|mov|mkv)$")
+    # Auto-select most recent date with events
+    today = datetime.now(get_stream_timezone(stream_id))
+    return find_most_recent_date_with_events(stream_id, today)
 
-    while current <= end:
-        date_str = current.strftime("%Y-%m-%d")
-        date_dir = clips_dir / date_str
 
-        if date_dir.exists():
-            # Check if any visit clips exist
-            has_events = any(pattern.match(f.name) for f in date_dir.iterdir() if f.is_file())
-            if has_events:
-                dates_with_events.append(date_str)
+def events_validators(stream_id: str, date: Optional[str]) -> Tuple[Optional[str], Validators]:
+    """The date /events will serve and its validators, without loading the events."""
+    served = resolve_events_date(stream_id, date)
+    if served is None:
+        return None, Validators(make_etag("events", stream_id, date, None))
+    validators = day_range_validators(get_event_store(), stream_id, "events", served, served, date)
+    if served != date:
+        # Falls back to another day until this one has visits
+        validators.cache_control = NO_CACHE
+    return served, validators
 
-        current += timedelta(days=1)
 
-    return {"dates": dates_with_events}
+def load_events_payload(stream_id: str, served: Optional[str]) -> Dict[str, Any]:
+    """Body of /events for the date resolve_events_date() picked (blocking)."""
+    events = load_events_for_date(stream_id, served) if served else []
+    return {"stream_id": stream_id, "date": served, "events": events}
 
 
 @router.get("/{stream_id}/events")
-async def get_stream_events(stream_id: str, date: Optional[str] = None):
+async def get_stream_events(request: Request, stream_id: str, date: Optional[str] = None):
     """
     Get events for a specific date.
     If date is not provided or has no events, returns most recent date with events.
     """
-    tz = get_stream_timezone(stream_id)
+    served, validators = await run_blocking(events_validators, stream_id, date)
+    if validators.is_fresh(request):
+        return validators.not_modified()
+    return validators.json(await run_blocking(load_events_payload, stream_id, served))
+
+
+@router.get("/{stream_id}/stats")
+async def get_stream_stats(
+    request: Request,
+    stream_id: str,
+    range: str = "24h",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+):
+    """Get stats for a time range (24h, 2d, 3d, 4d, 5d), or between start and end dates."""
+    validators = await run_blocking(stats_validators, stream_id, range, start, end)
+    if validators.is_fresh(request):
+        return validators.not_modified()
+    stats = await run_blocking(get_stats_for_range, stream_id, range, start, end)
+    return validators.json({"stream_id": stream_id, **stats})
+
+
+def find_latest_snapshot(stream_id: str) -> Optional[Path]:
+    """Most recent arrival snapshot within the last 30 days (blocking)."""
     clips_dir = get_clips_dir(stream_id)
+    tz = get_stream_timezone(stream_id)
+    now = datetime.now(tz)
+    today, oldest = now.strftime("%Y-%m-%d"), (now - timedelta(days=29)).strftime("%Y-%m-%d")
+    store = synced_event_store(stream_id, oldest, today)
+    latest = store.latest_clip(stream_id, "arrival", IMAGE_EXTENSIONS, oldest, today)
+    return clips_dir / latest.date / latest.name if latest else None
 
-    if date:
-        # Try requested date first
-        events = load_events_for_date(stream_id, date)
-        if events:
-            return {"stream_id": stream_id, "date": date, "events": events}
 
-    # Auto-select most recent date with events
-    today = datetime.now(tz)
-    recent_date = find_most_recent_date_with_events(clips_dir, today, tz)
+def stat_latest_snapshot(stream_id: str) -> Optional[Tuple[Path, os.stat_result]]:
+    most_recent = find_latest_snapshot(stream_id)
+    if most_recent is None:
+        return None
+    try:
+        return most_recent, os.stat(most_recent)
+    except OSError:
+        return None
 
-    if not recent_date:
-        return {"stream_id": stream_id, "date": None, "events": []}
 
-    events = load_events_for_date(stream_id, recent_date)
-    return {"stream_id": stream_id, "date": recent_date, "events": events}
+@router.get("/{stream_id}/snapshot")
+async def get_stream_snapshot(stream_id: str):
+    """Get the most recent arrival snapshot for a stream.
 
+    Cached briefly, then revalidated: the ETag names the current arrival image,
+    so a new arrival changes it and an unchanged one is a 304.
+    """
+    latest = await run_blocking(stat_latest_snapshot, stream_id)
+    if latest is None:
+        raise HTTPException(status_code=404, detail=f"No arrival snapshot found for {stream_id}")
+
+    path, stat_result = latest
+    etag = make_etag(path.parent.name, path.name, stat_result.st_size, stat_result.st_mtime_ns)
+    headers = {"ETag": etag, "Cache-Control": fresh_for(settings.SNAPSHOT_MAX_AGE_SECONDS)}
+    return RangeFileResponse(
+        path, media_type="image/jpeg", stat_result=stat_result, headers=headers
+    )
 
-@router.get("/{stream_id}/stats")
-async def get_stream_stats(stream_id: str, range: str = "24h"):
-    """Get stats for a time range (24h, 2d, 3d, 4d, 5d)."""
-    stats = get_stats_for_range(stream_id, range)
-    return {"stream_id": stream_id, **stats}
 
+@dataclass(frozen=True)
+class DaySprite:
+    """Event frames of one day, in timeline order, as tiles of one sprite sheet."""
 
-@router.get("/{stream_id}/snapshot")
-async def get_stream_snapshot(stream_id: str):
-    """Get the most recent arrival snapshot for a stream."""
-    from fastapi.responses import FileResponse
-    import re
+    version: str
+    event_ids: Tuple[str, ...]
+    sources: Tuple[Path, ...]
 
-    clips_dir = get_clips_dir(stream_id)
-    tz = get_stream_timezone(stream_id)
+    def tiles(self) -> Dict[str, Dict[str, int]]:
+        """Pixel offset of each event's tile on the sheet."""
+        columns, _ = sprite_grid(len(self.sources))
+        tile_width, tile_height = SPRITE_TILE
+        offsets = {}
+        for index, event in enumerate(self.event_ids):
+            row, column = divmod(index, columns)
+            offsets[event] = {"x": column * tile_width, "y": row * tile_height}
+        return offsets
 
-    # Search back up to 30 days for the most recent arrival snapshot
-    current_date = datetime.now(tz)
-    pattern = re.compile(r"falcon_(\d{6})_arrival\.(jpg|jpeg|png)$")
 
-    for _ in range(30):
-        date_str = current_date.strftime("%Y-%m-%d")
-        date_dir = clips_dir / date_str
+def day_sprite(stream_id: str, date_str: str) -> DaySprite:
+    """The sprite sheet layout for one day's visits (blocking, no image work).
 
-        if date_dir.exists():
-            # Find all arrival snapshots in this directory
-            snapshots = []
-            for file in date_dir.iterdir():
-                if file.is_file():
-                    match = pattern.match(file.name)
-                    if match:
-                        snapshots.append(file)
+    The version hashes every frame's name, size and mtime, so it changes exactly
+    when the sheet would look different.
+    """
+    check_date(date_str)
+    day = clip_index.day(get_clips_dir(stream_id), date_str)
+    event_ids: List[str] = []
+    sources: List[Path] = []
+    identity: List[Any] = []
+    if day is not None:
+        frames = {clip.name: clip for clip in day.clips}
+        for clip in day.clips:
+            if clip.clip_type != "visit" or not clip.is_video:
+                continue
+            thumbnail = event_thumbnail(day, clip.time_str)
+            if not thumbnail:
+                continue
+            event_ids.append(event_id(date_str, clip.time_str))
+            sources.append(day.path / thumbnail)
+            identity += [thumbnail, frames[thumbnail].size, frames[thumbnail].mtime_ns]
+    version = make_etag(
+        "sprite", stream_id, date_str, SPRITE_TILE, SPRITE_COLUMNS, *identity
+    ).strip('"')
+    return DaySprite(version, tuple(event_ids), tuple(sources))
 
-            # Return the most recent one (sorted by filename, which includes time)
-            if snapshots:
-                most_recent = sorted(snapshots, reverse=True)[0]
-                return FileResponse(most_recent, media_type="image/jpeg")
 
-        # Move to previous day
-        current_date = current_date - timedelta(days=1)
+@router.get("/{stream_id}/days/{date}/sprite")
+async def get_day_sprite(request: Request, stream_id: str, date: str):
+    """Where each visit's frame sits on the day's sprite sheet.
 
-    # If no snapshot found, return 404
-    raise HTTPException(status_code=404, detail=f"No arrival snapshot found for {stream_id}")
+    The timeline loads the sheet (sprite.webp?v=<version>) once per day instead of
+    one thumbnail per event; visits without a frame are not in tiles.
+    """
+    sprite = await run_blocking(day_sprite, stream_id, date)
+    settled = day_is_settled(date, get_stream_timezone(stream_id))
+    validators = Validators(
+        etag=make_etag("sprite-map", sprite.version),
+        cache_control=immutable(settings.PAST_DAY_MAX_AGE_SECONDS) if settled else NO_CACHE,
+    )
+    if validators.is_fresh(request):
+        return validators.not_modified()
+    columns, rows = sprite_grid(len(sprite.sources))
+    return validators.json(
+        {
+            "stream_id": stream_id,
+            "date": date,
+            "version": sprite.version if sprite.sources else None,
+            "tile_width": SPRITE_TILE[0],
+            "tile_height": SPRITE_TILE[1],
+            "columns": columns,
+            "rows": rows,
+            "tiles": sprite.tiles(),
+        }
+    )
+
+
+@router.get("/{stream_id}/days/{date}/sprite.{ext}")
+async def get_day_sprite_image(stream_id: str, date: str, ext: str, v: Optional[str] = None):
+    """The day's sprite sheet as WebP or JPEG, composited once and cached on disk.
+
+    Requested with the current version it is immutable; any other URL revalidates.
+    """
+    if ext not in FORMATS:
+        raise HTTPException(status_code=404, detail=f"Unsupported sprite format: {ext}")
+    sprite = await run_blocking(day_sprite, stream_id, date)
+    if not sprite.sources:
+        raise HTTPException(status_code=404, detail=f"No thumbnails for {date}")
+
+    path, stat_result = await get_thumbnail_cache().fetch(
+        f"sprite-{sprite.version}.{ext}", render_sprite, sprite.sources, ext
+    )
+    headers = {
+        "ETag": f'"{sprite.version}"',
+        "Cache-Control": (
+            immutable(settings.CLIP_MAX_AGE_SECONDS) if v == sprite.version else NO_CACHE
+        ),
+    }
+    return RangeFileResponse(
+        path, media_type=FORMATS[ext][1], stat_result=stat_result, headers=headers
+    )
 
 
 @router.get("/{stream_id}/live-url")
@@ -517,17 +977,24 @@ async def get_live_url(stream_id: str):
     """
     # Check cache state before resolving so we can report whether a cache hit occurred
     existing = _live_url_cache.get(stream_id)
-    was_cached = bool(
-        existing and (time.time() - existing["resolved_at"]) < _LIVE_URL_TTL_SECONDS
-    )
+    was_cached = bool(existing and _is_servable(existing, time.time()))
     url = await _resolve_or_get_live_url(stream_id)
     entry = _live_url_cache.get(stream_id)
-    age_seconds = int(time.time() - entry["resolved_at"]) if entry else 0
+    now = time.time()
+    age_seconds = int(now - entry["resolved_at"]) if entry else 0
+    status = _live_url_refresh_status.get(stream_id, {})
     return {
         "url": url,
         "cached": was_cached,
         "age_seconds": age_seconds,
         "expires_in": _LIVE_URL_TTL_SECONDS - age_seconds,
+        "refresh": {
+            "scheduled_in": int(_refresh_at(entry) - now) if entry else 0,
+            "in_progress": stream_id in _live_url_inflight,
+            "last_outcome": status.get("outcome"),
+            "last_error": status.get("error"),
+            "last_attempt_age_seconds": int(now - status["at"]) if status else None,
+        },
     }
 
 
@@ -540,36 +1007,63 @@ async def get_hls_playlist(stream_id: str):
     """
     manifest_url = await _resolve_or_get_live_url(stream_id)
 
+    async def load() -> str:
+        resp = await _fetch_playlist(manifest_url, "manifest", "HLS manifest")
+
+        if resp.status_code != 200:
+            # Manifest URL expired early — evict cache so next request re-resolves
+            _live_url_cache.pop(stream_id, None)
+            raise HTTPException(
+                status_code=502, detail=f"HLS manifest fetch returned {resp.status_code}"
+            )
+
+        # Rewrite absolute segment/sub-manifest URLs to route through the proxy
+        return rewrite_playlist(resp.text, segment_proxy_prefix(stream_id))
+
+    # Shared by every viewer polling this stream until a fraction of the target
+    # duration has passed; concurrent misses wait for one upstream fetch.
+    body = await get_playlist_cache().get((stream_id, manifest_url), load)
+    return _playlist_response(body)
+
+
+async def _fetch_playlist(url: str, kind: str, what: str) -> httpx.Response:
+    """GET a manifest or playlist from the CDN, counting its bytes and latency."""
+    start = time.perf_counter()
+    outcome = "error"
     try:
-        async with httpx.AsyncClient(follow_redirects=True, timeout=15) as client:
-            resp = await client.get(manifest_url)
+        resp = await upstream.get_client().get(url, timeout=15)
+        if resp.status_code == 200:
+            outcome = "ok"
     except httpx.RequestError as exc:
-        raise HTTPException(status_code=502, detail=f"Failed to fetch HLS manifest: {exc}")
-
-    if resp.status_code != 200:
-        # Manifest URL expired early — evict cache so next request re-resolves
-        _live_url_cache.pop(stream_id, None)
-        raise HTTPException(
-            status_code=502, detail=f"HLS manifest fetch returned {resp.status_code}"
-        )
+        raise HTTPException(status_code=502, detail=f"Failed to fetch {what}: {exc}")
+    finally:
+        HLS_UPSTREAM_LATENCY.observe(time.perf_counter() - start, kind=kind, outcome=outcome)
+    HLS_UPSTREAM_BYTES.inc(len(resp.content), kind=kind)
+    return resp
 
-    # Rewrite absolute segment/sub-manifest URLs to route through the proxy
-    lines = []
-    for line in resp.text.splitlines():
-        stripped = line.strip()
-        if stripped.startswith("https://") or stripped.startswith("http://"):
-            encoded = quote(stripped, safe="")
-            lines.append(f"/api/streams/{stream_id}/hls/seg?u={encoded}")
-        else:
-            lines.append(line)
 
+def _playlist_response(body: str) -> Response:
     return Response(
-        content="\n".join(lines),
+        content=body,
         media_type="application/vnd.apple.mpegurl",
         headers={"Cache-Control": "no-cache, no-store"},
     )
 
 
+async def _proxy_sub_playlist(stream_id: str, url: str) -> Response:
+    """Fetch, rewrite and cache a nested media playlist requested through /hls/seg."""
+
+    async def load() -> str:
+        resp = await _fetch_playlist(url, "playlist", "playlist")
+        if resp.status_code != 200:
+            raise HTTPException(
+                status_code=502, detail=f"Playlist fetch returned {resp.status_code}"
+            )
+        return rewrite_playlist(resp.text, segment_proxy_prefix(stream_id))
+
+    return _playlist_response(await get_playlist_cache().get((stream_id, url), load))
+
+
 @router.get("/{stream_id}/hls/seg")
 async def proxy_hls_segment(stream_id: str, u: str):
     """Proxy a single HLS segment or sub-manifest from YouTube CDN.
@@ -588,18 +1082,34 @@ async def proxy_hls_segment(stream_id: str, u: str):
     ):
         raise HTTPException(status_code=403, detail="Segment URL not from allowed domain")
 
-    try:
-        async with httpx.AsyncClient(follow_redirects=True, timeout=30) as client:
-            resp = await client.get(url)
-    except httpx.RequestError as exc:
-        raise HTTPException(status_code=502, detail=f"Failed to fetch segment: {exc}")
+    if looks_like_playlist(url):
+        return await _proxy_sub_playlist(stream_id, url)
 
-    if resp.status_code != 200:
-        raise HTTPException(status_code=502, detail=f"Segment fetch returned {resp.status_code}")
+    # All viewers asking for the same segment share one upstream fetch, which is
+    # relayed chunk by chunk as it arrives and then kept briefly for late joiners.
+    reader = get_segment_cache().open(url)
+    try:
+        await reader.fetch.wait_ready()
+    except SegmentFetchError as exc:
+        await reader.close()
+        raise HTTPException(status_code=502, detail=str(exc))
 
-    content_type = resp.headers.get("content-type", "video/MP2T")
-    return Response(
-        content=resp.content,
-        media_type=content_type,
-        headers={"Cache-Control": "max-age=3600"},
+    if reader.fetch.is_playlist:
+        # A playlist the URL heuristic didn't catch: still rewrite it to stay same-origin
+        try:
+            raw = b"".join([chunk async for chunk in reader])
+        finally:
+            await reader.close()
+        if reader.fetch.error is not None:
+            # Never rewrite and serve half a playlist
+            raise HTTPException(status_code=502, detail=reader.fetch.error)
+        text = raw.decode("utf-8", errors="replace")
+        return _playlist_response(rewrite_playlist(text, segment_proxy_prefix(stream_id)))
+
+    return StreamingResponse(
+        reader,
+        media_type=reader.fetch.content_type,
+        headers={"Cache-Control": "max-age=3600", **reader.fetch.headers},
+        # Runs after the body is sent or the client disconnects mid-stream
+        background=BackgroundTask(reader.close),
     )
@@ -1,8 +1,14 @@
 """Visitor timezone detection endpoint."""
-from fastapi import APIRouter, Request
-import requests
+import ipaddress
 from typing import Optional
 
+from fastapi import APIRouter, Request
+
+from app.config import settings
+from app.geoip import IPAddress, lookup_timezone
+from app.metrics import VISITOR_TIMEZONE_LOOKUPS
+from app.timezone_lookup import get_timezone_lookup
+
 router = APIRouter()
 
 
@@ -24,39 +30,32 @@ def get_client_ip(request: Request) -> str:
     return "unknown"
 
 
-def detect_timezone_from_ip(ip: str) -> Optional[str]:
-    """Detect timezone from IP address using external API."""
-    if (
-        ip == "unknown"
-        or ip.startswith("127.")
-        or ip.startswith("192.168.")
-        or ip.startswith("10.")
-    ):
-        # Local/private IP - can't geolocate
+def public_address(ip: str) -> Optional[IPAddress]:
+    """The parsed address, or None if it's local/private (or not an IP) and can't be located."""
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
         return None
+    if address.version == 6 and address.ipv4_mapped:
+        address = address.ipv4_mapped
+    return address if address.is_global else None
 
-    # Try ipapi.co first (150 req/day free)
-    try:
-        response = requests.get(f"https://ipapi.co/{ip}/timezone/", timeout=2)
-        if response.status_code == 200:
-            timezone = response.text.strip()
-            if timezone and not timezone.startswith("Undefined"):
-                return timezone
-    except Exception:
-        pass
-
-    # Fallback to geojs.io
-    try:
-        response = requests.get(f"https://get.geojs.io/v1/ip/timezone/{ip}.json", timeout=2)
-        if response.status_code == 200:
-            data = response.json()
-            timezone = data.get("timezone")
-            if timezone:
-                return timezone
-    except Exception:
-        pass
 
-    return None
+async def detect_timezone_from_ip(ip: str) -> Optional[str]:
+    """Detect timezone from IP address: local table first, then (optionally) cached online APIs."""
+    address = public_address(ip)
+    if address is None:
+        # Local/private IP - can't geolocate
+        VISITOR_TIMEZONE_LOOKUPS.inc(source="private")
+        return None
+
+    timezone = lookup_timezone(address)
+    source = "table"
+    if timezone is None and settings.VISITOR_TZ_ONLINE_FALLBACK:
+        timezone = await get_timezone_lookup().lookup(address)
+        source = "online"
+    VISITOR_TIMEZONE_LOOKUPS.inc(source=source if timezone else "none")
+    return timezone
 
 
 @router.get("/timezone")
@@ -68,6 +67,6 @@ async def get_visitor_timezone(request: Request):
     Returns timezone in IANA format (e.g., "America/New_York").
     """
     ip = get_client_ip(request)
-    timezone = detect_timezone_from_ip(ip)
+    timezone = await detect_timezone_from_ip(ip)
 
     return {"ip": ip, "timezone": timezone, "detected": timezone is not None}
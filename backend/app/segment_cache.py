@@ -0,0 +1,322 @@
+"""Shared cache of recently proxied HLS segments.
+
+Every viewer of a live stream asks /hls/seg for the same googlevideo segment
+URLs. Instead of fetching each segment once per viewer, the first request starts
+one upstream fetch that every concurrent request for that URL reads from as the
+chunks arrive (so the streaming pass-through is kept), and the finished body is
+kept in a byte-budgeted LRU for viewers that are a few seconds behind.
+
+Only bodies that can be stored are held in full while they arrive. Once a body
+outgrows the per-segment limit, or turns out to be a playlist, each chunk is
+dropped as soon as every viewer has been sent it; later viewers start their own
+fetch.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, List, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+import httpx
+
+from app import upstream
+from app.config import settings
+from app.metrics import HLS_UPSTREAM_BYTES, HLS_UPSTREAM_LATENCY
+
+logger = logging.getLogger(__name__)
+
+# Sub-playlists also travel through /hls/seg but change every target duration,
+# so they are coalesced while in flight but never stored.
+PLAYLIST_CONTENT_TYPES = ("application/vnd.apple.mpegurl", "application/x-mpegurl")
+
+
+def normalize_url(url: str) -> str:
+    """Cache key for an upstream URL: case-folded scheme/host, no fragment.
+
+    Path and query are kept byte-for-byte because YouTube signs them.
+    """
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, parts.query, ""))
+
+
+class SegmentFetchError(Exception):
+    """Upstream fetch failed before any body was sent."""
+
+
+class SegmentFetch:
+    """One upstream fetch, readable by any number of viewers while it runs."""
+
+    def __init__(self, url: str, max_buffer_bytes: int):
+        self.url = url
+        # Chunks not yet sent to every reader; all of them while buffering
+        self.chunks: List[bytes] = []
+        # Position in the body of chunks[0]
+        self.first_chunk = 0
+        self.buffering = True
+        self.max_buffer_bytes = max_buffer_bytes
+        self.size = 0
+        self.headers: Dict[str, str] = {}
+        self.content_type = "video/MP2T"
+        self.done = False
+        self.error: Optional[str] = None
+        self.completed_at = 0.0
+        # reader -> position of the next chunk it needs
+        self._positions: Dict[object, int] = {}
+        self.task: Optional["asyncio.Task[None]"] = None
+        self._ready = asyncio.Event()
+        self._changed = asyncio.Event()
+
+    # Writer side (the fetch task)
+
+    def start(self, resp: httpx.Response) -> None:
+        self.content_type = resp.headers.get("content-type", "video/MP2T")
+        for name in ("content-length", "content-encoding"):
+            if name in resp.headers:
+                self.headers[name] = resp.headers[name]
+        if self.is_playlist:
+            self.buffering = False
+        self._ready.set()
+
+    def append(self, chunk: bytes) -> None:
+        self.chunks.append(chunk)
+        self.size += len(chunk)
+        if self.size > self.max_buffer_bytes:
+            self.buffering = False
+        self._trim()
+        self._notify()
+
+    def finish(self) -> None:
+        self.done = True
+        self.completed_at = time.monotonic()
+        self._ready.set()
+        self._notify()
+
+    def fail(self, detail: str) -> None:
+        if self.done:
+            return
+        self.error = detail
+        self.done = True
+        self._ready.set()
+        self._notify()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _trim(self) -> None:
+        """Once not buffering, drop the chunks every reader has been sent."""
+        if self.buffering:
+            return
+        end = self.first_chunk + len(self.chunks)
+        sent = min(self._positions.values(), default=end) - self.first_chunk
+        if sent > 0:
+            del self.chunks[:sent]
+            self.first_chunk += sent
+
+    # Reader side (one per viewer request)
+
+    @property
+    def readers(self) -> int:
+        return len(self._positions)
+
+    @property
+    def replayable(self) -> bool:
+        """Whether a new reader can still be sent the body from its start."""
+        return self.first_chunk == 0
+
+    def add_reader(self, reader: object) -> None:
+        self._positions[reader] = self.first_chunk
+
+    def remove_reader(self, reader: object) -> None:
+        self._positions.pop(reader, None)
+        self._trim()
+
+    @property
+    def is_playlist(self) -> bool:
+        return self.content_type.lower().startswith(PLAYLIST_CONTENT_TYPES)
+
+    @property
+    def cacheable(self) -> bool:
+        return self.error is None and not self.is_playlist
+
+    async def wait_ready(self) -> None:
+        """Wait for upstream headers; raise if the fetch failed before sending any."""
+        await self._ready.wait()
+        if self.error is not None and not self.size:
+            raise SegmentFetchError(self.error)
+
+    async def iter_body(self, reader: object) -> AsyncIterator[bytes]:
+        """The body for one reader; ends early, without raising, if the fetch fails."""
+        index = self._positions.get(reader, self.first_chunk)
+        while True:
+            while index < self.first_chunk + len(self.chunks):
+                chunk = self.chunks[index - self.first_chunk]
+                index += 1
+                if reader in self._positions:
+                    self._positions[reader] = index
+                    self._trim()
+                yield chunk
+            if self.done:
+                # A failure is logged by the fetch task; the response is cut short
+                return
+            await self._changed.wait()
+
+
+class SegmentReader:
+    """A viewer's handle on a SegmentFetch; close() releases it."""
+
+    def __init__(self, cache: "SegmentCache", fetch: SegmentFetch):
+        self.cache = cache
+        self.fetch = fetch
+        self._closed = False
+        fetch.add_reader(self)
+
+    def __aiter__(self) -> AsyncIterator[bytes]:
+        return self.fetch.iter_body(self)
+
+    async def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        await self.cache._release(self.fetch, self)
+
+
+class SegmentCache:
+    """Byte-budgeted LRU of finished segments plus the fetches still in flight."""
+
+    def __init__(self, max_bytes: int, ttl_seconds: float, max_item_bytes: int):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_item_bytes = max_item_bytes
+        self._entries: "OrderedDict[str, SegmentFetch]" = OrderedDict()
+        self._inflight: Dict[str, SegmentFetch] = {}
+        self.bytes_held = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.upstream_fetches = 0
+
+    def open(self, url: str) -> SegmentReader:
+        """Return a reader for url from the cache, an in-flight fetch, or a new fetch."""
+        key = normalize_url(url)
+
+        cached = self._entries.get(key)
+        if cached is not None:
+            if time.monotonic() - cached.completed_at < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return SegmentReader(self, cached)
+            self._evict(key)
+
+        inflight = self._inflight.get(key)
+        if inflight is not None and inflight.replayable:
+            self.coalesced += 1
+            return SegmentReader(self, inflight)
+
+        # A fetch that already dropped its first chunks is left to its readers
+        self.misses += 1
+        fetch = SegmentFetch(url, min(self.max_item_bytes, self.max_bytes))
+        self._inflight[key] = fetch
+        reader = SegmentReader(self, fetch)
+        fetch.task = asyncio.create_task(self._run(key, fetch))
+        return reader
+
+    async def _run(self, key: str, fetch: SegmentFetch) -> None:
+        self.upstream_fetches += 1
+        client = upstream.get_client()
+        resp: Optional[httpx.Response] = None
+        start = time.perf_counter()
+        try:
+            resp = await client.send(
+                client.build_request("GET", fetch.url, timeout=30), stream=True
+            )
+            if resp.status_code != 200:
+                fetch.fail(f"Segment fetch returned {resp.status_code}")
+                return
+            fetch.start(resp)
+            async for chunk in resp.aiter_raw(upstream.STREAM_CHUNK_SIZE):
+                fetch.append(chunk)
+            fetch.finish()
+            self._store(key, fetch)
+        except httpx.RequestError as exc:
+            if fetch.size:
+                logger.warning(
+                    "Segment fetch failed after %d bytes, truncating: %s", fetch.size, exc
+                )
+            fetch.fail(f"Failed to fetch segment: {exc}")
+        except asyncio.CancelledError:
+            fetch.fail("Segment fetch cancelled")
+            raise
+        except Exception:
+            logger.exception("Segment fetch failed after %d bytes", fetch.size)
+            fetch.fail("Failed to fetch segment")
+        finally:
+            if self._inflight.get(key) is fetch:
+                del self._inflight[key]
+            if resp is not None:
+                await resp.aclose()
+            outcome = "ok" if fetch.done and not fetch.error else "error"
+            HLS_UPSTREAM_LATENCY.observe(
+                time.perf_counter() - start, kind="segment", outcome=outcome
+            )
+            HLS_UPSTREAM_BYTES.inc(fetch.size, kind="segment")
+
+    async def _release(self, fetch: SegmentFetch, reader: "SegmentReader") -> None:
+        """Drop a reader; stop the upstream fetch once nobody is waiting for it."""
+        fetch.remove_reader(reader)
+        if fetch.readers > 0 or fetch.done or fetch.task is None:
+            return
+        fetch.task.cancel()
+        await asyncio.wait([fetch.task])
+
+    def _store(self, key: str, fetch: SegmentFetch) -> None:
+        if not fetch.buffering or not fetch.cacheable:
+            return
+        self._entries[key] = fetch
+        self.bytes_held += fetch.size
+        while self.bytes_held > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._evict(oldest)
+
+    def _evict(self, key: str) -> None:
+        fetch = self._entries.pop(key)
+        self.bytes_held -= fetch.size
+        self.evictions += 1
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            "upstream_fetches": self.upstream_fetches,
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            "bytes_held": self.bytes_held,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+        }
+
+
+_cache: Optional[SegmentCache] = None
+
+
+def get_segment_cache() -> SegmentCache:
+    """Return the process-wide segment cache, sized from settings."""
+    global _cache
+    if _cache is None:
+        _cache = SegmentCache(
+            max_bytes=settings.SEGMENT_CACHE_MAX_BYTES,
+            ttl_seconds=settings.SEGMENT_CACHE_TTL_SECONDS,
+            max_item_bytes=settings.SEGMENT_CACHE_MAX_ITEM_BYTES,
+        )
+    return _cache
+
+
+def reset_segment_cache() -> None:
+    """Forget all cached segments (tests, config changes)."""
+    global _cache
+    _cache = None
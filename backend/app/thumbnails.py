@@ -0,0 +1,285 @@
+"""Resized JPEG/WebP variants of clip frames, cached on disk.
+
+The timeline and event cards used to load full-resolution arrival/visit frames
+to draw small tiles. A variant is rendered once per (frame, width bucket,
+format) with Pillow and kept under settings.CACHE_DIR in an LRU bounded by total
+bytes. JPEG frames are decoded in draft mode, which lets the decoder scale by
+1/2, 1/4 or 1/8 before resampling, so most of the work never happens.
+
+Per-day sprite sheets (every event frame of a day on one image) live in the
+same cache. Names hash the sources' paths, sizes and mtimes, so a replaced frame
+or a changed day gets a new file and the old one simply ages out. After a
+restart, files already in the cache directory are adopted in creation order, on
+the worker pool at the first lookup.
+
+A response opens its variant after the lookup returns and may stream it for a
+while, so entries served within EVICTION_GRACE_SECONDS are not evicted; the
+cache can briefly run over budget instead. Once a response has the file open,
+unlinking it is harmless (the open descriptor keeps the data readable).
+"""
+import asyncio
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from PIL import Image, ImageOps
+
+from app.blocking import run_blocking
+from app.config import settings
+
+CACHE_SUBDIR = "thumbnails"
+SIZE_BUCKETS = (160, 320, 640)
+# extension -> (Pillow format, media type, encoder options)
+FORMATS: Dict[str, Tuple[str, str, Dict[str, object]]] = {
+    "jpg": ("JPEG", "image/jpeg", {"quality": 80, "optimize": True, "progressive": True}),
+    "webp": ("WEBP", "image/webp", {"quality": 75, "method": 4}),
+}
+
+# Day sprite sheets: fixed-size 16:9 tiles, this many to a row
+SPRITE_TILE = (160, 90)
+SPRITE_COLUMNS = 10
+
+# Entries served this recently stay on disk even past the byte budget
+EVICTION_GRACE_SECONDS = 30.0
+
+Variant = Tuple[Path, os.stat_result]
+
+
+def size_bucket(width: int) -> int:
+    """Smallest bucket at least width pixels wide (the largest for anything wider)."""
+    for bucket in SIZE_BUCKETS:
+        if width <= bucket:
+            return bucket
+    return SIZE_BUCKETS[-1]
+
+
+def render(source: Path, width: int, fmt: str) -> bytes:
+    """Scale source down to width (never up) and encode it as fmt (blocking, CPU-bound)."""
+    pil_format, _, options = FORMATS[fmt]
+    with Image.open(source) as opened:
+        height = max(1, round(opened.height * width / opened.width))
+        opened.draft("RGB", (width, height))
+        image: Image.Image = opened.convert("RGB")
+        if image.width > width:
+            image = image.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=2.0)
+        out = io.BytesIO()
+        image.save(out, pil_format, **options)
+        return out.getvalue()
+
+
+def sprite_grid(count: int) -> Tuple[int, int]:
+    """(columns, rows) of a sprite sheet holding count tiles."""
+    columns = max(1, min(count, SPRITE_COLUMNS))
+    return columns, max(1, -(-count // columns))
+
+
+def render_sprite(sources: Sequence[Path], fmt: str) -> bytes:
+    """Composite sources into one sheet of SPRITE_TILE tiles, row by row (blocking).
+
+    Each frame is scaled to cover its tile and centre-cropped, like object-fit:
+    cover. Frames that can't be read leave their tile blank.
+    """
+    pil_format, _, options = FORMATS[fmt]
+    tile_width, tile_height = SPRITE_TILE
+    columns, rows = sprite_grid(len(sources))
+    sheet = Image.new("RGB", (columns * tile_width, rows * tile_height))
+    for index, source in enumerate(sources):
+        try:
+            with Image.open(source) as image:
+                image.draft("RGB", SPRITE_TILE)
+                tile = ImageOps.fit(image.convert("RGB"), SPRITE_TILE, Image.Resampling.LANCZOS)
+        except OSError:
+            continue
+        row, column = divmod(index, columns)
+        sheet.paste(tile, (column * tile_width, row * tile_height))
+    out = io.BytesIO()
+    sheet.save(out, pil_format, **options)
+    return out.getvalue()
+
+
+class ThumbnailCache:
+    """Variants on disk under root, evicted least recently used first past max_bytes."""
+
+    def __init__(self, root: Path, max_bytes: int, grace_seconds: float = EVICTION_GRACE_SECONDS):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.grace_seconds = grace_seconds
+        # variant file name -> (bytes, last served), least recently used first
+        self._entries: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self._inflight: Dict[str, "asyncio.Future[Variant]"] = {}
+        self._lock = threading.Lock()
+        self._adopted = False
+        self.bytes_held = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.generated = 0
+        self.generation_seconds = 0.0
+
+    def _adopt(self) -> None:
+        """Take over variants written by a previous process (blocking, runs once)."""
+        with self._lock:
+            if self._adopted:
+                return
+            self._adopted = True
+        found = []
+        try:
+            with os.scandir(self.root) as it:
+                for entry in it:
+                    if entry.name.startswith(".") or not entry.is_file():
+                        continue
+                    st = entry.stat()
+                    found.append((st.st_mtime_ns, entry.name, st.st_size))
+        except FileNotFoundError:
+            return
+        with self._lock:
+            # Anything built meanwhile is more recent than what's on disk from before
+            for _mtime, name, size in sorted(found, reverse=True):
+                if name not in self._entries:
+                    self._entries[name] = (size, 0.0)
+                    self._entries.move_to_end(name, last=False)
+                    self.bytes_held += size
+            victims = self._over_budget()
+        self._unlink(victims)
+
+    @staticmethod
+    def variant_name(source: Path, st: os.stat_result, width: int, fmt: str) -> str:
+        key = f"{source}|{st.st_size}|{st.st_mtime_ns}|{width}"
+        return f"{hashlib.blake2b(key.encode(), digest_size=16).hexdigest()}.{fmt}"
+
+    async def get(self, source: Path, st: os.stat_result, width: int, fmt: str) -> Variant:
+        """The variant's path and stat, rendering it on first request."""
+        name = self.variant_name(source, st, width, fmt)
+        return await self.fetch(name, render, source, width, fmt)
+
+    async def fetch(self, name: str, build: Callable[..., bytes], *args: Any) -> Variant:
+        """Path and stat of the cached file name, written from build(*args) on a miss.
+
+        Concurrent requests for the same missing file share one build.
+        """
+        if not self._adopted:
+            await run_blocking(self._adopt)
+        with self._lock:
+            entry = self._entries.get(name)
+            cached = entry is not None
+            if entry is not None:
+                self._entries[name] = (entry[0], time.monotonic())
+                self._entries.move_to_end(name)
+        if cached:
+            try:
+                variant = await run_blocking(os.stat, self.root / name)
+                self.hits += 1
+                return self.root / name, variant
+            except FileNotFoundError:
+                # Removed behind our back (e.g. tmp cleanup); build it again
+                self._discard(name)
+
+        task = self._inflight.get(name)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(run_blocking(self._generate, name, build, args))
+            self._inflight[name] = task
+            task.add_done_callback(lambda t: self._finish(name, t))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, name: str, task: "asyncio.Future[Variant]") -> None:
+        if self._inflight.get(name) is task:
+            del self._inflight[name]
+        if not task.cancelled():
+            task.exception()
+
+    def _generate(self, name: str, build: Callable[..., bytes], args: Tuple[Any, ...]) -> Variant:
+        start = time.perf_counter()
+        data = build(*args)
+        elapsed = time.perf_counter() - start
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self.root / name
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".thumbnail.")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        st = os.stat(path)
+
+        with self._lock:
+            self.generated += 1
+            self.generation_seconds += elapsed
+            self.bytes_held += len(data) - self._entries.get(name, (0, 0.0))[0]
+            self._entries[name] = (len(data), time.monotonic())
+            self._entries.move_to_end(name)
+            victims = self._over_budget(keep=name)
+        self._unlink(victims)
+        return path, st
+
+    def _over_budget(self, keep: Optional[str] = None) -> List[str]:
+        """Drop least recently used entries past max_bytes; return their names (lock held)."""
+        victims = []
+        served_since = time.monotonic() - self.grace_seconds
+        while self.bytes_held > self.max_bytes and self._entries:
+            name, (size, last_served) = next(iter(self._entries.items()))
+            if name == keep or last_served > served_since:
+                break
+            del self._entries[name]
+            self.bytes_held -= size
+            self.evictions += 1
+            victims.append(name)
+        return victims
+
+    def _unlink(self, names: List[str]) -> None:
+        for name in names:
+            try:
+                os.unlink(self.root / name)
+            except FileNotFoundError:
+                pass
+
+    def _discard(self, name: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(name, None)
+            if entry is not None:
+                self.bytes_held -= entry[0]
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            "generated": self.generated,
+            "generation_ms_avg": (
+                self.generation_seconds / self.generated * 1000 if self.generated else 0.0
+            ),
+            "generation_seconds": self.generation_seconds,
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            "bytes_held": self.bytes_held,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+        }
+
+
+_cache: Optional[ThumbnailCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_thumbnail_cache() -> ThumbnailCache:
+    """Return the process-wide thumbnail cache for the current CACHE_DIR."""
+    global _cache
+    root = Path(settings.CACHE_DIR) / CACHE_SUBDIR
+    with _cache_lock:
+        if _cache is None or _cache.root != root:
+            _cache = ThumbnailCache(root, settings.THUMBNAIL_CACHE_MAX_BYTES)
+        return _cache
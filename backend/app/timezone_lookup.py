@@ -0,0 +1,284 @@
+"""Online visitor timezone lookups, cached and guarded by circuit breakers.
+
+Addresses the local table (app.geoip) doesn't cover are looked up with public
+geolocation APIs through the shared async client. Answers are kept in an LRU
+with a TTL, keyed by the address's /24 (IPv4) or /48 (IPv6) network, since a
+visitor reloading the page, or their neighbours, are in the same timezone.
+Failures are cached too, briefly, so a visitor the APIs can't place doesn't
+cost a round trip per page load, and concurrent lookups for one key share a
+single request.
+
+Each provider has a circuit breaker: after a run of failures (timeouts, errors,
+rate limiting) it is skipped for a cooldown, then one trial request decides
+whether it is used again. That keeps an outage or an exhausted free tier from
+adding a timeout to every lookup.
+"""
+import asyncio
+import ipaddress
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from app import upstream
+from app.config import settings
+from app.geoip import IPAddress
+
+
+class ProviderError(Exception):
+    """A provider request failed (network error, timeout or unexpected response)."""
+
+
+def parse_text(response: httpx.Response) -> Optional[str]:
+    timezone = response.text.strip()
+    return timezone if timezone and not timezone.startswith("Undefined") else None
+
+
+def parse_json(response: httpx.Response) -> Optional[str]:
+    data = response.json()
+    timezone = data.get("timezone") if isinstance(data, dict) else None
+    return timezone if isinstance(timezone, str) and timezone else None
+
+
+# name -> (URL template, response parser), asked in this order
+PROVIDERS: Dict[str, Tuple[str, Callable[[httpx.Response], Optional[str]]]] = {
+    # ipapi.co: 150 requests/day free
+    "ipapi": ("https://ipapi.co/{ip}/timezone/", parse_text),
+    "geojs": ("https://get.geojs.io/v1/ip/timezone/{ip}.json", parse_json),
+}
+
+
+class Provider:
+    """One geolocation API, with its circuit breaker and latency stats."""
+
+    def __init__(
+        self,
+        name: str,
+        url: str,
+        parse: Callable[[httpx.Response], Optional[str]],
+        timeout: float,
+        failure_threshold: int,
+        cooldown_seconds: float,
+    ):
+        self.name = name
+        self.url = url
+        self.parse = parse
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self._probing = False
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.skipped = 0
+        self.trips = 0
+        self.latency_seconds = 0.0
+        self.latency_max = 0.0
+
+    @property
+    def state(self) -> str:
+        if self.consecutive_failures < self.failure_threshold:
+            return "closed"
+        return "half-open" if time.monotonic() >= self.open_until else "open"
+
+    def allow(self) -> bool:
+        """Whether to call the provider now; past a cooldown, lets one trial call through."""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._probing:
+            self._probing = True
+            return True
+        self.skipped += 1
+        return False
+
+    async def lookup(self, client: httpx.AsyncClient, ip: str) -> Optional[str]:
+        """The provider's answer for ip (None if it doesn't know); ProviderError on failure."""
+        self.calls += 1
+        start = time.monotonic()
+        try:
+            response = await client.get(self.url.format(ip=ip), timeout=self.timeout)
+            if response.status_code != 200:
+                raise ProviderError(f"{self.name}: HTTP {response.status_code}")
+            timezone = self.parse(response)
+        except httpx.TimeoutException as e:
+            self.timeouts += 1
+            self._failed()
+            raise ProviderError(f"{self.name}: timeout") from e
+        except (httpx.HTTPError, ValueError, ProviderError) as e:
+            self._failed()
+            raise ProviderError(f"{self.name}: {e}") from e
+        finally:
+            # Also on cancellation or a parser bug, or the breaker would stay half-open
+            # with its trial slot taken for good
+            self._probing = False
+            elapsed = time.monotonic() - start
+            self.latency_seconds += elapsed
+            self.latency_max = max(self.latency_max, elapsed)
+        self.consecutive_failures = 0
+        return timezone
+
+    def _failed(self) -> None:
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.failure_threshold:
+            if self.consecutive_failures == self.failure_threshold:
+                self.trips += 1
+            self.open_until = time.monotonic() + self.cooldown_seconds
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "state": self.state,
+            "calls": self.calls,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "skipped": self.skipped,
+            "trips": self.trips,
+            "latency_ms_avg": self.latency_seconds / self.calls * 1000 if self.calls else 0.0,
+            "latency_ms_max": self.latency_max * 1000,
+        }
+
+
+class TimezoneLookup:
+    """LRU+TTL cache of online lookups in front of a list of providers."""
+
+    def __init__(
+        self,
+        providers: List[Provider],
+        max_entries: int,
+        ttl_seconds: float,
+        negative_ttl_seconds: float,
+        by_prefix: bool = True,
+    ):
+        self.providers = providers
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.by_prefix = by_prefix
+        # key -> (timezone or None, expires at); least recently used first
+        self._entries: "OrderedDict[str, Tuple[Optional[str], float]]" = OrderedDict()
+        self._inflight: Dict[str, "asyncio.Future[Optional[str]]"] = {}
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def cache_key(self, address: IPAddress) -> str:
+        if not self.by_prefix:
+            return str(address)
+        prefix = 24 if address.version == 4 else 48
+        return str(ipaddress.ip_network(f"{address}/{prefix}", strict=False))
+
+    async def lookup(self, address: IPAddress) -> Optional[str]:
+        """Timezone of address from the cache or the providers (None if unknown)."""
+        key = self.cache_key(address)
+        entry = self._entries.get(key)
+        if entry is not None:
+            timezone, expires_at = entry
+            if time.monotonic() < expires_at:
+                self._entries.move_to_end(key)
+                if timezone is None:
+                    self.negative_hits += 1
+                else:
+                    self.hits += 1
+                return timezone
+            del self._entries[key]
+            self.expired += 1
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._resolve(key, str(address)))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: "asyncio.Future[Optional[str]]") -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()
+
+    async def _resolve(self, key: str, ip: str) -> Optional[str]:
+        client = upstream.get_client()
+        asked = False
+        timezone = None
+        for provider in self.providers:
+            if not provider.allow():
+                continue
+            asked = True
+            try:
+                timezone = await provider.lookup(client, ip)
+            except ProviderError:
+                continue
+            if timezone:
+                break
+        # With every breaker open nothing was learned, so nothing is cached
+        if asked:
+            ttl = self.ttl_seconds if timezone else self.negative_ttl_seconds
+            self._store(key, timezone, time.monotonic() + ttl)
+        return timezone
+
+    def _store(self, key: str, timezone: Optional[str], expires_at: float) -> None:
+        self._entries[key] = (timezone, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.negative_hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": (
+                (self.hits + self.negative_hits + self.coalesced) / lookups if lookups else 0.0
+            ),
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "providers": {provider.name: provider.stats() for provider in self.providers},
+        }
+
+
+_lookup: Optional[TimezoneLookup] = None
+
+
+def get_timezone_lookup() -> TimezoneLookup:
+    """Return the process-wide online lookup, configured from settings."""
+    global _lookup
+    if _lookup is None:
+        providers = [
+            Provider(
+                name,
+                url,
+                parse,
+                timeout=settings.VISITOR_TZ_TIMEOUT_SECONDS,
+                failure_threshold=settings.VISITOR_TZ_BREAKER_FAILURES,
+                cooldown_seconds=settings.VISITOR_TZ_BREAKER_COOLDOWN_SECONDS,
+            )
+            for name, (url, parse) in PROVIDERS.items()
+        ]
+        _lookup = TimezoneLookup(
+            providers,
+            max_entries=settings.VISITOR_TZ_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.VISITOR_TZ_CACHE_TTL_SECONDS,
+            negative_ttl_seconds=settings.VISITOR_TZ_NEGATIVE_TTL_SECONDS,
+            by_prefix=settings.VISITOR_TZ_CACHE_BY_PREFIX,
+        )
+    return _lookup
+
+
+def reset_timezone_lookup() -> None:
+    """Forget cached lookups and breaker state (tests, config changes)."""
+    global _lookup
+    _lookup = None
@@ -0,0 +1,50 @@
+"""Shared HTTP client for fetching HLS manifests and segments from YouTube's CDN.
+
+One AsyncClient lives for the whole application (opened and closed by the
+lifespan hook in app.main) so segment fetches reuse pooled keep-alive
+connections instead of paying a TCP+TLS handshake each time.
+"""
+from typing import Optional
+
+import httpx
+
+from app.config import settings
+
+# Per-request timeouts are passed by callers; this is only the pool default.
+DEFAULT_TIMEOUT = 30.0
+
+# Upper bound on how much of a relayed body is held in memory at once.
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def create_client() -> httpx.AsyncClient:
+    """Build a client with the configured connection-pool limits."""
+    limits = httpx.Limits(
+        max_connections=settings.UPSTREAM_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.UPSTREAM_MAX_KEEPALIVE,
+        keepalive_expiry=settings.UPSTREAM_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(follow_redirects=True, timeout=DEFAULT_TIMEOUT, limits=limits)
+
+
+def open_client() -> httpx.AsyncClient:
+    """Create the shared client (called from the app lifespan)."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_client()
+    return _client
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it if the lifespan hook hasn't run."""
+    return open_client()
+
+
+async def close_client() -> None:
+    """Close the shared client and its pooled connections."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
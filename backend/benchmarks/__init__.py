@@ -0,0 +1 @@
+# Benchmarks package (run from backend/: python -m benchmarks.<name>)
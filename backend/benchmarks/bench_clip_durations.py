@@ -0,0 +1,113 @@
+"""Benchmark: native MP4 duration reader vs ffprobe.
+
+Usage (from backend/):
+    python -m benchmarks.bench_clip_durations [--clips 60] [--mdat-mb 8]
+
+Writes a folder of synthetic recorder clips and times reading every clip's
+duration with app.mp4 and with ffprobe. If ffmpeg is installed the clips are
+real encoded videos; otherwise they are hand-built MP4 containers with a
+padded mdat, which exercises the same seek path in the native reader.
+"""
+import argparse
+import shutil
+import statistics
+import struct
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from app.durations import probe_duration
+from app.mp4 import read_mp4_duration_us
+
+
+def _box(box_type: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+
+def write_synthetic_clip(path: Path, seconds: float, mdat_bytes: int) -> None:
+    """Write an MP4 container with mdat before moov (non-faststart, like the recorder)."""
+    mvhd = _box(b"mvhd", struct.pack(">B3xIIII", 0, 0, 0, 1000, int(seconds * 1000)) + bytes(80))
+    with open(path, "wb") as f:
+        f.write(_box(b"ftyp", b"isom\x00\x00\x02\x00isomiso2mp41"))
+        f.write(struct.pack(">I4s", 8 + mdat_bytes, b"mdat"))
+        f.truncate(f.tell() + mdat_bytes)
+        f.seek(0, 2)
+        f.write(_box(b"moov", mvhd))
+
+
+def write_encoded_clip(path: Path, seconds: float) -> None:
+    subprocess.run(
+        [
+            "ffmpeg",
+            "-v",
+            "error",
+            "-y",
+            "-f",
+            "lavfi",
+            "-i",
+            f"testsrc=size=640x360:rate=15:duration={seconds}",
+            "-c:v",
+            "libx264",
+            "-preset",
+            "ultrafast",
+            str(path),
+        ],
+        check=True,
+    )
+
+
+def time_reader(clips, reader):
+    timings = []
+    for clip in clips:
+        start = time.perf_counter()
+        reader(clip)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(name, timings):
+    total = sum(timings)
+    print(
+        f"{name:<10} total {total * 1000:9.2f} ms   "
+        f"mean {statistics.mean(timings) * 1e6:10.1f} us   "
+        f"max {max(timings) * 1e6:10.1f} us"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clips", type=int, default=60, help="number of visit clips")
+    parser.add_argument("--mdat-mb", type=int, default=8, help="synthetic media size per clip")
+    args = parser.parse_args()
+
+    have_ffmpeg = shutil.which("ffmpeg") is not None
+    have_ffprobe = shutil.which("ffprobe") is not None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        clips = []
+        for i in range(args.clips):
+            clip = Path(tmp) / f"falcon_{i:06d}_visit.mp4"
+            seconds = 30 + i % 90
+            if have_ffmpeg:
+                write_encoded_clip(clip, seconds)
+            else:
+                write_synthetic_clip(clip, seconds, args.mdat_mb * 1024 * 1024)
+            clips.append(clip)
+
+        kind = "encoded (ffmpeg)" if have_ffmpeg else f"synthetic ({args.mdat_mb} MB mdat)"
+        print(f"{len(clips)} clips, {kind}")
+
+        native = time_reader(clips, read_mp4_duration_us)
+        report("native", native)
+
+        if have_ffprobe:
+            ffprobe = time_reader(clips, probe_duration)
+            report("ffprobe", ffprobe)
+            print(f"speedup    {sum(ffprobe) / sum(native):9.1f}x")
+        else:
+            print("ffprobe    not installed - skipped")
+
+
+if __name__ == "__main__":
+    main()
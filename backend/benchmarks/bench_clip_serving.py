@@ -0,0 +1,130 @@
+"""Benchmark: clip serving throughput and CPU cost per GB.
+
+Usage (from backend/):
+    python -m benchmarks.bench_clip_serving [--size-mb 64] [--downloads 32] [--concurrency 8]
+
+Serves one synthetic clip over and over through a minimal ASGI server that
+writes to local sockets (a thread drains the other end of each), and reports
+MB/s and process CPU seconds per GB sent:
+
+  starlette     FileResponse, 64 KiB reads copied through userspace (before)
+  chunked       RangeFileResponse without server extensions (uvicorn today)
+  pathsend      RangeFileResponse, server sendfile()s the whole file
+  zerocopysend  RangeFileResponse answering Range requests, server sendfile()s
+"""
+import argparse
+import asyncio
+import os
+import socket
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from starlette.responses import FileResponse
+
+from app.file_responses import PATHSEND, ZEROCOPYSEND, RangeFileResponse
+
+
+class SocketServer:
+    """Just enough of an ASGI server to write response bodies to one connection."""
+
+    def __init__(self, extensions):
+        self.extensions = extensions
+        self.sock, self.peer = socket.socketpair()
+        self.sock.setblocking(False)
+        self.received = 0
+        self.drainer = threading.Thread(target=self.drain, daemon=True)
+        self.drainer.start()
+
+    def drain(self):
+        buf = bytearray(1024 * 1024)
+        while True:
+            n = self.peer.recv_into(buf)
+            if not n:
+                return
+            self.received += n
+
+    async def send(self, message):
+        loop = asyncio.get_running_loop()
+        if message["type"] == "http.response.body":
+            await loop.sock_sendall(self.sock, message.get("body", b""))
+        elif message["type"] == PATHSEND:
+            with open(message["path"], "rb") as file:
+                await loop.sock_sendfile(self.sock, file)
+        elif message["type"] == ZEROCOPYSEND:
+            await loop.sock_sendfile(
+                self.sock, message["file"], message["offset"], message["count"]
+            )
+
+    def scope(self, headers):
+        return {
+            "type": "http",
+            "method": "GET",
+            "headers": [(k.encode(), v.encode()) for k, v in headers.items()],
+            "extensions": {name: {} for name in self.extensions},
+        }
+
+    def close(self):
+        self.sock.close()
+        self.drainer.join()
+        self.peer.close()
+
+
+async def run_mode(path: Path, factory, extensions, headers, args):
+    # One connection per concurrent download, as with real clients
+    servers = [SocketServer(extensions) for _ in range(args.concurrency)]
+    queue = list(range(args.downloads))
+
+    async def worker(server):
+        while queue:
+            queue.pop()
+            await factory(path)(server.scope(headers), None, server.send)
+
+    cpu, wall = time.process_time(), time.perf_counter()
+    await asyncio.gather(*(worker(server) for server in servers))
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    for server in servers:
+        server.close()
+    received = sum(server.received for server in servers)
+    return received / 1e6 / wall, cpu / (received / 1e9)
+
+
+async def run(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "falcon_120000_visit.mp4"
+        with open(path, "wb") as f:
+            f.write(os.urandom(args.size_mb * 1024 * 1024))
+        size = path.stat().st_size
+        whole = {}
+        # Everything but the first byte, so the range path is exercised on the same bytes
+        ranged = {"range": f"bytes=1-{size - 1}"}
+
+        modes = [
+            ("starlette", lambda p: FileResponse(p, media_type="video/mp4"), [], whole),
+            ("chunked", lambda p: RangeFileResponse(p, media_type="video/mp4"), [], whole),
+            ("pathsend", lambda p: RangeFileResponse(p, media_type="video/mp4"), [PATHSEND], whole),
+            (
+                "zerocopysend",
+                lambda p: RangeFileResponse(p, media_type="video/mp4"),
+                [ZEROCOPYSEND],
+                ranged,
+            ),
+        ]
+        print(f"{args.downloads} downloads of {args.size_mb} MiB, {args.concurrency} at a time")
+        for name, factory, extensions, headers in modes:
+            rate, cpu_per_gb = await run_mode(path, factory, extensions, headers, args)
+            print(f"{name:<13} {rate:9.0f} MB/s   {cpu_per_gb:6.3f} CPU s/GB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=64, help="clip size")
+    parser.add_argument("--downloads", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Benchmark: time from a clip being closed to it appearing in /events.
+
+Usage (from backend/):
+    python -m benchmarks.bench_clip_visibility [--clips 50] [--rescan-seconds 1.0]
+
+Builds a throwaway stream, then repeatedly finishes a visit clip the way the
+recorder does (write <name>.tmp, close, rename into place) while polling
+/api/streams/<id>/events in-process until the clip is listed. Compares:
+
+  inotify  app.clip_watcher following the directory
+  rescan   the watcher's fallback (periodic rescans, no inotify)
+  stat     no watcher; the index revalidates the day directory per request
+
+Also reports the mean /events request time in each mode.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import httpx
+import yaml
+
+from app import clip_watcher
+from app.clip_index import clip_index
+from app.config import settings
+from app.main import app
+from app.routers.streams import all_clips_dirs
+from benchmarks.bench_clip_durations import write_synthetic_clip
+
+STREAM_ID = "bench-stream"
+DATE = "2026-01-14"
+POLL_INTERVAL = 0.001
+
+
+def make_stream(data_dir: Path) -> Path:
+    stream_dir = data_dir / STREAM_ID
+    day_dir = stream_dir / "clips" / DATE
+    day_dir.mkdir(parents=True)
+    with open(stream_dir / "config.yaml", "w") as f:
+        yaml.dump({"stream_name": "Bench", "timezone": "UTC"}, f)
+    return day_dir
+
+
+def finish_clip(day_dir: Path, index: int) -> str:
+    name = f"falcon_{index // 3600:02d}{index // 60 % 60:02d}{index % 60:02d}_visit.mp4"
+    partial = day_dir / f"{name}.tmp"
+    write_synthetic_clip(partial, 30, 4096)
+    os.rename(partial, day_dir / name)
+    return name
+
+
+async def measure(viewer, day_dir: Path, first: int, clips: int):
+    url = f"/api/streams/{STREAM_ID}/events?date={DATE}"
+    latencies, request_times = [], []
+    for i in range(first, first + clips):
+        name = finish_clip(day_dir, i)
+        closed = time.perf_counter()
+        while True:
+            start = time.perf_counter()
+            events = (await viewer.get(url)).json()["events"]
+            request_times.append(time.perf_counter() - start)
+            if any(e["clip"] == name for e in events):
+                break
+            await asyncio.sleep(POLL_INTERVAL)
+        latencies.append(time.perf_counter() - closed)
+    return latencies, request_times
+
+
+def report(mode, latencies, request_times):
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        f"{mode:<8} visible p50 {statistics.median(latencies) * 1000:8.2f} ms   "
+        f"p99 {p99 * 1000:8.2f} ms   max {latencies[-1] * 1000:8.2f} ms   "
+        f"/events mean {statistics.mean(request_times) * 1000:6.2f} ms"
+    )
+
+
+async def run(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp)
+        day_dir = make_stream(data_dir)
+        settings.DATA_DIR = data_dir
+        settings.CACHE_DIR = data_dir / ".cache"
+        settings._streams = None
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as viewer:
+            modes = ["inotify", "rescan", "stat"]
+            for n, mode in enumerate(modes):
+                clip_index.forget()
+                if mode == "inotify":
+                    await clip_watcher.start_clip_watcher(all_clips_dirs(), args.rescan_seconds)
+                elif mode == "rescan":
+                    with patch.object(clip_watcher, "Inotify", side_effect=OSError("disabled")):
+                        await clip_watcher.start_clip_watcher(all_clips_dirs(), args.rescan_seconds)
+                try:
+                    latencies, request_times = await measure(
+                        viewer, day_dir, n * args.clips, args.clips
+                    )
+                finally:
+                    await clip_watcher.stop_clip_watcher()
+                report(mode, latencies, request_times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clips", type=int, default=50, help="clips finished per mode")
+    parser.add_argument("--rescan-seconds", type=float, default=1.0, help="fallback interval")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
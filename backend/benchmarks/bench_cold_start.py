@@ -0,0 +1,131 @@
+"""Benchmark: first requests after a restart, with and without the index snapshot.
+
+Usage (from backend/):
+    python -m benchmarks.bench_cold_start [--streams 3] [--days 120] [--visits 12]
+
+Builds a synthetic multi-month clip tree with stream configs, serves it once to
+fill every persistent cache (durations, event store, index snapshot), then
+simulates restarts by dropping all in-memory state and times the first
+landing-page and /events requests:
+
+  no snapshot   the index has to list every day directory again
+  snapshot      the index is loaded in one read and revalidated by stat
+  warm          the same requests on an already-running process
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import httpx
+import yaml
+
+from app import event_store
+from app.clip_index import clip_index
+from app.config import settings
+from app.index_snapshot import load_snapshot, save_snapshot, snapshot_path
+from app.main import app
+from benchmarks.bench_clip_durations import write_synthetic_clip
+
+
+def build_tree(root: Path, streams: int, days: int, visits: int) -> str:
+    """Write streams/clips/<day>/... ending today; return the newest date."""
+    today = datetime.now()
+    for s in range(streams):
+        stream_dir = root / f"stream-{s}"
+        stream_dir.mkdir(parents=True)
+        with open(stream_dir / "config.yaml", "w") as f:
+            yaml.dump({"stream_name": f"Stream {s}", "timezone": "UTC"}, f)
+        for d in range(days):
+            date_str = (today - timedelta(days=d)).strftime("%Y-%m-%d")
+            day_dir = stream_dir / "clips" / date_str
+            day_dir.mkdir(parents=True)
+            for v in range(visits):
+                stem = f"falcon_{6 + v:02d}{v * 4 % 60:02d}00"
+                write_synthetic_clip(day_dir / f"{stem}_visit.mp4", 30 + v, 1024)
+                (day_dir / f"{stem}_visit.jpg").write_bytes(b"jpeg")
+                (day_dir / f"{stem}_arrival.jpg").write_bytes(b"jpeg")
+            (day_dir / f"events_{date_str}.json").write_text("[]")
+            settle(day_dir)
+        settle(stream_dir / "clips")
+    return today.strftime("%Y-%m-%d")
+
+
+def settle(path: Path) -> None:
+    """Backdate a directory so the index doesn't treat its fresh listing as racy."""
+    when = time.time() - 3600
+    os.utime(path, (when, when))
+
+
+def restart() -> None:
+    """Forget everything a new process wouldn't have in memory."""
+    clip_index.forget()
+    store = event_store._store
+    if store is not None:
+        store.close()
+        event_store._store = None
+
+
+async def first_requests(viewer, paths):
+    timings = []
+    for path in paths:
+        start = time.perf_counter()
+        response = await viewer.get(path)
+        response.raise_for_status()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(label, setup, timings, paths):
+    cells = "   ".join(
+        f"{p.split('?')[0].rsplit('/', 1)[-1]} {t * 1000:8.1f} ms" for p, t in zip(paths, timings)
+    )
+    print(f"{label:<12} setup {setup * 1000:8.1f} ms   {cells}")
+
+
+async def run(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        newest = build_tree(root, args.streams, args.days, args.visits)
+        settings.DATA_DIR = root
+        settings.CACHE_DIR = root / ".cache"
+        settings._streams = None
+        days = args.streams * args.days
+        print(f"{args.streams} streams x {args.days} days ({days} day directories)")
+
+        paths = ["/api/streams", f"/api/streams/stream-0/events?date={newest}"]
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as viewer:
+            # First ever start: fills the duration cache and the event store
+            await first_requests(viewer, paths)
+            start = time.perf_counter()
+            size = save_snapshot(clip_index, snapshot_path())
+            elapsed = time.perf_counter() - start
+            print(f"snapshot     {size / 1024:.1f} KiB written in {elapsed * 1000:.1f} ms")
+
+            restart()
+            report("no snapshot", 0.0, await first_requests(viewer, paths), paths)
+
+            restart()
+            start = time.perf_counter()
+            load_snapshot(clip_index, snapshot_path())
+            setup = time.perf_counter() - start
+            report("snapshot", setup, await first_requests(viewer, paths), paths)
+
+            report("warm", 0.0, await first_requests(viewer, paths), paths)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--streams", type=int, default=3)
+    parser.add_argument("--days", type=int, default=120)
+    parser.add_argument("--visits", type=int, default=12, help="visits per stream per day")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
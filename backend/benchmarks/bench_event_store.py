@@ -0,0 +1,103 @@
+"""Benchmark: range queries over a full season of clips.
+
+Usage (from backend/):
+    python -m benchmarks.bench_event_store [--streams 3] [--days 180] [--visits 12]
+
+Builds a synthetic clip tree (empty files named like the recorder's output),
+then times the first sync into app.event_store, a no-op resync, an incremental
+resync after one new clip, and each range query the API runs.
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytz
+
+from app.clip_index import IMAGE_EXTENSIONS, VIDEO_EXTENSIONS, clip_index
+from app.event_store import EventStore
+
+TZ = pytz.timezone("America/New_York")
+
+
+def build_tree(root: Path, streams: int, days: int, visits: int):
+    start = datetime(2026, 1, 1)
+    clips_dirs = {}
+    for s in range(streams):
+        clips_dir = root / f"stream-{s}" / "clips"
+        for d in range(days):
+            day_dir = clips_dir / (start + timedelta(days=d)).strftime("%Y-%m-%d")
+            day_dir.mkdir(parents=True)
+            for v in range(visits):
+                time_str = f"{6 + v:02d}{v * 4 % 60:02d}00"
+                for suffix in ("visit.mp4", "visit.jpg", "arrival.jpg", "arrival.mp4"):
+                    (day_dir / f"falcon_{time_str}_{suffix}").touch()
+        clips_dirs[f"stream-{s}"] = clips_dir
+    return clips_dirs, start
+
+
+def timed(func, repeat=1):
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - t0)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--streams", type=int, default=3)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--visits", type=int, default=12, help="visits per stream per day")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        clips_dirs, start = build_tree(root, args.streams, args.days, args.visits)
+        files = args.streams * args.days * args.visits * 4
+        print(f"{args.streams} streams x {args.days} days, {files} files")
+
+        store = EventStore(root / "events.sqlite3")
+
+        def sync_all():
+            for stream_id, clips_dir in clips_dirs.items():
+                store.sync(stream_id, clips_dir, TZ)
+
+        print(f"first sync        {timed(sync_all) * 1000:9.1f} ms")
+        print(f"no-op resync      {timed(sync_all, 5) * 1000:9.2f} ms (stat per day dir)")
+        for stream_id, clips_dir in clips_dirs.items():
+            clip_index.trust(clips_dir, clip_index.days(clips_dir))
+        print(f"no-op, watched    {timed(sync_all, 5) * 1000:9.3f} ms")
+        first_day = start.strftime("%Y-%m-%d")
+        (clips_dirs["stream-0"] / first_day / "falcon_235900_visit.mp4").touch()
+        clip_index.add_file(clips_dirs["stream-0"], first_day, "falcon_235900_visit.mp4")
+        print(f"one new clip      {timed(sync_all) * 1000:9.3f} ms")
+
+        end = start + timedelta(days=args.days)
+        last_day = (end - timedelta(days=1)).strftime("%Y-%m-%d")
+        queries = {
+            "stats 24h": lambda: store.clips_between(
+                "stream-1", TZ.localize(end - timedelta(hours=24)), extensions=("mp4",)
+            ),
+            "stats 30d": lambda: store.clips_between(
+                "stream-1", TZ.localize(end - timedelta(days=30)), extensions=("mp4",)
+            ),
+            "stats season": lambda: store.clips_between(
+                "stream-1", TZ.localize(start), extensions=("mp4",)
+            ),
+            "dates (season)": lambda: store.dates_with_clips(
+                "stream-1", first_day, last_day, "visit", VIDEO_EXTENSIONS
+            ),
+            "latest snapshot": lambda: store.latest_clip(
+                "stream-1", "arrival", IMAGE_EXTENSIONS, first_day, last_day
+            ),
+        }
+        for name, query in queries.items():
+            print(f"{name:<17} {timed(query, 20) * 1000:9.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
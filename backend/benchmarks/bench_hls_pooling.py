@@ -0,0 +1,154 @@
+"""Benchmark: HLS segment fetches with and without a pooled upstream client.
+
+Usage (from backend/):
+    python -m benchmarks.bench_hls_pooling [--fetches 200] [--concurrency 8] [--segment-kb 1024]
+
+Starts a local stand-in HTTPS origin (self-signed certificate generated with
+the openssl CLI) that serves fixed-size segments over keep-alive HTTP/1.1,
+then compares a fresh AsyncClient per fetch (the old proxy behaviour) with
+the shared client from app.upstream.
+"""
+import argparse
+import asyncio
+import os
+import ssl
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import httpx
+
+from app import upstream
+
+
+def make_certificate(directory: Path):
+    cert, key = directory / "cert.pem", directory / "key.pem"
+    subprocess.run(
+        [
+            "openssl",
+            "req",
+            "-x509",
+            "-newkey",
+            "rsa:2048",
+            "-nodes",
+            "-keyout",
+            str(key),
+            "-out",
+            str(cert),
+            "-days",
+            "1",
+            "-subj",
+            "/CN=localhost",
+            "-addext",
+            "subjectAltName=DNS:localhost,IP:127.0.0.1",
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return cert, key
+
+
+def start_origin(cert: Path, key: Path, segment: bytes) -> int:
+    """Run a keep-alive HTTPS origin on a background thread; return its port."""
+    ready = threading.Event()
+    port_holder = {}
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                request = await reader.readuntil(b"\r\n\r\n")
+                if not request:
+                    break
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: video/MP2T\r\n"
+                    + f"Content-Length: {len(segment)}\r\n\r\n".encode()
+                    + segment
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve():
+        ctx = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        ctx.load_cert_chain(cert, key)
+        server = await asyncio.start_server(handle, "127.0.0.1", 0, ssl=ctx)
+        port_holder["port"] = server.sockets[0].getsockname()[1]
+        ready.set()
+        async with server:
+            await server.serve_forever()
+
+    threading.Thread(target=lambda: asyncio.run(serve()), daemon=True).start()
+    ready.wait()
+    return port_holder["port"]
+
+
+async def run(url: str, fetches: int, concurrency: int, pooled: bool):
+    latencies = []
+    shared = upstream.create_client() if pooled else None
+    queue = iter(range(fetches))
+
+    async def fetch_once():
+        start = time.perf_counter()
+        if shared is not None:
+            resp = await shared.get(url)
+        else:
+            async with httpx.AsyncClient(follow_redirects=True, timeout=30) as client:
+                resp = await client.get(url)
+        resp.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+        return len(resp.content)
+
+    async def worker():
+        total = 0
+        for _ in queue:
+            total += await fetch_once()
+        return total
+
+    start = time.perf_counter()
+    totals = await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    if shared is not None:
+        await shared.aclose()
+    return latencies, sum(totals), elapsed
+
+
+def report(name, latencies, total_bytes, elapsed):
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(
+        f"{name:<10} p50 {statistics.median(ordered) * 1000:7.2f} ms   "
+        f"p99 {p99 * 1000:7.2f} ms   "
+        f"{len(latencies) / elapsed:8.1f} fetch/s   "
+        f"{total_bytes / elapsed / 1e6:8.1f} MB/s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fetches", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--segment-kb", type=int, default=1024)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cert, key = make_certificate(Path(tmp))
+        # Both client variants trust the stand-in certificate via the environment
+        os.environ["SSL_CERT_FILE"] = str(cert)
+        port = start_origin(cert, key, os.urandom(args.segment_kb * 1024))
+        url = f"https://127.0.0.1:{port}/videoplayback?sq=1"
+
+        print(
+            f"{args.fetches} fetches of {args.segment_kb} KB, "
+            f"concurrency {args.concurrency}, stand-in HTTPS origin"
+        )
+        for name, pooled in (("unpooled", False), ("pooled", True)):
+            report(name, *asyncio.run(run(url, args.fetches, args.concurrency, pooled)))
+
+
+if __name__ == "__main__":
+    main()
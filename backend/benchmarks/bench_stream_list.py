@@ -0,0 +1,126 @@
+"""Benchmark: landing-page /api/streams latency by number of streams.
+
+Usage (from backend/):
+    python -m benchmarks.bench_stream_list [--days 30] [--visits 8] [--requests 100]
+
+For 2, 10 and 50 synthetic streams, reports p50/p99 of:
+
+  serial     cards built one after another, no memoization (the old handler)
+  parallel   cards built concurrently on the blocking pool, no memoization
+  memoized   the endpoint as served (TTL + validator memo)
+  304        the endpoint with If-None-Match from the previous response
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import httpx
+import yaml
+
+from app.blocking import run_blocking
+from app.clip_index import clip_index
+from app.config import settings
+from app.main import app
+from app.routers import streams as streams_router
+
+
+def build_tree(root: Path, streams: int, days: int, visits: int) -> None:
+    today = datetime.now()
+    old = time.time() - 3600
+    for s in range(streams):
+        stream_dir = root / f"stream-{s:02d}"
+        stream_dir.mkdir(parents=True)
+        with open(stream_dir / "config.yaml", "w") as f:
+            yaml.dump({"stream_name": f"Stream {s}", "timezone": "UTC"}, f)
+        for d in range(days):
+            date_str = (today - timedelta(days=d)).strftime("%Y-%m-%d")
+            day_dir = stream_dir / "clips" / date_str
+            day_dir.mkdir(parents=True)
+            for v in range(visits):
+                stem = f"falcon_{v:02d}{v * 7 % 60:02d}00"
+                (day_dir / f"{stem}_visit.mp4").write_bytes(b"clip")
+                (day_dir / f"{stem}_arrival.jpg").write_bytes(b"jpeg")
+            (day_dir / f"events_{date_str}.json").write_text("[]")
+            os.utime(day_dir, (old, old))
+        os.utime(stream_dir / "clips", (old, old))
+
+
+async def serial_uncached():
+    for stream_id, config in settings.streams.items():
+        await run_blocking(streams_router.summarize_stream, stream_id, config)
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    return statistics.median(timings), timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+
+
+async def measure(func, requests):
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        await func()
+        timings.append(time.perf_counter() - start)
+    return percentiles(timings)
+
+
+async def run_size(streams: int, args) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        build_tree(root, streams, args.days, args.visits)
+        settings.DATA_DIR = root
+        settings.CACHE_DIR = root / ".cache"
+        settings._streams = None
+        clip_index.forget()
+        streams_router.invalidate_stream_summaries()
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as viewer:
+            # Warm the index and event store so every mode starts equal
+            etag = (await viewer.get("/api/streams")).headers["etag"]
+
+            async def parallel_uncached():
+                streams_router.invalidate_stream_summaries()
+                (await viewer.get("/api/streams")).raise_for_status()
+
+            async def memoized():
+                (await viewer.get("/api/streams")).raise_for_status()
+
+            async def revalidated():
+                response = await viewer.get("/api/streams", headers={"If-None-Match": etag})
+                assert response.status_code == 304
+
+            results = {
+                "serial": await measure(serial_uncached, args.requests),
+                "parallel": await measure(parallel_uncached, args.requests),
+                "memoized": await measure(memoized, args.requests),
+                "304": await measure(revalidated, args.requests),
+            }
+        cells = "   ".join(
+            f"{name} {p50 * 1000:7.2f}/{p99 * 1000:7.2f}" for name, (p50, p99) in results.items()
+        )
+        print(f"{streams:>3} streams   {cells}")
+
+
+async def run(args):
+    print("p50/p99 ms per request")
+    for streams in (2, 10, 50):
+        await run_size(streams, args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=30, help="days of clips per stream")
+    parser.add_argument("--visits", type=int, default=8, help="visits per stream per day")
+    parser.add_argument("--requests", type=int, default=100, help="requests per mode")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,35 @@
 """Test configuration and fixtures."""
+import asyncio
+import os
 import tempfile
 import json
 from pathlib import Path
+import httpx
 import yaml
 import pytest
 
 
+@pytest.fixture(autouse=True)
+def reset_shared_caches():
+    """Start every test with empty process-wide caches."""
+    import app.routers.streams as streams_router
+    from app.clip_index import clip_index
+    from app.hls import reset_playlist_cache
+    from app.segment_cache import reset_segment_cache
+    from app.timezone_lookup import reset_timezone_lookup
+
+    reset_segment_cache()
+    reset_playlist_cache()
+    reset_timezone_lookup()
+    clip_index.forget()
+    streams_router._live_url_activity.clear()
+    streams_router._live_url_refresh_status.clear()
+    streams_router.invalidate_stream_summaries()
+    yield
+    reset_segment_cache()
+    reset_playlist_cache()
+
+
 @pytest.fixture
 def test_data_dir():
     """Create a temporary test data directory."""
@@ -143,5 +167,56 @@ def override_streams_config(mock_stream_config, monkeypatch):
     from app.config import settings
 
     monkeypatch.setattr(settings, "DATA_DIR", mock_stream_config["data_dir"])
+    monkeypatch.setattr(settings, "CACHE_DIR", mock_stream_config["data_dir"] / ".cache")
     monkeypatch.setattr(settings, "_streams", None)
     return settings
+
+
+def settle(path, seconds_ago=60):
+    """Backdate a directory's mtime so its listing isn't treated as racy."""
+    when = os.stat(path).st_mtime - seconds_ago
+    os.utime(path, (when, when))
+
+
+class ChunkedStream(httpx.AsyncByteStream):
+    """Upstream body delivered in chunks, recording whether it was closed.
+
+    Yields to the event loop between chunks, like a network read would.
+    """
+
+    def __init__(self, *chunks: bytes):
+        self.chunks = chunks
+        self.sent = 0
+        self.closed = False
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            await asyncio.sleep(0)
+            self.sent += 1
+            yield chunk
+
+    async def aclose(self):
+        self.closed = True
+
+
+@pytest.fixture
+def mock_upstream(monkeypatch):
+    """Route requests made through the shared upstream client to a handler.
+
+    Usage: mock_upstream(lambda request: httpx.Response(200, content=b"..."))
+    Returns the list of requests the handler received.
+    """
+    from app import upstream
+
+    seen = []
+
+    def install(handler):
+        def record(request):
+            seen.append(request)
+            return handler(request)
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(record), follow_redirects=True)
+        monkeypatch.setattr(upstream, "_client", client)
+        return seen
+
+    return install
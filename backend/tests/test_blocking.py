@@ -0,0 +1,66 @@
+"""Tests that blocking work stays off the event loop."""
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock, patch
+import httpx
+from app.main import app
+from app.blocking import run_blocking
+import app.routers.streams as streams_router
+
+
+SLOW_SECONDS = 1.0
+
+
+async def test_run_blocking_uses_worker_thread():
+    """run_blocking executes on the bounded pool, not the loop thread."""
+    loop_thread = threading.get_ident()
+    worker_thread = await run_blocking(threading.get_ident)
+    assert worker_thread != loop_thread
+
+
+def _slow_ytdlp(*args, **kwargs):
+    time.sleep(SLOW_SECONDS)
+    result = MagicMock()
+    result.returncode = 0
+    result.stdout = "https://manifest.googlevideo.com/fake/hls/manifest.m3u8\n"
+    return result
+
+
+def _slow_ffprobe(*args, **kwargs):
+    time.sleep(SLOW_SECONDS)
+    result = MagicMock()
+    result.returncode = 0
+    result.stdout = "12.0\n"
+    return result
+
+
+async def _health_latency_while(path: str) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        slow = asyncio.create_task(client.get(path))
+        await asyncio.sleep(0.1)  # let the slow request start
+
+        start = time.perf_counter()
+        health = await client.get("/health")
+        elapsed = time.perf_counter() - start
+
+        assert health.status_code == 200
+        assert not slow.done(), "stand-in finished early; test would prove nothing"
+        assert (await slow).status_code == 200
+    return elapsed
+
+
+async def test_health_stays_fast_during_slow_ytdlp(override_streams_config):
+    """A 1s yt-dlp resolution must not delay a concurrent /health request."""
+    streams_router._live_url_cache.clear()
+    with patch("app.routers.streams.subprocess.run", side_effect=_slow_ytdlp):
+        elapsed = await _health_latency_while("/api/streams/kanyo-harvard/live-url")
+    assert elapsed < SLOW_SECONDS / 4
+
+
+async def test_health_stays_fast_during_slow_ffprobe(override_streams_config):
+    """Probing clip durations for /events must not delay a concurrent /health request."""
+    with patch("app.durations.subprocess.run", side_effect=_slow_ffprobe):
+        elapsed = await _health_latency_while("/api/streams/kanyo-harvard/events?date=2026-01-14")
+    assert elapsed < SLOW_SECONDS / 4
@@ -0,0 +1,126 @@
+"""Tests for the shared clip directory index."""
+import os
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.main import app
+from app.clip_index import ClipIndex, clip_index
+from tests.conftest import settle
+
+
+client = TestClient(app)
+
+
+def _make_day(test_data_dir, names):
+    day_dir = test_data_dir / "clips" / "2026-01-14"
+    day_dir.mkdir(parents=True)
+    for name in names:
+        (day_dir / name).write_bytes(b"data")
+    settle(day_dir)
+    return day_dir
+
+
+def test_day_parses_clip_entries(test_data_dir):
+    _make_day(
+        test_data_dir,
+        [
+            "falcon_072315_visit.mp4",
+            "falcon_072315_arrival.jpg",
+            "falcon_074530_departure.mp4",
+            "falcon_080000_visit.mp4.tmp",
+            "events_2026-01-14.json",
+        ],
+    )
+    day = ClipIndex().day(test_data_dir / "clips", "2026-01-14")
+
+    assert [c.name for c in day.clips] == [
+        "falcon_072315_arrival.jpg",
+        "falcon_072315_visit.mp4",
+        "falcon_074530_departure.mp4",
+    ]
+    visit = day.of_type("visit")[0]
+    assert (visit.time_str, visit.ext, visit.size, visit.is_video) == ("072315", "mp4", 4, True)
+    assert "events_2026-01-14.json" in day.names
+
+
+def test_missing_day_returns_none(test_data_dir):
+    (test_data_dir / "clips").mkdir()
+    assert ClipIndex().day(test_data_dir / "clips", "2026-01-01") is None
+
+
+def test_unchanged_day_is_not_rescanned(test_data_dir):
+    _make_day(test_data_dir, ["falcon_072315_visit.mp4"])
+    index = ClipIndex()
+
+    first = index.day(test_data_dir / "clips", "2026-01-14")
+    with patch("app.clip_index.os.scandir") as scandir:
+        second = index.day(test_data_dir / "clips", "2026-01-14")
+
+    scandir.assert_not_called()
+    assert second is first
+    stats = index.stats()
+    assert (stats["days"], stats["scans"], stats["revalidations"]) == (1, 1, 1)
+
+
+def test_changed_day_is_rescanned(test_data_dir):
+    day_dir = _make_day(test_data_dir, ["falcon_072315_visit.mp4"])
+    index = ClipIndex()
+    index.day(test_data_dir / "clips", "2026-01-14")
+
+    (day_dir / "falcon_093000_visit.mp4").write_bytes(b"data")
+    day = index.day(test_data_dir / "clips", "2026-01-14")
+
+    assert [c.time_str for c in day.of_type("visit")] == ["072315", "093000"]
+
+
+def test_recently_changed_day_is_not_trusted(test_data_dir):
+    """A listing taken in the same instant as a write is rescanned next time."""
+    day_dir = test_data_dir / "clips" / "2026-01-14"
+    day_dir.mkdir(parents=True)
+    index = ClipIndex()
+
+    assert index.day(test_data_dir / "clips", "2026-01-14").racy
+    # Same mtime tick: a write the first scan may have missed
+    mtime = os.stat(day_dir).st_mtime_ns
+    (day_dir / "falcon_072315_visit.mp4").write_bytes(b"data")
+    os.utime(day_dir, ns=(mtime, mtime))
+
+    assert len(index.day(test_data_dir / "clips", "2026-01-14").clips) == 1
+
+
+def test_recorded_events_follow_events_json(test_data_dir):
+    day_dir = _make_day(test_data_dir, [])
+    events_file = day_dir / "events_2026-01-14.json"
+    events_file.write_text('[{"thumbnail_path": "falcon_072315_arrival.jpg"}]')
+    settle(day_dir)
+    index = ClipIndex()
+
+    assert index.has_recorded_events(test_data_dir / "clips", "2026-01-14")
+
+    events_file.write_text("[]")
+    os.utime(events_file, ns=(0, 1))
+    assert not index.has_recorded_events(test_data_dir / "clips", "2026-01-14")
+
+
+def test_repeat_endpoint_requests_do_not_relist(override_streams_config, test_data_dir):
+    """Once indexed, clip endpoints revalidate days without listing them again."""
+    for day_dir in (test_data_dir / "kanyo-harvard" / "clips").iterdir():
+        settle(day_dir)
+    for stream in ("kanyo-harvard", "kanyo-nsw"):
+        settle(test_data_dir / stream / "clips")
+
+    paths = [
+        "/api/streams",
+        "/api/streams/kanyo-harvard/events?date=2026-01-14",
+        "/api/streams/kanyo-harvard/dates-with-events?start_date=2026-01-01&end_date=2026-01-31",
+        "/api/streams/kanyo-harvard/stats?range=3d",
+        "/api/streams/kanyo-harvard/snapshot",
+    ]
+    first = [client.get(path) for path in paths]
+    with patch("app.clip_index.os.scandir") as scandir:
+        second = [client.get(path) for path in paths]
+
+    scandir.assert_not_called()
+    for a, b in zip(first, second):
+        assert a.status_code == b.status_code == 200
+        assert a.content == b.content
+    assert clip_index.stats()["revalidations"] > 0
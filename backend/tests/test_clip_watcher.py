@@ -0,0 +1,176 @@
+"""Tests for the inotify-driven clip index updates."""
+import asyncio
+import os
+import sys
+from contextlib import asynccontextmanager
+from unittest.mock import patch
+import httpx
+import pytest
+from app.main import app
+from app.clip_index import ClipIndex, clip_index
+from app.clip_watcher import ClipWatcher, start_clip_watcher, stop_clip_watcher
+from app.routers.streams import all_clips_dirs
+
+
+linux_only = pytest.mark.skipif(sys.platform != "linux", reason="inotify is Linux-only")
+
+
+async def _eventually(condition, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("condition not met before timeout")
+        await asyncio.sleep(0.005)
+
+
+def _finish_clip(day_dir, name, data=b"clip"):
+    """Write a clip the way the recorder does: temp file, then rename into place."""
+    partial = day_dir / f"{name}.tmp"
+    partial.write_bytes(data)
+    os.rename(partial, day_dir / name)
+
+
+@asynccontextmanager
+async def _watching(test_data_dir):
+    clips_dir = test_data_dir / "clips"
+    (clips_dir / "2026-01-14").mkdir(parents=True)
+    index = ClipIndex()
+    watcher = ClipWatcher(index, rescan_seconds=3600)
+    await watcher.start([clips_dir])
+    try:
+        yield clips_dir, index, watcher
+    finally:
+        await watcher.stop()
+
+
+def _names(index, clips_dir, date_str="2026-01-14"):
+    day = index.day(clips_dir, date_str)
+    return [c.name for c in day.clips] if day else None
+
+
+@linux_only
+async def test_renamed_clip_appears_without_rescan(test_data_dir):
+    async with _watching(test_data_dir) as (clips_dir, index, watcher):
+        scans = index.scans
+
+        _finish_clip(clips_dir / "2026-01-14", "falcon_093000_visit.mp4")
+        await _eventually(lambda: _names(index, clips_dir) == ["falcon_093000_visit.mp4"])
+
+        assert index.scans == scans
+        assert index.day(clips_dir, "2026-01-14").clips[0].size == 4
+        assert watcher.stats()["watched_dirs"] == 1
+
+
+@linux_only
+async def test_partial_files_are_ignored(test_data_dir):
+    async with _watching(test_data_dir) as (clips_dir, index, watcher):
+        day_dir = clips_dir / "2026-01-14"
+
+        (day_dir / "falcon_093000_visit.mp4.tmp").write_bytes(b"partial")
+        (day_dir / "marker").write_bytes(b"")
+        await _eventually(lambda: "marker" in index.day(clips_dir, "2026-01-14").names)
+
+        assert "falcon_093000_visit.mp4.tmp" not in index.day(clips_dir, "2026-01-14").names
+        assert _names(index, clips_dir) == []
+
+
+@linux_only
+async def test_deleted_clip_and_new_day(test_data_dir):
+    async with _watching(test_data_dir) as (clips_dir, index, watcher):
+        _finish_clip(clips_dir / "2026-01-14", "falcon_093000_visit.mp4")
+        await _eventually(lambda: _names(index, clips_dir) == ["falcon_093000_visit.mp4"])
+
+        os.remove(clips_dir / "2026-01-14" / "falcon_093000_visit.mp4")
+        await _eventually(lambda: _names(index, clips_dir) == [])
+
+        (clips_dir / "2026-01-15").mkdir()
+        _finish_clip(clips_dir / "2026-01-15", "falcon_060000_visit.mp4")
+        await _eventually(
+            lambda: _names(index, clips_dir, "2026-01-15") == ["falcon_060000_visit.mp4"]
+        )
+
+
+@linux_only
+async def test_watched_lookups_do_not_touch_filesystem(test_data_dir):
+    async with _watching(test_data_dir) as (clips_dir, index, watcher):
+        with patch("app.clip_index.os.stat", side_effect=AssertionError("stat")), patch(
+            "app.clip_index.os.scandir", side_effect=AssertionError("scandir")
+        ):
+            assert index.day(clips_dir, "2026-01-14") is not None
+            assert index.day(clips_dir, "2026-02-01") is None
+
+
+@linux_only
+async def test_directories_added_and_removed_at_runtime(test_data_dir):
+    async with _watching(test_data_dir) as (clips_dir, index, watcher):
+        other = test_data_dir / "other" / "clips"
+        (other / "2026-01-14").mkdir(parents=True)
+        await watcher.add(other)
+        assert watcher.stats()["watched_dirs"] == 2
+        assert index.is_trusted(other)
+
+        _finish_clip(other / "2026-01-14", "falcon_093000_visit.mp4")
+        await _eventually(lambda: _names(index, other) == ["falcon_093000_visit.mp4"])
+
+        watcher.remove(other)
+        assert watcher.stats()["watched_dirs"] == 1
+        assert watcher.stats()["watches"] == 2
+        assert not index.is_trusted(other)
+
+
+async def test_falls_back_to_periodic_rescans(test_data_dir):
+    clips_dir = test_data_dir / "clips"
+    (clips_dir / "2026-01-14").mkdir(parents=True)
+    index = ClipIndex()
+    watcher = ClipWatcher(index, rescan_seconds=0.05)
+
+    with patch("app.clip_watcher.Inotify", side_effect=OSError(24, "Too many open files")):
+        await watcher.start([clips_dir])
+    try:
+        assert watcher.stats()["polled_dirs"] == 1
+        assert index.is_trusted(clips_dir)
+
+        (clips_dir / "2026-01-14" / "falcon_093000_visit.mp4").write_bytes(b"clip")
+        await _eventually(lambda: _names(index, clips_dir) == ["falcon_093000_visit.mp4"])
+    finally:
+        await watcher.stop()
+    assert not index.is_trusted(clips_dir)
+
+
+async def test_clips_dir_created_after_start_is_followed(test_data_dir):
+    clips_dir = test_data_dir / "clips"
+    index = ClipIndex()
+    watcher = ClipWatcher(index, rescan_seconds=0.05)
+    await watcher.start([clips_dir])
+    try:
+        assert watcher.stats()["missing_dirs"] == 1
+        assert not index.is_trusted(clips_dir)
+
+        (clips_dir / "2026-01-14").mkdir(parents=True)
+        _finish_clip(clips_dir / "2026-01-14", "falcon_093000_visit.mp4")
+        await _eventually(lambda: index.is_trusted(clips_dir))
+        assert watcher.stats()["missing_dirs"] == 0
+        assert _names(index, clips_dir) == ["falcon_093000_visit.mp4"]
+    finally:
+        await watcher.stop()
+
+
+@linux_only
+async def test_new_visit_visible_in_events(override_streams_config):
+    await start_clip_watcher(all_clips_dirs(), rescan_seconds=3600)
+    try:
+        clips_dir = all_clips_dirs()[0]
+        assert clip_index.is_trusted(clips_dir)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as viewer:
+            url = "/api/streams/kanyo-harvard/events?date=2026-01-14"
+            before = (await viewer.get(url)).json()["events"]
+
+            _finish_clip(clips_dir / "2026-01-14", "falcon_120000_visit.mp4")
+            await _eventually(lambda: clip_index.incremental_updates > 0)
+            after = (await viewer.get(url)).json()["events"]
+
+        assert len(after) == len(before) + 1
+        assert after[-1]["clip"] == "falcon_120000_visit.mp4"
+    finally:
+        await stop_clip_watcher()
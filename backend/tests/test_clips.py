@@ -1,4 +1,8 @@
 """Tests for clips router."""
+import os
+import time
+
+import pytest
 from fastapi.testclient import TestClient
 from app.main import app
 
@@ -45,3 +49,140 @@ def test_serve_clip_not_found(override_streams_config):
     """Test serving non-existent clip file."""
     response = client.get("/api/clips/kanyo-harvard/2026-01-14/falcon_999999_arrival.mp4")
     assert response.status_code == 404
+
+
+def test_serve_clip_symlink_outside_clips_dir(override_streams_config, test_data_dir):
+    """A clip name linking outside the clips directory is refused."""
+    outside = test_data_dir / "secret.mp4"
+    outside.write_bytes(b"secret")
+    day_dir = test_data_dir / "kanyo-harvard" / "clips" / "2026-01-14"
+    os.symlink(outside, day_dir / "falcon_235959_visit.mp4")
+    response = client.get("/api/clips/kanyo-harvard/2026-01-14/falcon_235959_visit.mp4")
+    assert response.status_code == 403
+
+
+CLIP_URL = "/api/clips/kanyo-harvard/2026-01-14/falcon_120000_visit.mp4"
+CLIP_BYTES = bytes(range(256)) * 1024
+
+
+@pytest.fixture
+def long_clip(override_streams_config, test_data_dir):
+    path = test_data_dir / "kanyo-harvard" / "clips" / "2026-01-14" / "falcon_120000_visit.mp4"
+    path.write_bytes(CLIP_BYTES)
+    return path
+
+
+def test_serve_clip_advertises_ranges(long_clip):
+    response = client.get(CLIP_URL)
+    assert response.status_code == 200
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.content == CLIP_BYTES
+
+
+def test_serve_clip_single_range(long_clip):
+    size = len(CLIP_BYTES)
+    response = client.get(CLIP_URL, headers={"Range": "bytes=100000-100099"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 100000-100099/{size}"
+    assert response.headers["content-length"] == "100"
+    assert response.content == CLIP_BYTES[100000:100100]
+
+    # Safari probes with the first two bytes before playing
+    probe = client.get(CLIP_URL, headers={"Range": "bytes=0-1"})
+    assert probe.content == CLIP_BYTES[:2]
+
+    tail = client.get(CLIP_URL, headers={"Range": "bytes=-10"})
+    assert tail.headers["content-range"] == f"bytes {size - 10}-{size - 1}/{size}"
+    assert tail.content == CLIP_BYTES[-10:]
+
+
+def test_serve_clip_multiple_ranges(long_clip):
+    size = len(CLIP_BYTES)
+    response = client.get(CLIP_URL, headers={"Range": "bytes=0-9, 200000-200009"})
+    assert response.status_code == 206
+    content_type = response.headers["content-type"]
+    assert content_type.startswith("multipart/byteranges; boundary=")
+    assert int(response.headers["content-length"]) == len(response.content)
+
+    boundary = content_type.split("boundary=")[1].encode()
+    parts = response.content.split(b"--" + boundary)
+    assert parts[0] == b"" and parts[-1] == b"--\r\n"
+    bodies = []
+    for part in parts[1:-1]:
+        head, body = part.split(b"\r\n\r\n", 1)
+        assert b"Content-Type: video/mp4" in head
+        bodies.append((head, body[:-2]))
+    assert b"Content-Range: bytes 0-9/%d" % size in bodies[0][0]
+    assert bodies[0][1] == CLIP_BYTES[:10]
+    assert b"Content-Range: bytes 200000-200009/%d" % size in bodies[1][0]
+    assert bodies[1][1] == CLIP_BYTES[200000:200010]
+
+
+def test_serve_clip_if_range(long_clip):
+    etag = client.get(CLIP_URL).headers["etag"]
+    current = client.get(CLIP_URL, headers={"Range": "bytes=0-9", "If-Range": etag})
+    assert current.status_code == 206
+
+    stale = client.get(CLIP_URL, headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert stale.status_code == 200
+    assert stale.content == CLIP_BYTES
+
+
+def test_serve_clip_unsatisfiable_range(long_clip):
+    response = client.get(CLIP_URL, headers={"Range": f"bytes={len(CLIP_BYTES)}-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(CLIP_BYTES)}"
+    assert response.content == b""
+
+
+def test_snapshot_supports_ranges(override_streams_config):
+    response = client.get("/api/streams/kanyo-harvard/snapshot", headers={"Range": "bytes=0-4"})
+    assert response.status_code == 206
+    assert response.headers["accept-ranges"] == "bytes"
+    assert len(response.content) == 5
+
+
+def _backdate(path, seconds=3600):
+    when = time.time() - seconds
+    os.utime(path, (when, when))
+
+
+def test_finished_clip_is_immutable(long_clip):
+    _backdate(long_clip)
+    response = client.get(CLIP_URL)
+    assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert response.headers["etag"].startswith('"')
+    assert "last-modified" in response.headers
+
+
+def test_clip_being_written_is_revalidated(long_clip):
+    response = client.get(CLIP_URL)
+    assert response.headers["cache-control"] == "no-cache"
+
+
+def test_clip_conditional_requests(long_clip):
+    _backdate(long_clip)
+    first = client.get(CLIP_URL)
+    etag, last_modified = first.headers["etag"], first.headers["last-modified"]
+
+    for headers in ({"If-None-Match": etag}, {"If-Modified-Since": last_modified}):
+        response = client.get(CLIP_URL, headers=headers)
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+        assert "immutable" in response.headers["cache-control"]
+        assert "content-type" not in response.headers
+
+    # If-None-Match wins over a Range, and over a matching If-Modified-Since
+    ranged = client.get(CLIP_URL, headers={"If-None-Match": etag, "Range": "bytes=0-9"})
+    assert ranged.status_code == 304
+    changed = client.get(
+        CLIP_URL, headers={"If-None-Match": '"other"', "If-Modified-Since": last_modified}
+    )
+    assert changed.status_code == 200
+
+    long_clip.write_bytes(CLIP_BYTES[:1000])
+    _backdate(long_clip, 60)
+    rewritten = client.get(CLIP_URL, headers={"If-None-Match": etag})
+    assert rewritten.status_code == 200
+    assert rewritten.headers["etag"] != etag
@@ -13,6 +13,13 @@ def test_settings_initialization():
     assert settings.API_PREFIX == "/api"
 
 
+def test_geoip_table_defaults_outside_the_data_dir(monkeypatch):
+    """DATA_DIR is the recorder's read-only mount; the table lives with the cache."""
+    monkeypatch.delenv("KANYO_GEOIP_DB", raising=False)
+    monkeypatch.setenv("KANYO_CACHE_DIR", "/var/cache/kanyo")
+    assert Settings().GEOIP_DB == Path("/var/cache/kanyo/ip-timezones.bin")
+
+
 def test_streams_property_caching(override_streams_config):
     """Test that streams property caches result after first access."""
     settings = override_streams_config
@@ -111,3 +118,67 @@ def test_auto_discovery_discovery_order(tmp_path):
     keys = list(settings.streams.keys())
 
     assert keys == sorted(keys)
+
+
+def _write_stream(data_dir, name, **config):
+    stream_dir = data_dir / name
+    stream_dir.mkdir(exist_ok=True)
+    config.setdefault("timezone", "UTC")
+    (stream_dir / "config.yaml").write_text(yaml.dump({"stream_name": name, **config}))
+
+
+def test_reload_applies_added_removed_and_changed_streams(tmp_path):
+    _write_stream(tmp_path, "kanyo-a")
+    _write_stream(tmp_path, "kanyo-b")
+    settings = Settings()
+    settings.DATA_DIR = tmp_path
+    before = settings.streams
+
+    _write_stream(tmp_path, "kanyo-a", timezone="Europe/London")
+    (tmp_path / "kanyo-b" / "config.yaml").unlink()
+    _write_stream(tmp_path, "kanyo-c")
+    changes = settings.reload_streams()
+
+    assert (changes.added, changes.removed, changes.changed) == (
+        ["kanyo-c"],
+        ["kanyo-b"],
+        ["kanyo-a"],
+    )
+    assert changes.previous["kanyo-a"]["timezone"] == "UTC"
+    assert list(settings.streams) == ["kanyo-a", "kanyo-c"]
+    assert settings.streams["kanyo-a"]["timezone"] == "Europe/London"
+    # The old mapping is replaced, not edited in place
+    assert list(before) == ["kanyo-a", "kanyo-b"]
+
+
+def test_reload_only_parses_changed_files(tmp_path):
+    for name in ("kanyo-a", "kanyo-b", "kanyo-c"):
+        _write_stream(tmp_path, name)
+    settings = Settings()
+    settings.DATA_DIR = tmp_path
+    streams = settings.streams
+    assert settings.stream_parses == 3
+
+    changes = settings.reload_streams()
+    assert not changes
+    assert settings.streams is streams
+    assert settings.stream_parses == 3
+
+    _write_stream(tmp_path, "kanyo-b", timezone="Asia/Tokyo")
+    assert settings.reload_streams().changed == ["kanyo-b"]
+    assert settings.stream_parses == 4
+
+
+def test_reload_keeps_last_good_config_while_broken(tmp_path):
+    _write_stream(tmp_path, "kanyo-a", timezone="Asia/Tokyo")
+    settings = Settings()
+    settings.DATA_DIR = tmp_path
+    assert settings.streams["kanyo-a"]["timezone"] == "Asia/Tokyo"
+
+    (tmp_path / "kanyo-a" / "config.yaml").write_text("stream_name: [unclosed\n")
+    assert not settings.reload_streams()
+    assert settings.streams["kanyo-a"]["timezone"] == "Asia/Tokyo"
+
+    _write_stream(tmp_path, "kanyo-a", timezone="Europe/Paris")
+    assert settings.reload_streams().changed == ["kanyo-a"]
+    assert settings.streams["kanyo-a"]["timezone"] == "Europe/Paris"
@@ -0,0 +1,103 @@
+"""Tests for the persistent clip-duration cache."""
+import os
+from unittest.mock import MagicMock, patch
+from fastapi.testclient import TestClient
+from app.main import app
+from app.durations import DurationCache, get_duration_cache
+
+
+client = TestClient(app)
+
+
+def _ffprobe_result(stdout="12.5\n", returncode=0):
+    result = MagicMock()
+    result.returncode = returncode
+    result.stdout = stdout
+    return result
+
+
+def test_duration_probed_once_then_cached(test_data_dir):
+    """A clip is probed on first sight and served from the cache afterwards."""
+    clip = test_data_dir / "falcon_120000_visit.mp4"
+    clip.write_bytes(b"dummy video")
+    cache = DurationCache(test_data_dir / "cache" / "durations.sqlite3")
+
+    with patch("app.durations.subprocess.run", return_value=_ffprobe_result()) as run:
+        assert cache.get_duration(clip) == 12.5
+        assert cache.get_duration(clip) == 12.5
+
+    assert run.call_count == 1
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["probes"] == 1
+    assert stats["entries"] == 1
+
+
+def test_duration_cache_survives_restart(test_data_dir):
+    """Entries persist on disk and are reused by a fresh cache instance."""
+    clip = test_data_dir / "falcon_120000_visit.mp4"
+    clip.write_bytes(b"dummy video")
+    db_path = test_data_dir / "cache" / "durations.sqlite3"
+
+    with patch("app.durations.subprocess.run", return_value=_ffprobe_result()):
+        DurationCache(db_path).get_duration(clip)
+
+    with patch("app.durations.subprocess.run") as run:
+        assert DurationCache(db_path).get_duration(clip) == 12.5
+    run.assert_not_called()
+
+
+def test_duration_reprobed_when_file_changes(test_data_dir):
+    """A changed size or mtime invalidates the cached entry."""
+    clip = test_data_dir / "falcon_120000_visit.mp4"
+    clip.write_bytes(b"dummy video")
+    cache = DurationCache(test_data_dir / "cache" / "durations.sqlite3")
+
+    with patch("app.durations.subprocess.run", return_value=_ffprobe_result("5.0\n")):
+        assert cache.get_duration(clip) == 5.0
+
+    clip.write_bytes(b"longer dummy video")
+    os.utime(clip, ns=(0, 1_000_000_000))
+    with patch("app.durations.subprocess.run", return_value=_ffprobe_result("9.0\n")):
+        assert cache.get_duration(clip) == 9.0
+
+
+def test_duration_estimate_not_persisted(test_data_dir):
+    """When ffprobe cannot run, a size estimate is returned but not cached."""
+    clip = test_data_dir / "falcon_120000_visit.mp4"
+    clip.write_bytes(b"\x00" * 1024 * 1024)
+    cache = DurationCache(test_data_dir / "cache" / "durations.sqlite3")
+
+    with patch("app.durations.subprocess.run", side_effect=FileNotFoundError):
+        assert cache.get_duration(clip) == 10.0
+    assert cache.stats()["entries"] == 0
+
+
+def test_duration_cache_falls_back_to_memory(test_data_dir):
+    """An unwritable cache directory degrades to an in-memory database."""
+    blocker = test_data_dir / "not-a-dir"
+    blocker.write_text("file in the way")
+    cache = DurationCache(blocker / "durations.sqlite3")
+    cache.store(blocker / "clip.mp4", 1, 1, 3.0)
+    assert cache.lookup(blocker / "clip.mp4", 1, 1) == 3.0
+
+
+def test_repeat_events_request_does_not_spawn_ffprobe(override_streams_config):
+    """Second load of the same day is served entirely from the duration cache."""
+    with patch("app.durations.subprocess.run", return_value=_ffprobe_result()) as run:
+        first = client.get("/api/streams/kanyo-harvard/events?date=2026-01-14")
+        probes_after_first = run.call_count
+        second = client.get("/api/streams/kanyo-harvard/events?date=2026-01-14")
+
+    assert first.json() == second.json()
+    assert probes_after_first == 2
+    assert run.call_count == probes_after_first
+    assert get_duration_cache().stats()["hits"] >= 2
+
+
+def test_health_reports_duration_cache(override_streams_config):
+    """Duration cache counters are visible on /health."""
+    response = client.get("/health")
+    caches = response.json()["caches"]
+    assert {"hits", "misses", "probes", "entries"} <= set(caches["durations"])
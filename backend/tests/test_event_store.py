@@ -0,0 +1,159 @@
+"""Tests for the SQLite event store."""
+import os
+from datetime import datetime
+import pytz
+from fastapi.testclient import TestClient
+from app.main import app
+from app import event_store
+from app.clip_index import clip_index
+from app.event_store import EventStore, get_event_store
+
+
+client = TestClient(app)
+
+TZ = pytz.timezone("America/New_York")
+
+
+def _make_clips(clips_dir, date_str, names):
+    day_dir = clips_dir / date_str
+    day_dir.mkdir(parents=True, exist_ok=True)
+    for name in names:
+        (day_dir / name).write_bytes(b"clip")
+
+
+def test_range_queries_across_days(test_data_dir):
+    clips_dir = test_data_dir / "clips"
+    _make_clips(clips_dir, "2026-03-01", ["falcon_080000_visit.mp4", "falcon_080000_arrival.jpg"])
+    _make_clips(clips_dir, "2026-03-15", ["falcon_120000_visit.mp4"])
+    _make_clips(clips_dir, "2026-04-02", ["falcon_230000_departure.mp4"])
+    store = EventStore(test_data_dir / "events.sqlite3")
+    store.sync("s", clips_dir, TZ)
+
+    rows = store.clips_between(
+        "s", TZ.localize(datetime(2026, 3, 1, 9)), TZ.localize(datetime(2026, 4, 3))
+    )
+    assert [r.name for r in rows] == ["falcon_120000_visit.mp4", "falcon_230000_departure.mp4"]
+    assert rows[0].utc_timestamp == int(TZ.localize(datetime(2026, 3, 15, 12)).timestamp())
+
+    assert store.dates_with_clips("s", "2026-01-01", "2026-12-31", "visit", ["mp4"]) == [
+        "2026-03-01",
+        "2026-03-15",
+    ]
+    latest = store.latest_clip("s", "arrival", ["jpg"], "2026-02-01", "2026-04-30")
+    assert (latest.date, latest.name) == ("2026-03-01", "falcon_080000_arrival.jpg")
+
+
+def test_sync_follows_added_and_removed_days(test_data_dir):
+    clips_dir = test_data_dir / "clips"
+    _make_clips(clips_dir, "2026-03-01", ["falcon_080000_visit.mp4"])
+    store = EventStore(test_data_dir / "events.sqlite3")
+    store.sync("s", clips_dir, TZ)
+
+    _make_clips(clips_dir, "2026-03-02", ["falcon_090000_visit.mp4"])
+    for name in os.listdir(clips_dir / "2026-03-01"):
+        os.remove(clips_dir / "2026-03-01" / name)
+    os.rmdir(clips_dir / "2026-03-01")
+    store.sync("s", clips_dir, TZ)
+
+    assert store.dates_with_clips("s", "2026-01-01", "2026-12-31", "visit", ["mp4"]) == [
+        "2026-03-02"
+    ]
+
+
+def test_restart_reuses_rows_for_unchanged_days(test_data_dir):
+    clips_dir = test_data_dir / "clips"
+    _make_clips(clips_dir, "2026-03-01", ["falcon_080000_visit.mp4"])
+    db_path = test_data_dir / "events.sqlite3"
+    first = EventStore(db_path)
+    first.sync("s", clips_dir, TZ)
+    assert first.day_writes == 1
+    first.close()
+
+    clip_index.forget()
+    second = EventStore(db_path)
+    second.sync("s", clips_dir, TZ)
+
+    assert second.day_writes == 0
+    assert second.stats()["clips"] == 1
+
+
+def test_unwatched_sync_only_fingerprints_changed_days(test_data_dir, monkeypatch):
+    clips_dir = test_data_dir / "clips"
+    for date_str in ("2026-03-01", "2026-03-02"):
+        _make_clips(clips_dir, date_str, ["falcon_080000_visit.mp4"])
+        (clips_dir / date_str / f"events_{date_str}.json").write_text("[]")
+        os.utime(clips_dir / date_str, ns=(10**18, 10**18))
+    store = EventStore(test_data_dir / "events.sqlite3")
+    store.sync("s", clips_dir, TZ)
+
+    fingerprinted = []
+    fingerprint = event_store._fingerprint
+
+    def counting_fingerprint(tz_name, day, has_events):
+        fingerprinted.append(day.date_str)
+        return fingerprint(tz_name, day, has_events)
+
+    monkeypatch.setattr(event_store, "_fingerprint", counting_fingerprint)
+    store.sync("s", clips_dir, TZ)
+    assert fingerprinted == []
+
+    # Rewritten in place: the day directory's listing doesn't change
+    events_file = clips_dir / "2026-03-02" / "events_2026-03-02.json"
+    events_file.write_text('[{"thumbnail_path": "falcon_080000_arrival.jpg"}]')
+    store.sync("s", clips_dir, TZ)
+    assert fingerprinted == ["2026-03-02"]
+    assert store.latest_recorded_date("s", "2026-12-31", "2026-01-01") == "2026-03-02"
+
+
+def test_unwatched_sync_only_revalidates_the_queried_days(test_data_dir):
+    clips_dir = test_data_dir / "clips"
+    dates = ["2026-03-01", "2026-03-02", "2026-03-03"]
+    for date_str in dates:
+        _make_clips(clips_dir, date_str, ["falcon_080000_visit.mp4"])
+        os.utime(clips_dir / date_str, ns=(10**18, 10**18))
+    db_path = test_data_dir / "events.sqlite3"
+    EventStore(db_path).sync("s", clips_dir, TZ)
+
+    # Restarted with a cold index: days outside the range are neither listed nor dropped
+    clip_index.forget()
+    store = EventStore(db_path)
+    store.sync("s", clips_dir, TZ, "2026-03-03", "2026-03-03")
+    assert clip_index.known_dates(clips_dir) == ["2026-03-03"]
+    assert store.dates_with_clips("s", "2026-01-01", "2026-12-31", "visit", ["mp4"]) == dates
+
+    checked = clip_index.scans + clip_index.revalidations
+    store.sync("s", clips_dir, TZ, "2026-03-03", "2026-03-03")
+    assert clip_index.scans + clip_index.revalidations == checked + 1
+
+
+def test_deleted_database_is_rebuilt(override_streams_config, monkeypatch):
+    monkeypatch.setattr(event_store, "EXISTS_CHECK_SECONDS", 0)
+    url = "/api/streams/kanyo-harvard/dates-with-events?start_date=2026-01-01&end_date=2026-01-31"
+    before = client.get(url).json()
+
+    store = get_event_store()
+    os.remove(store.db_path)
+    after = client.get(url).json()
+
+    assert before == after == {"dates": ["2026-01-14"]}
+    assert store.rebuilds == 1
+    assert store.db_path.exists()
+
+
+def test_stats_for_explicit_date_window(override_streams_config):
+    response = client.get("/api/streams/kanyo-harvard/stats?start=2026-01-14&end=2026-01-14")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["visits"] == 2
+    assert data["range"] == "2026-01-14/2026-01-14"
+    times = [e["time"] for e in data["last_events"]]
+    assert times == ["10:15:00", "09:30:00", "07:45:30", "07:23:15"]
+
+
+def test_invalid_dates_are_rejected(override_streams_config):
+    assert client.get("/api/streams/kanyo-harvard/stats?start=yesterday").status_code == 400
+    response = client.get(
+        "/api/streams/kanyo-harvard/dates-with-events?start_date=2026-1-1&end_date=x"
+    )
+    assert response.status_code == 400
@@ -0,0 +1,124 @@
+"""Tests for app.file_responses."""
+import os
+from pathlib import Path
+
+import pytest
+
+from app.file_responses import (
+    MAX_RANGES,
+    RangeFileResponse,
+    RangeNotSatisfiable,
+    if_range_matches,
+    parse_range,
+)
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("bytes=0-99", [(0, 99)]),
+        ("bytes=100-", [(100, 999)]),
+        ("bytes=-100", [(900, 999)]),
+        ("bytes=-5000", [(0, 999)]),
+        ("bytes=990-5000", [(990, 999)]),
+        ("bytes=0-0,-1", [(0, 0), (999, 999)]),
+        # Overlapping and adjacent ranges are merged and sorted
+        ("bytes=500-599, 0-99, 50-149, 600-700", [(0, 149), (500, 700)]),
+        # Unsatisfiable parts are dropped when another part overlaps the file
+        ("bytes=2000-3000, 0-9", [(0, 9)]),
+        ("BYTES=0-9", [(0, 9)]),
+    ],
+)
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize(
+    "header",
+    ["items=0-9", "bytes=", "bytes=9-0", "bytes=abc", "bytes=5", "bytes=--5", "bytes=1-2-3"],
+)
+def test_parse_range_ignores_malformed(header):
+    assert parse_range(header, 1000) is None
+
+
+def test_parse_range_ignores_too_many_ranges():
+    header = "bytes=" + ",".join(f"{i * 10}-{i * 10 + 1}" for i in range(MAX_RANGES + 1))
+    assert parse_range(header, 1000) is None
+
+
+@pytest.mark.parametrize(
+    "header, size", [("bytes=1000-", 1000), ("bytes=-0", 1000), ("bytes=0-", 0)]
+)
+def test_parse_range_unsatisfiable(header, size):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(header, size)
+
+
+def test_if_range_matches():
+    etag, date = '"abc"', "Wed, 14 Jan 2026 12:00:00 GMT"
+    assert if_range_matches('"abc"', etag, date)
+    assert not if_range_matches('"old"', etag, date)
+    assert not if_range_matches('W/"abc"', etag, date)
+    assert if_range_matches(date, etag, date)
+    assert not if_range_matches("Tue, 13 Jan 2026 12:00:00 GMT", etag, date)
+
+
+def _scope(headers=None, extensions=None):
+    raw = [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+    return {"type": "http", "method": "GET", "headers": raw, "extensions": extensions or {}}
+
+
+async def _serve(path, headers=None, extensions=None):
+    """Run a RangeFileResponse against a fake server; return (messages, body bytes)."""
+    messages, body = [], b""
+
+    async def send(message):
+        nonlocal body
+        messages.append(message)
+        if message["type"] == "http.response.body":
+            body += message.get("body", b"")
+        elif message["type"] == "http.response.zerocopysend":
+            body += os.pread(message["file"].fileno(), message["count"], message["offset"])
+        elif message["type"] == "http.response.pathsend":
+            body += Path(message["path"]).read_bytes()
+
+    response = RangeFileResponse(path, media_type="video/mp4")
+    await response(_scope(headers, extensions), None, send)
+    return messages, body
+
+
+@pytest.fixture
+def clip(tmp_path):
+    path = tmp_path / "clip.mp4"
+    path.write_bytes(bytes(range(256)) * 8192)
+    return path
+
+
+async def test_whole_file_uses_pathsend(clip):
+    messages, body = await _serve(clip, extensions={"http.response.pathsend": {}})
+    assert [m["type"] for m in messages] == ["http.response.start", "http.response.pathsend"]
+    assert messages[1]["path"] == str(clip)
+    assert body == clip.read_bytes()
+
+
+async def test_ranges_use_zerocopysend(clip):
+    data = clip.read_bytes()
+    extensions = {"http.response.zerocopysend": {}, "http.response.pathsend": {}}
+    messages, body = await _serve(clip, {"Range": "bytes=1000-1999"}, extensions)
+    assert messages[0]["status"] == 206
+    assert [m["type"] for m in messages[1:]] == ["http.response.zerocopysend"]
+    assert messages[1]["more_body"] is False
+    assert body == data[1000:2000]
+
+    messages, body = await _serve(clip, {"Range": "bytes=0-9,-10"}, extensions)
+    assert [m["type"] for m in messages].count("http.response.zerocopysend") == 2
+    assert data[:10] in body and data[-10:] in body
+    assert len(body) == int(dict(messages[0]["headers"])[b"content-length"])
+
+
+async def test_without_extensions_file_is_copied_in_chunks(clip):
+    messages, body = await _serve(clip)
+    chunks = [m for m in messages if m["type"] == "http.response.body"]
+    assert len(chunks) == 2  # 2 MiB in 1 MiB reads
+    assert [m["more_body"] for m in chunks] == [True, False]
+    assert body == clip.read_bytes()
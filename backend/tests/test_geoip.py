@@ -0,0 +1,123 @@
+"""Tests for app.geoip."""
+import ipaddress
+
+import pytest
+
+from app.geoip import TableError, TimezoneTable, build_table, get_timezone_table
+
+ROWS = [
+    ("1.0.0.0", "1.0.0.255", "Australia/Brisbane"),
+    ("1.0.1.0", "1.0.3.255", "Asia/Shanghai"),
+    # Adjacent range in the same zone is merged with the previous one
+    ("1.0.4.0", "1.0.7.255", "Asia/Shanghai"),
+    # Integer addresses, as in IP2Location CSVs (8.8.8.0 - 8.8.8.255)
+    ("134744064", "134744319", "America/Los_Angeles"),
+    ("9.0.0.0", "9.0.0.255", "-"),
+    ("255.255.255.0", "255.255.255.255", "Etc/UTC"),
+    ("2001:4860::", "2001:4860:ffff:ffff:ffff:ffff:ffff:ffff", "America/Chicago"),
+    ("2a00:1450::", "2a00:1450:ffff:ffff:ffff:ffff:ffff:ffff", "Europe/Dublin"),
+]
+
+
+@pytest.fixture
+def table(tmp_path):
+    path = tmp_path / "ip-timezones.bin"
+    path.write_bytes(build_table(ROWS))
+    return TimezoneTable(path)
+
+
+@pytest.mark.parametrize(
+    "ip, timezone",
+    [
+        ("1.0.0.0", "Australia/Brisbane"),
+        ("1.0.0.255", "Australia/Brisbane"),
+        ("1.0.1.0", "Asia/Shanghai"),
+        ("1.0.6.1", "Asia/Shanghai"),
+        ("1.0.8.0", None),
+        ("0.255.255.255", None),
+        ("8.8.8.8", "America/Los_Angeles"),
+        ("8.8.9.0", None),
+        ("9.0.0.1", None),
+        ("255.255.255.255", "Etc/UTC"),
+        ("2001:4860:4860::8888", "America/Chicago"),
+        ("2001:4861::", None),
+        ("2a00:1450:4009:81f::200e", "Europe/Dublin"),
+        ("::1", None),
+    ],
+)
+def test_lookup(table, ip, timezone):
+    assert table.lookup(ipaddress.ip_address(ip)) == timezone
+
+
+def test_table_is_compact(table):
+    # 1.0.0.0, 1.0.1.0 (merged through 1.0.7.255), gap, 8.8.8.0, gap, 255.255.255.0
+    assert table.ranges == 6 + 4
+    assert sorted(table.names) == sorted(
+        {"Australia/Brisbane", "Asia/Shanghai", "America/Los_Angeles", "Etc/UTC"}
+        | {"America/Chicago", "Europe/Dublin"}
+    )
+
+
+def test_empty_table(tmp_path):
+    path = tmp_path / "empty.bin"
+    path.write_bytes(build_table([]))
+    assert TimezoneTable(path).lookup(ipaddress.ip_address("8.8.8.8")) is None
+
+
+@pytest.mark.parametrize(
+    "rows",
+    [
+        [("1.0.0.0", "1.0.1.255", "A/B"), ("1.0.1.0", "1.0.2.255", "C/D")],
+        [("1.0.0.255", "1.0.0.0", "A/B")],
+        [("1.0.0.0", "::1", "A/B")],
+    ],
+)
+def test_build_rejects_bad_ranges(rows):
+    with pytest.raises(ValueError):
+        build_table(rows)
+
+
+def test_rejects_files_that_are_not_tables(tmp_path):
+    path = tmp_path / "bad.bin"
+    path.write_bytes(b"KTZ1" + b"\xff" * 20)
+    with pytest.raises(TableError):
+        TimezoneTable(path)
+    path.write_bytes(b"abc")
+    with pytest.raises(TableError):
+        TimezoneTable(path)
+
+
+def test_get_timezone_table_follows_setting(tmp_path, monkeypatch):
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "GEOIP_DB", tmp_path / "missing.bin")
+    assert get_timezone_table() is None
+
+    path = tmp_path / "ip-timezones.bin"
+    path.write_bytes(build_table(ROWS))
+    monkeypatch.setattr(settings, "GEOIP_DB", path)
+    loaded = get_timezone_table()
+    assert loaded is not None and get_timezone_table() is loaded
+
+
+def test_ipv6_edition_rows(tmp_path):
+    mapped = 0xFFFF << 32
+    google = int(ipaddress.ip_address("2001:4860::"))
+    rows = [
+        # IPv6 editions start with the space below ::ffff:0:0, as one integer range
+        ("0", str(mapped - 1), "-"),
+        (str(mapped + 134744064), str(mapped + 134744319), "America/Los_Angeles"),
+        (str(google), str(google + (1 << 96) - 1), "America/Chicago"),
+        # Straddles the start of ::ffff:0:0/96
+        ("::fffe:ffff:ff00", "::ffff:0.0.0.255", "Etc/UTC"),
+    ]
+    path = tmp_path / "ip-timezones.bin"
+    path.write_bytes(build_table(rows))
+    table = TimezoneTable(path)
+
+    assert table.lookup(ipaddress.ip_address("8.8.8.8")) == "America/Los_Angeles"
+    assert table.lookup(ipaddress.ip_address("0.0.0.1")) == "Etc/UTC"
+    assert table.lookup(ipaddress.ip_address("::fffe:ffff:ffff")) == "Etc/UTC"
+    assert table.lookup(ipaddress.ip_address("2001:4860:4860::8888")) == "America/Chicago"
+    # Mapped addresses are looked up as IPv4 (see app.routers.visitor)
+    assert table.lookup(ipaddress.ip_address("::ffff:808:808")) is None
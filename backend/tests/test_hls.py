@@ -0,0 +1,144 @@
+"""Tests for HLS playlist rewriting and caching."""
+import asyncio
+import time
+from urllib.parse import quote
+import httpx
+from fastapi.testclient import TestClient
+from app.main import app
+from app.hls import PlaylistCache, looks_like_playlist, rewrite_playlist, target_duration
+import app.routers.streams as streams_router
+from tests.conftest import ChunkedStream
+
+
+client = TestClient(app)
+
+MANIFEST_URL = "https://manifest.googlevideo.com/api/manifest/hls_playlist/id/abc/index.m3u8"
+MEDIA_PLAYLIST = (
+    "#EXTM3U\n"
+    "#EXT-X-VERSION:3\n"
+    "#EXT-X-TARGETDURATION:5\n"
+    '#EXT-X-MAP:URI="https://rr1.googlevideo.com/videoplayback?init=1"\n'
+    "#EXTINF:5.0,\n"
+    "https://rr1.googlevideo.com/videoplayback?sq=1\n"
+    "#EXTINF:5.0,\n"
+    "  https://rr1.googlevideo.com/videoplayback?sq=2  \n"
+)
+PREFIX = "/api/streams/kanyo-harvard/hls/seg?u="
+
+
+def _cache_live_url(url=MANIFEST_URL):
+    streams_router._live_url_cache["kanyo-harvard"] = {
+        "url": url,
+        "resolved_at": time.time(),
+        "refresh_at": time.time() + 3600,
+    }
+
+
+def test_rewrite_playlist_proxies_lines_and_uri_attributes():
+    body = rewrite_playlist(MEDIA_PLAYLIST, PREFIX)
+
+    assert PREFIX + quote("https://rr1.googlevideo.com/videoplayback?sq=1", safe="") in body
+    assert PREFIX + quote("https://rr1.googlevideo.com/videoplayback?sq=2", safe="") in body
+    init_url = quote("https://rr1.googlevideo.com/videoplayback?init=1", safe="")
+    assert f'URI="{PREFIX}{init_url}"' in body
+    for line in body.splitlines():
+        assert not line.strip().startswith("http")
+    assert "#EXT-X-TARGETDURATION:5" in body
+
+
+def test_target_duration_and_ttl():
+    assert target_duration(MEDIA_PLAYLIST) == 5.0
+    assert target_duration("#EXTM3U\n") is None
+
+    cache = PlaylistCache(ttl_fraction=0.5, default_ttl=1.0)
+    assert cache.ttl_for(MEDIA_PLAYLIST) == 2.5
+    assert cache.ttl_for("#EXTM3U\n") == 1.0
+
+
+def test_looks_like_playlist():
+    assert looks_like_playlist(MANIFEST_URL)
+    assert looks_like_playlist("https://manifest.googlevideo.com/api/manifest/hls_variant/x/y")
+    assert not looks_like_playlist("https://rr1.googlevideo.com/videoplayback?sq=1")
+
+
+async def test_playlist_cache_expires_after_ttl(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr("app.hls.time.monotonic", lambda: clock[0])
+    cache = PlaylistCache(ttl_fraction=0.5, default_ttl=1.0)
+    loads = []
+
+    async def load():
+        loads.append(1)
+        return MEDIA_PLAYLIST
+
+    await cache.get(("s", "u"), load)
+    clock[0] += 2.0
+    await cache.get(("s", "u"), load)
+    assert len(loads) == 1
+
+    clock[0] += 1.0
+    await cache.get(("s", "u"), load)
+    assert len(loads) == 2
+
+
+async def test_concurrent_playlist_polls_share_one_fetch(override_streams_config, mock_upstream):
+    _cache_live_url()
+
+    def slow_manifest(request):
+        return httpx.Response(200, stream=ChunkedStream(MEDIA_PLAYLIST.encode()))
+
+    seen = mock_upstream(slow_manifest)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as viewer:
+        responses = await asyncio.gather(
+            *(viewer.get("/api/streams/kanyo-harvard/hls/playlist.m3u8") for _ in range(20))
+        )
+        again = await viewer.get("/api/streams/kanyo-harvard/hls/playlist.m3u8")
+
+    assert len(seen) == 1
+    assert len({r.text for r in responses + [again]}) == 1
+    assert PREFIX in again.text
+
+
+def test_manifest_error_evicts_live_url(override_streams_config, mock_upstream):
+    _cache_live_url()
+    mock_upstream(lambda request: httpx.Response(403, text="expired"))
+
+    assert client.get("/api/streams/kanyo-harvard/hls/playlist.m3u8").status_code == 502
+    # The 403 evicted the live URL; re-resolution is needed before the next fetch
+    assert "kanyo-harvard" not in streams_router._live_url_cache
+
+
+def test_sub_playlist_via_seg_is_rewritten_and_cached(override_streams_config, mock_upstream):
+    seen = mock_upstream(
+        lambda request: httpx.Response(
+            200, text=MEDIA_PLAYLIST, headers={"content-type": "application/vnd.apple.mpegurl"}
+        )
+    )
+    path = f"/api/streams/kanyo-harvard/hls/seg?u={quote(MANIFEST_URL, safe='')}"
+
+    first = client.get(path)
+    second = client.get(path)
+
+    assert first.status_code == 200
+    assert "application/vnd.apple.mpegurl" in first.headers["content-type"]
+    assert PREFIX in first.text
+    assert first.text == second.text
+    assert len(seen) == 1
+
+
+def test_unrecognised_playlist_via_seg_still_rewritten(override_streams_config, mock_upstream):
+    """A playlist served from a segment-looking URL is detected by content type."""
+    mock_upstream(
+        lambda request: httpx.Response(
+            200,
+            stream=ChunkedStream(MEDIA_PLAYLIST.encode()),
+            headers={"content-type": "application/vnd.apple.mpegurl"},
+        )
+    )
+    url = "https://rr1.googlevideo.com/videoplayback?playlist=1"
+    response = client.get(f"/api/streams/kanyo-harvard/hls/seg?u={quote(url, safe='')}")
+
+    assert response.status_code == 200
+    assert PREFIX in response.text
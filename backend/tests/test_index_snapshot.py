@@ -0,0 +1,110 @@
+"""Tests for the persisted clip index snapshot."""
+from fastapi.testclient import TestClient
+import pytest
+from app.main import app
+from app.clip_index import ClipIndex, clip_index
+from app.index_snapshot import (
+    SnapshotError,
+    decode,
+    encode,
+    load_snapshot,
+    save_snapshot,
+    snapshot_path,
+)
+from tests.conftest import settle
+
+
+def _make_tree(root):
+    clips_dir = root / "clips"
+    days = {
+        "2026-01-14": [
+            "falcon_072315_visit.mp4",
+            "falcon_072315_arrival.jpg",
+            "events_2026-01-14.json",
+        ],
+        "2026-01-15": ["falcon_080000_departure.mp4", "notes.txt"],
+    }
+    for date_str, names in days.items():
+        day_dir = clips_dir / date_str
+        day_dir.mkdir(parents=True)
+        for name in names:
+            (day_dir / name).write_bytes(b"[]" if name.endswith(".json") else b"data")
+        settle(day_dir)
+    settle(clips_dir)
+    return clips_dir
+
+
+def test_round_trip_preserves_days(test_data_dir):
+    clips_dir = _make_tree(test_data_dir)
+    index = ClipIndex()
+    index.refresh_all(clips_dir)
+    index.has_recorded_events(clips_dir, "2026-01-14")
+
+    decoded = dict((day.date_str, day) for _, day in decode(encode(index.entries())))
+
+    for date_str in ("2026-01-14", "2026-01-15"):
+        original = index.day(clips_dir, date_str)
+        loaded = decoded[date_str]
+        assert loaded.clips == original.clips
+        assert loaded.names == original.names
+        assert loaded.dir_mtime_ns == original.dir_mtime_ns
+        assert loaded.path == original.path
+    assert (
+        decoded["2026-01-14"].events_json_state
+        == index.day(clips_dir, "2026-01-14").events_json_state
+    )
+
+
+def test_loaded_days_are_revalidated_not_rescanned(test_data_dir):
+    clips_dir = _make_tree(test_data_dir)
+    warm = ClipIndex()
+    warm.refresh_all(clips_dir)
+    path = test_data_dir / "snapshot.bin"
+    save_snapshot(warm, path)
+
+    (clips_dir / "2026-01-15" / "falcon_090000_visit.mp4").write_bytes(b"new")
+    cold = ClipIndex()
+    assert load_snapshot(cold, path) == 2
+    cold.refresh_all(clips_dir)
+
+    # Only the day that changed since the snapshot was listed again
+    assert cold.scans == 1
+    assert [c.name for c in cold.day(clips_dir, "2026-01-15").clips] == [
+        "falcon_080000_departure.mp4",
+        "falcon_090000_visit.mp4",
+    ]
+
+
+@pytest.mark.parametrize(
+    "mangle",
+    [
+        lambda data: b"XXXX" + data[4:],
+        lambda data: data[:4] + b"\x09\x00" + data[6:],
+        lambda data: data[:-3] + b"abc",
+        lambda data: data[:10],
+    ],
+)
+def test_unusable_snapshot_is_ignored(test_data_dir, mangle):
+    clips_dir = _make_tree(test_data_dir)
+    index = ClipIndex()
+    index.refresh_all(clips_dir)
+    data = encode(index.entries())
+    with pytest.raises(SnapshotError):
+        decode(mangle(data))
+
+    path = test_data_dir / "snapshot.bin"
+    path.write_bytes(mangle(data))
+    assert load_snapshot(ClipIndex(), path) == 0
+
+
+def test_lifespan_saves_and_loads_snapshot(override_streams_config, monkeypatch):
+    monkeypatch.setattr(override_streams_config, "CLIP_WATCHER", False)
+    with TestClient(app) as client:
+        assert client.get("/api/streams/kanyo-harvard/events?date=2026-01-14").status_code == 200
+    assert snapshot_path().exists()
+
+    clip_index.forget()
+    scans = clip_index.scans
+    with TestClient(app):
+        assert clip_index.stats()["days"] > 0
+        assert clip_index.scans == scans
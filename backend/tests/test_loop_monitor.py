@@ -0,0 +1,91 @@
+"""Tests for the event loop lag monitor and blocking-call watchdog."""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+from app.loop_monitor import LOOP_BLOCKS, LOOP_LAG, LoopMonitor, get_loop_monitor
+from app.main import app
+from app.metrics import MetricsMiddleware
+
+
+@asynccontextmanager
+async def _monitoring(threshold=0.1):
+    monitor = LoopMonitor(interval=0.02, threshold=threshold)
+    await monitor.start()
+    try:
+        yield monitor
+    finally:
+        await monitor.stop()
+
+
+def _hold_the_loop(seconds):
+    time.sleep(seconds)
+
+
+async def test_lag_is_sampled_without_reports_when_idle():
+    samples = LOOP_LAG.count()
+    async with _monitoring() as monitor:
+        await asyncio.sleep(0.15)
+    assert LOOP_LAG.count() > samples
+    assert monitor.blocks == 0
+
+
+async def test_stall_is_reported_once_with_the_blocking_stack(caplog):
+    caplog.set_level(logging.WARNING, logger="app.loop_monitor")
+    async with _monitoring() as monitor:
+        await asyncio.sleep(0.05)
+        _hold_the_loop(0.4)
+        await asyncio.sleep(0.05)
+
+    assert monitor.blocks == 1
+    assert monitor.max_lag >= 0.3
+    (record,) = [r for r in caplog.records if r.name == "app.loop_monitor"]
+    assert "Event loop blocked" in record.getMessage()
+    assert "_hold_the_loop" in record.getMessage()
+    assert monitor.last_block["ms"] >= 100
+
+
+async def test_stall_names_the_running_route():
+    route = "/api/streams/{stream_id}/events"
+    blocks = LOOP_BLOCKS.value(route=route)
+
+    async def blocking_endpoint(scope, receive, send):
+        _hold_the_loop(0.3)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/api/streams/kanyo-harvard/events",
+        "route": SimpleNamespace(path=route),
+        "path_params": {},
+    }
+    async with _monitoring() as monitor:
+        await asyncio.sleep(0.05)
+        await MetricsMiddleware(blocking_endpoint)(scope, None, send)
+        await asyncio.sleep(0.05)
+
+    assert LOOP_BLOCKS.value(route=route) == blocks + 1
+    assert monitor.last_block["running"].startswith("GET /api/streams/kanyo-harvard/events")
+
+
+def test_monitor_is_opt_in(monkeypatch):
+    from app.config import settings
+
+    with TestClient(app) as client:
+        assert client.get("/health").json()["event_loop"] is None
+
+    monkeypatch.setattr(settings, "LOOP_MONITOR", True)
+    with TestClient(app) as client:
+        stats = client.get("/health").json()["event_loop"]
+        assert stats["blocks"] == 0
+        assert "kanyo_event_loop_lag_seconds" in client.get("/metrics").text
+    assert get_loop_monitor() is None
@@ -0,0 +1,147 @@
+"""Tests for app.metrics and the /metrics endpoint."""
+from unittest.mock import MagicMock, patch
+from urllib.parse import quote
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import app.routers.streams as streams_router
+from app.main import app
+from app.metrics import (
+    DIRECTORY_SCANS,
+    FILE_BYTES_SERVED,
+    HLS_UPSTREAM_BYTES,
+    HLS_UPSTREAM_LATENCY,
+    HTTP_LATENCY,
+    HTTP_REQUESTS,
+    SUBPROCESS_LATENCY,
+    SUBPROCESS_RUNS,
+    VISITOR_TIMEZONE_LOOKUPS,
+    Counter,
+    Histogram,
+)
+from tests.conftest import ChunkedStream
+
+client = TestClient(app)
+
+
+def test_counter_renders_labelled_series():
+    requests = Counter("test_requests_total", "Requests.", ("route",))
+    requests.inc(route="/a")
+    requests.inc(2, route='/b"\\')
+    assert requests.render() == [
+        "# HELP test_requests_total Requests.",
+        "# TYPE test_requests_total counter",
+        'test_requests_total{route="/a"} 1.0',
+        'test_requests_total{route="/b\\"\\\\"} 2.0',
+    ]
+
+
+def test_counter_rejects_wrong_labels():
+    requests = Counter("test_requests_total", "Requests.", ("route",))
+    with pytest.raises(ValueError):
+        requests.inc(path="/a")
+
+
+def test_histogram_buckets_are_cumulative():
+    latency = Histogram("test_seconds", "Latency.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value)
+    assert latency.render()[2:] == [
+        'test_seconds_bucket{le="0.1"} 2.0',
+        'test_seconds_bucket{le="1.0"} 3.0',
+        'test_seconds_bucket{le="+Inf"} 4.0',
+        "test_seconds_sum 3.65",
+        "test_seconds_count 4.0",
+    ]
+
+
+def test_requests_are_labelled_by_route_template_and_stream(override_streams_config):
+    route = "/api/streams/{stream_id}"
+    before = HTTP_REQUESTS.value(method="GET", route=route, stream="kanyo-harvard", status="200")
+    unknown = HTTP_REQUESTS.value(method="GET", route=route, stream="unknown", status="404")
+    timed = HTTP_LATENCY.count(method="GET", route=route, stream="kanyo-harvard")
+
+    assert client.get("/api/streams/kanyo-harvard").status_code == 200
+    # Arbitrary ids share one series instead of growing the label set
+    for stream_id in ("no-such-stream", "another-one"):
+        assert client.get(f"/api/streams/{stream_id}").status_code == 404
+
+    assert (
+        HTTP_REQUESTS.value(method="GET", route=route, stream="kanyo-harvard", status="200")
+        == before + 1
+    )
+    assert (
+        HTTP_REQUESTS.value(method="GET", route=route, stream="unknown", status="404")
+        == unknown + 2
+    )
+    assert HTTP_LATENCY.count(method="GET", route=route, stream="kanyo-harvard") == timed + 1
+
+
+def test_metrics_endpoint(override_streams_config):
+    client.get("/api/streams")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE kanyo_http_request_duration_seconds histogram" in response.text
+    assert 'kanyo_http_requests_total{method="GET",route="/api/streams",stream=""' in response.text
+
+
+def test_directory_scans_are_counted(override_streams_config):
+    from app.clip_index import clip_index
+
+    clip_index.forget()
+    scans = DIRECTORY_SCANS.value()
+    assert client.get("/api/streams/kanyo-harvard/events?date=2026-01-14").status_code == 200
+    assert DIRECTORY_SCANS.value() > scans
+
+
+def test_file_bytes_served(override_streams_config):
+    served = FILE_BYTES_SERVED.value(kind="video")
+    response = client.get("/api/clips/kanyo-harvard/2026-01-14/falcon_072315_arrival.mp4")
+    assert response.status_code == 200
+    assert FILE_BYTES_SERVED.value(kind="video") == served + len(response.content)
+
+    ranged = client.get(
+        "/api/clips/kanyo-harvard/2026-01-14/falcon_072315_arrival.mp4",
+        headers={"Range": "bytes=0-1"},
+    )
+    assert ranged.status_code == 206
+    assert FILE_BYTES_SERVED.value(kind="video") == served + len(response.content) + 2
+
+
+def test_ytdlp_and_upstream_fetches_are_counted(override_streams_config, mock_upstream):
+    streams_router._live_url_cache.clear()
+    manifest = "#EXTM3U\n#EXTINF:6.0,\nhttps://rr1.googlevideo.com/videoplayback?sq=1\n"
+    mock_upstream(lambda request: httpx.Response(200, text=manifest))
+    ytdlp = MagicMock(returncode=0, stdout="https://manifest.googlevideo.com/m.m3u8\n")
+
+    runs = SUBPROCESS_RUNS.value(command="yt-dlp", outcome="ok")
+    timed = SUBPROCESS_LATENCY.count(command="yt-dlp")
+    fetched = HLS_UPSTREAM_BYTES.value(kind="manifest")
+    with patch("app.routers.streams.subprocess.run", return_value=ytdlp):
+        assert client.get("/api/streams/kanyo-harvard/hls/playlist.m3u8").status_code == 200
+
+    assert SUBPROCESS_RUNS.value(command="yt-dlp", outcome="ok") == runs + 1
+    assert SUBPROCESS_LATENCY.count(command="yt-dlp") == timed + 1
+    assert HLS_UPSTREAM_BYTES.value(kind="manifest") == fetched + len(manifest)
+
+
+def test_segment_fetches_are_counted(override_streams_config, mock_upstream):
+    body = ChunkedStream(b"\x00" * 100, b"\x00" * 88)
+    mock_upstream(
+        lambda request: httpx.Response(200, stream=body, headers={"content-type": "video/MP2T"})
+    )
+    fetched = HLS_UPSTREAM_BYTES.value(kind="segment")
+    timed = HLS_UPSTREAM_LATENCY.count(kind="segment", outcome="ok")
+    url = quote("https://rr1.googlevideo.com/videoplayback?sq=42&metrics=1", safe="")
+    assert client.get(f"/api/streams/kanyo-harvard/hls/seg?u={url}").status_code == 200
+    assert HLS_UPSTREAM_BYTES.value(kind="segment") == fetched + 188
+    assert HLS_UPSTREAM_LATENCY.count(kind="segment", outcome="ok") == timed + 1
+
+
+def test_visitor_lookups_are_counted():
+    private = VISITOR_TIMEZONE_LOOKUPS.value(source="private")
+    client.get("/api/visitor/timezone", headers={"X-Forwarded-For": "192.168.1.10"})
+    assert VISITOR_TIMEZONE_LOOKUPS.value(source="private") == private + 1
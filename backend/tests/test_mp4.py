@@ -0,0 +1,103 @@
+"""Tests for the native MP4 duration reader."""
+import struct
+from unittest.mock import patch
+from app.durations import DurationCache
+from app.mp4 import read_mp4_duration_us
+
+
+def box(box_type: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+
+def mvhd(timescale: int, duration: int, version: int = 0) -> bytes:
+    if version == 1:
+        body = struct.pack(">B3xQQIQ", 1, 0, 0, timescale, duration)
+    else:
+        body = struct.pack(">B3xIIII", 0, 0, 0, timescale, duration)
+    return box(b"mvhd", body + b"\x00" * 80)
+
+
+def mdhd(timescale: int, duration: int) -> bytes:
+    return box(b"mdhd", struct.pack(">B3xIIII", 0, 0, 0, timescale, duration) + b"\x00" * 4)
+
+
+def track(timescale: int, duration: int) -> bytes:
+    return box(b"trak", box(b"mdia", mdhd(timescale, duration)))
+
+
+def write_mp4(path, moov_children: bytes, faststart: bool = True, mdat_size: int = 4096):
+    ftyp = box(b"ftyp", b"isom\x00\x00\x02\x00isomiso2mp41")
+    moov = box(b"moov", moov_children)
+    mdat = box(b"mdat", b"\x00" * mdat_size)
+    path.write_bytes(ftyp + (moov + mdat if faststart else mdat + moov))
+    return path
+
+
+def test_reads_mvhd_duration(test_data_dir):
+    clip = write_mp4(test_data_dir / "a.mp4", mvhd(1000, 42_500))
+    assert read_mp4_duration_us(clip) == 42_500_000
+
+
+def test_reads_moov_after_mdat(test_data_dir):
+    clip = write_mp4(test_data_dir / "a.mp4", mvhd(90000, 900_000), faststart=False)
+    assert read_mp4_duration_us(clip) == 10_000_000
+
+
+def test_reads_version_1_mvhd(test_data_dir):
+    clip = write_mp4(test_data_dir / "a.mp4", mvhd(600, 3_000, version=1))
+    assert read_mp4_duration_us(clip) == 5_000_000
+
+
+def test_falls_back_to_longest_track(test_data_dir):
+    """mvhd with zero duration (fragmented recording) uses the mdhd durations."""
+    children = mvhd(1000, 0) + track(90000, 270_000) + track(48000, 96_000)
+    clip = write_mp4(test_data_dir / "a.mp4", children)
+    assert read_mp4_duration_us(clip) == 3_000_000
+
+
+def test_largesize_mdat(test_data_dir):
+    """64-bit box sizes are honoured when skipping media data."""
+    ftyp = box(b"ftyp", b"isom\x00\x00\x02\x00")
+    mdat_payload = b"\x00" * 100
+    mdat = struct.pack(">I4sQ", 1, b"mdat", 16 + len(mdat_payload)) + mdat_payload
+    clip = test_data_dir / "a.mp4"
+    clip.write_bytes(ftyp + mdat + box(b"moov", mvhd(1000, 1234)))
+    assert read_mp4_duration_us(clip) == 1_234_000
+
+
+def test_unparseable_files_return_none(test_data_dir):
+    garbage = test_data_dir / "garbage.mp4"
+    garbage.write_bytes(b"dummy video")
+    truncated = write_mp4(test_data_dir / "truncated.mp4", mvhd(1000, 1000), faststart=False)
+    truncated.write_bytes(truncated.read_bytes()[:-20])
+    no_moov = test_data_dir / "no_moov.mp4"
+    no_moov.write_bytes(box(b"ftyp", b"isom") + box(b"mdat", b"\x00" * 32))
+
+    assert read_mp4_duration_us(garbage) is None
+    assert read_mp4_duration_us(truncated) is None
+    assert read_mp4_duration_us(no_moov) is None
+    assert read_mp4_duration_us(test_data_dir / "missing.mp4") is None
+
+
+def test_duration_cache_prefers_native_reader(test_data_dir):
+    """MP4 clips are measured without spawning ffprobe."""
+    clip = write_mp4(test_data_dir / "falcon_120000_visit.mp4", mvhd(1000, 61_250))
+    cache = DurationCache(test_data_dir / "cache" / "durations.sqlite3")
+
+    with patch("app.durations.subprocess.run") as run:
+        assert cache.get_duration(clip) == 61.25
+    run.assert_not_called()
+    assert cache.stats()["parsed"] == 1
+    assert cache.stats()["probes"] == 0
+
+
+def test_duration_cache_uses_ffprobe_for_other_containers(test_data_dir):
+    clip = test_data_dir / "falcon_120000_visit.mkv"
+    clip.write_bytes(b"dummy video")
+    cache = DurationCache(test_data_dir / "cache" / "durations.sqlite3")
+
+    with patch("app.durations.subprocess.run") as run:
+        run.return_value.returncode = 0
+        run.return_value.stdout = "7.5\n"
+        assert cache.get_duration(clip) == 7.5
+    run.assert_called_once()
@@ -0,0 +1,194 @@
+"""Tests for the shared HLS segment cache."""
+import asyncio
+import logging
+from urllib.parse import quote
+import httpx
+from fastapi.testclient import TestClient
+from app import upstream
+from app.main import app
+from app.segment_cache import SegmentCache, get_segment_cache, normalize_url
+from tests.conftest import ChunkedStream
+
+
+client = TestClient(app)
+
+SEG_URL = "https://rr1.googlevideo.com/videoplayback?expire=123&sq=1"
+
+
+def _seg_path(url: str = SEG_URL) -> str:
+    return f"/api/streams/kanyo-harvard/hls/seg?u={quote(url, safe='')}"
+
+
+def _segment_handler(payload: bytes, content_type: str = "video/MP2T"):
+    def handler(request):
+        chunks = [payload[i : i + 1024] for i in range(0, len(payload), 1024)]
+        return httpx.Response(
+            200,
+            stream=ChunkedStream(*chunks),
+            headers={"content-type": content_type, "content-length": str(len(payload))},
+        )
+
+    return handler
+
+
+def test_normalize_url_folds_host_and_drops_fragment():
+    assert (
+        normalize_url("HTTPS://RR1.GoogleVideo.com/videoplayback?sq=1&Sig=AbC#frag")
+        == "https://rr1.googlevideo.com/videoplayback?sq=1&Sig=AbC"
+    )
+
+
+async def test_concurrent_viewers_share_one_upstream_fetch(override_streams_config, mock_upstream):
+    """N simultaneous requests for one segment cause a single upstream fetch."""
+    payload = bytes(range(256)) * 64
+    seen = mock_upstream(_segment_handler(payload))
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as viewer:
+        responses = await asyncio.gather(*(viewer.get(_seg_path()) for _ in range(20)))
+
+    assert len(seen) == 1
+    assert all(r.status_code == 200 and r.content == payload for r in responses)
+    stats = get_segment_cache().stats()
+    assert stats["upstream_fetches"] == 1
+    assert stats["misses"] + stats["coalesced"] + stats["hits"] == 20
+
+
+def test_finished_segment_served_from_cache(override_streams_config, mock_upstream):
+    payload = b"segment-bytes" * 100
+    seen = mock_upstream(_segment_handler(payload))
+
+    first = client.get(_seg_path())
+    second = client.get(_seg_path())
+
+    assert first.content == second.content == payload
+    assert second.headers["content-length"] == str(len(payload))
+    assert len(seen) == 1
+    stats = get_segment_cache().stats()
+    assert stats["hits"] == 1
+    assert stats["bytes_held"] == len(payload)
+    assert stats["hit_ratio"] == 0.5
+
+
+def test_sub_playlists_are_not_stored(override_streams_config, mock_upstream):
+    """Media playlists change every target duration, so they are always refetched."""
+    seen = mock_upstream(_segment_handler(b"#EXTM3U\n", "application/vnd.apple.mpegurl"))
+
+    client.get(_seg_path())
+    client.get(_seg_path())
+
+    assert len(seen) == 2
+    assert get_segment_cache().stats()["entries"] == 0
+
+
+def test_failed_fetch_is_not_cached(override_streams_config, mock_upstream):
+    statuses = iter([503, 200])
+
+    def handler(request):
+        return httpx.Response(next(statuses), stream=ChunkedStream(b"ok"))
+
+    seen = mock_upstream(handler)
+
+    assert client.get(_seg_path()).status_code == 502
+    assert client.get(_seg_path()).status_code == 200
+    assert len(seen) == 2
+
+
+async def test_lru_evicts_by_byte_budget(mock_upstream):
+    mock_upstream(lambda request: httpx.Response(200, stream=ChunkedStream(b"x" * 400)))
+    cache = SegmentCache(max_bytes=1000, ttl_seconds=60, max_item_bytes=1000)
+
+    for sq in range(4):
+        reader = cache.open(f"https://rr1.googlevideo.com/videoplayback?sq={sq}")
+        assert b"".join([chunk async for chunk in reader]) == b"x" * 400
+        await reader.close()
+
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["bytes_held"] == 800
+    assert stats["evictions"] == 2
+    # Most recently used segments survive
+    assert cache.open("https://rr1.googlevideo.com/videoplayback?sq=3").fetch.done
+
+
+async def test_oversized_segments_bypass_cache(mock_upstream):
+    mock_upstream(lambda request: httpx.Response(200, stream=ChunkedStream(b"x" * 500)))
+    cache = SegmentCache(max_bytes=10_000, ttl_seconds=60, max_item_bytes=100)
+
+    reader = cache.open(SEG_URL)
+    assert len(b"".join([chunk async for chunk in reader])) == 500
+    await reader.close()
+
+    assert cache.stats()["entries"] == 0
+
+
+async def test_oversized_segments_are_not_held_while_streaming(mock_upstream, monkeypatch):
+    monkeypatch.setattr(upstream, "STREAM_CHUNK_SIZE", 100)
+    mock_upstream(lambda request: httpx.Response(200, stream=ChunkedStream(*[b"x" * 100] * 10)))
+    cache = SegmentCache(max_bytes=10_000, ttl_seconds=60, max_item_bytes=250)
+
+    reader = cache.open(SEG_URL)
+    received = 0
+    async for chunk in reader:
+        received += len(chunk)
+        assert sum(len(held) for held in reader.fetch.chunks) <= 300
+        if received == 500:
+            # Too late to be sent the start of the body: a second fetch
+            late = cache.open(SEG_URL)
+            assert late.fetch is not reader.fetch
+            await late.close()
+    await reader.close()
+
+    assert received == 1000
+    assert reader.fetch.chunks == []
+    assert cache.stats()["misses"] == 2
+
+
+class FailingStream(ChunkedStream):
+    """Upstream body that breaks off after its chunks."""
+
+    async def __aiter__(self):
+        async for chunk in super().__aiter__():
+            yield chunk
+        raise httpx.ReadError("connection reset")
+
+
+async def test_upstream_failure_mid_body_truncates_the_response(mock_upstream, monkeypatch, caplog):
+    monkeypatch.setattr(upstream, "STREAM_CHUNK_SIZE", 100)
+    caplog.set_level(logging.WARNING, logger="app.segment_cache")
+    mock_upstream(lambda request: httpx.Response(200, stream=FailingStream(b"x" * 100)))
+    cache = SegmentCache(max_bytes=10_000, ttl_seconds=60, max_item_bytes=1000)
+
+    reader = cache.open(SEG_URL)
+    await reader.fetch.wait_ready()
+    assert b"".join([chunk async for chunk in reader]) == b"x" * 100
+    await reader.close()
+
+    assert "truncating" in caplog.text
+    assert cache.stats()["entries"] == 0
+
+
+def test_failed_segment_is_never_served_as_a_playlist(
+    override_streams_config, mock_upstream, monkeypatch
+):
+    monkeypatch.setattr(upstream, "STREAM_CHUNK_SIZE", 100)
+    content_types = iter(["video/MP2T", "application/vnd.apple.mpegurl"])
+    mock_upstream(
+        lambda request: httpx.Response(
+            200,
+            stream=FailingStream(b"\x47" * 100),
+            headers={"content-type": next(content_types)},
+        )
+    )
+
+    # A segment is cut short; a playlist broken off mid-way is not rewritten at all
+    response = client.get(_seg_path())
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "video/MP2T"
+    assert response.content == b"\x47" * 100
+    assert client.get(_seg_path()).status_code == 502
+
+
+def test_health_reports_segment_cache(override_streams_config):
+    stats = client.get("/health").json()["caches"]["segments"]
+    assert {"hit_ratio", "bytes_held", "evictions", "max_bytes"} <= set(stats)
@@ -1,8 +1,14 @@
 """Tests for streams router."""
+import asyncio
+import time
+from datetime import datetime, timedelta
 from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock, AsyncMock
+from unittest.mock import patch, MagicMock
+import httpx
+import pytz
 from app.main import app
 import app.routers.streams as streams_router
+from tests.conftest import ChunkedStream
 
 
 client = TestClient(app)
@@ -27,6 +33,69 @@ def test_list_streams(override_streams_config):
     assert "stats" in stream
 
 
+def test_list_streams_etag_and_304(override_streams_config):
+    first = client.get("/api/streams")
+    etag = first.headers["etag"]
+
+    again = client.get("/api/streams", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["etag"] == etag
+    assert client.get("/api/streams", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_stream_summaries_are_memoized(override_streams_config, monkeypatch):
+    calls, validations = [], []
+    summarize, validator = streams_router.summarize_stream, streams_router.summary_validator
+
+    def counting(stream_id, config):
+        calls.append(stream_id)
+        return summarize(stream_id, config)
+
+    def counting_validator(stream_id):
+        validations.append(stream_id)
+        return validator(stream_id)
+
+    monkeypatch.setattr(streams_router, "summarize_stream", counting)
+    monkeypatch.setattr(streams_router, "summary_validator", counting_validator)
+    client.get("/api/streams")
+    client.get("/api/streams")
+    # Within the TTL nothing is even revalidated
+    assert sorted(calls) == sorted(validations) == ["kanyo-harvard", "kanyo-nsw"]
+
+    # Past the TTL an unchanged stream is revalidated, not rebuilt
+    monkeypatch.setattr(override_streams_config, "STREAM_SUMMARY_TTL_SECONDS", 0)
+    for entry in streams_router._stream_summaries.values():
+        entry["fresh_until"] = 0
+    client.get("/api/streams")
+    assert len(calls) == 2
+    assert len(validations) == 4
+
+    # A new clip today changes the validator
+    today = streams_router.datetime.now(streams_router.get_stream_timezone("kanyo-nsw"))
+    day_dir = override_streams_config.DATA_DIR / "kanyo-nsw" / "clips" / today.strftime("%Y-%m-%d")
+    day_dir.mkdir()
+    (day_dir / "falcon_000001_visit.mp4").write_bytes(b"clip")
+    client.get("/api/streams")
+    assert calls[2:] == ["kanyo-nsw"]
+
+
+async def test_stream_summaries_built_concurrently(override_streams_config, monkeypatch):
+    def slow(stream_id, config):
+        time.sleep(0.2)
+        return {"id": stream_id}
+
+    monkeypatch.setattr(streams_router, "summarize_stream", slow)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as viewer:
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(viewer.get("/api/streams") for _ in range(5)))
+        elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.35
+    assert all(len(r.json()["streams"]) == 2 for r in responses)
+
+
 def test_get_stream_detail(override_streams_config):
     """Test GET /api/streams/{stream_id} endpoint."""
     response = client.get("/api/streams/kanyo-harvard")
@@ -106,6 +175,25 @@ def test_get_stream_snapshot(override_streams_config):
     assert response.headers["content-type"].startswith("image/")
 
 
+def test_snapshot_is_revalidated_and_tracks_the_latest_arrival(
+    override_streams_config, test_data_dir
+):
+    first = client.get("/api/streams/kanyo-harvard/snapshot")
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "public, max-age=30"
+
+    again = client.get("/api/streams/kanyo-harvard/snapshot", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+
+    recent = max((test_data_dir / "kanyo-harvard" / "clips").iterdir())
+    (recent / "falcon_235959_arrival.jpg").write_bytes(b"newer jpeg")
+    newer = client.get("/api/streams/kanyo-harvard/snapshot", headers={"If-None-Match": etag})
+    assert newer.status_code == 200
+    assert newer.headers["etag"] != etag
+    assert newer.content == b"newer jpeg"
+
+
 def test_get_stream_snapshot_not_found(override_streams_config, test_data_dir):
     """Test snapshot returns 404 when no arrival images exist."""
     # NSW has no clips at all, so no snapshots
@@ -123,6 +211,152 @@ def test_get_stream_dates_with_events_via_streams(override_streams_config):
     assert "2026-01-14" in data["dates"]
 
 
+def _fail(*args):
+    raise AssertionError("payload rebuilt for a conditional request")
+
+
+def test_past_day_events_are_immutable_and_revalidated_without_loading(
+    override_streams_config, monkeypatch
+):
+    path = "/api/streams/kanyo-harvard/events?date=2026-01-14"
+    first = client.get(path)
+    assert first.status_code == 200
+    assert "immutable" in first.headers["cache-control"]
+    assert first.headers["etag"].startswith('"')
+    assert "last-modified" in first.headers
+
+    monkeypatch.setattr(streams_router, "load_events_for_date", _fail)
+    again = client.get(path, headers={"If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["etag"] == first.headers["etag"]
+    since = client.get(path, headers={"If-Modified-Since": first.headers["last-modified"]})
+    assert since.status_code == 304
+
+
+def test_events_etag_changes_with_the_day(override_streams_config, test_data_dir):
+    path = "/api/streams/kanyo-harvard/events?date=2026-01-14"
+    etag = client.get(path).headers["etag"]
+
+    day_dir = test_data_dir / "kanyo-harvard" / "clips" / "2026-01-14"
+    (day_dir / "falcon_120000_visit.mp4").write_bytes(b"dummy video")
+
+    response = client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert len(response.json()["events"]) == 3
+
+
+def test_events_fallback_day_is_revalidated(override_streams_config):
+    response = client.get("/api/streams/kanyo-harvard/events?date=2026-01-20")
+    assert response.json()["date"] != "2026-01-20"
+    assert response.headers["cache-control"] == "no-cache"
+
+
+def test_stats_and_dates_answer_304_without_recomputing(override_streams_config, monkeypatch):
+    paths = [
+        "/api/streams/kanyo-harvard/stats?range=3d",
+        "/api/streams/kanyo-harvard/stats?start=2026-01-14&end=2026-01-14",
+        "/api/streams/kanyo-harvard/dates-with-events?start_date=2026-01-01&end_date=2026-01-31",
+    ]
+    first = [client.get(path) for path in paths]
+    assert first[0].headers["cache-control"] == "no-cache"
+    assert "immutable" in first[1].headers["cache-control"]
+    assert "immutable" in first[2].headers["cache-control"]
+
+    monkeypatch.setattr(streams_router, "get_stats_for_range", _fail)
+    monkeypatch.setattr(streams_router, "list_dates_with_events", _fail)
+    for path, response in zip(paths, first):
+        again = client.get(path, headers={"If-None-Match": response.headers["etag"]})
+        assert again.status_code == 304
+
+
+def test_sliding_stats_etag_changes_when_a_clip_leaves_the_window(override_streams_config):
+    path = "/api/streams/kanyo-harvard/stats?range=3d"
+    first = client.get(path)
+    assert first.json()["visits"] == 1
+    etag = first.headers["etag"]
+    assert client.get(path, headers={"If-None-Match": etag}).status_code == 304
+
+    later = datetime.now() + timedelta(days=4)
+    with patch.object(streams_router, "datetime", wraps=datetime) as clock:
+        clock.now.side_effect = lambda tz=None: later.astimezone(tz)
+        response = client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["visits"] == 0
+
+
+def test_sliding_stats_end_now(override_streams_config, test_data_dir):
+    path = "/api/streams/kanyo-harvard/stats?range=24h"
+    visits = client.get(path).json()["visits"]
+
+    tz = pytz.timezone("America/New_York")
+    soon = datetime.now(tz) + timedelta(hours=1)
+    day_dir = test_data_dir / "kanyo-harvard" / "clips" / soon.strftime("%Y-%m-%d")
+    day_dir.mkdir(exist_ok=True)
+    (day_dir / f"falcon_{soon.strftime('%H%M%S')}_visit.mp4").write_bytes(b"dummy video")
+
+    response = client.get(path)
+    assert response.json()["visits"] == visits
+    # Clips leaving the window don't move the newest mtime; only the ETag tracks it
+    assert "last-modified" not in response.headers
+
+    later = datetime.now() + timedelta(hours=2)
+    with patch.object(streams_router, "datetime", wraps=datetime) as clock:
+        clock.now.side_effect = lambda tz=None: later.astimezone(tz)
+        response = client.get(path, headers={"If-None-Match": response.headers["etag"]})
+    assert response.status_code == 200
+    assert response.json()["visits"] == visits + 1
+
+
+def test_day_is_settled():
+    tz = pytz.timezone("America/New_York")
+    today = datetime.now(tz).strftime("%Y-%m-%d")
+    assert streams_router.day_is_settled("2026-01-14", tz)
+    assert not streams_router.day_is_settled(today, tz)
+    assert not streams_router.day_is_settled("9999-12-31", tz)
+    assert not streams_router.day_is_settled("not-a-date", tz)
+
+
+# --- stream registry reloads ---
+
+
+async def test_reload_invalidates_only_changed_streams(
+    override_streams_config, test_data_dir, monkeypatch
+):
+    settings = override_streams_config
+    settings.streams
+    entry = {"url": "https://example.com/live.m3u8", "resolved_at": 0, "refresh_at": 0}
+    monkeypatch.setattr(
+        streams_router,
+        "_live_url_cache",
+        {"kanyo-harvard": dict(entry), "kanyo-nsw": dict(entry)},
+    )
+    monkeypatch.setattr(streams_router, "_stream_summaries", {"kanyo-harvard": {}, "kanyo-nsw": {}})
+
+    harvard = test_data_dir / "kanyo-harvard" / "config.yaml"
+    harvard.write_text(harvard.read_text().replace("glczTFRRAK4", "newVideoId1"))
+    changes = await streams_router.reload_streams()
+
+    assert changes.changed == ["kanyo-harvard"]
+    assert settings.streams["kanyo-harvard"]["youtube_id"] == "newVideoId1"
+    assert list(streams_router._live_url_cache) == ["kanyo-nsw"]
+    assert list(streams_router._stream_summaries) == ["kanyo-nsw"]
+
+
+async def test_reload_forgets_removed_streams(override_streams_config, test_data_dir):
+    settings = override_streams_config
+    assert client.get("/api/streams/kanyo-nsw").status_code == 200
+
+    (test_data_dir / "kanyo-nsw" / "config.yaml").unlink()
+    changes = await streams_router.reload_streams()
+
+    assert changes.removed == ["kanyo-nsw"]
+    assert "kanyo-nsw" not in settings.streams
+    assert client.get("/api/streams/kanyo-nsw").status_code == 404
+    assert client.get("/api/streams/kanyo-harvard").status_code == 200
+
+
 # --- live-url endpoint ---
 
 def test_get_live_url_success(override_streams_config):
@@ -196,7 +430,7 @@ def test_get_live_url_ytdlp_not_installed(override_streams_config):
 
 # --- HLS proxy endpoints ---
 
-def test_get_hls_playlist_proxies_manifest(override_streams_config):
+def test_get_hls_playlist_proxies_manifest(override_streams_config, mock_upstream):
     """Test GET /hls/playlist.m3u8 fetches manifest and rewrites segment URLs."""
     streams_router._live_url_cache.clear()
 
@@ -213,13 +447,9 @@ def test_get_hls_playlist_proxies_manifest(override_streams_config):
         "#EXTINF:6.006,\n"
         "https://rr1.googlevideo.com/videoplayback?sq=2\n"
     )
-    mock_http = MagicMock()
-    mock_http.status_code = 200
-    mock_http.text = fake_manifest
+    requests_seen = mock_upstream(lambda request: httpx.Response(200, text=fake_manifest))
 
-    with patch("app.routers.streams.subprocess.run", return_value=mock_ytdlp), \
-         patch("app.routers.streams.httpx.AsyncClient") as mock_client_cls:
-        mock_client_cls.return_value.__aenter__.return_value.get = AsyncMock(return_value=mock_http)
+    with patch("app.routers.streams.subprocess.run", return_value=mock_ytdlp):
         response = client.get("/api/streams/kanyo-harvard/hls/playlist.m3u8")
 
     assert response.status_code == 200
@@ -232,6 +462,7 @@ def test_get_hls_playlist_proxies_manifest(override_streams_config):
     # Non-segment lines should be unchanged
     assert "#EXTM3U" in body
     assert "#EXTINF:6.006," in body
+    assert str(requests_seen[0].url) == fake_manifest_url
 
 
 def test_get_hls_playlist_not_found(override_streams_config):
@@ -240,23 +471,28 @@ def test_get_hls_playlist_not_found(override_streams_config):
     assert response.status_code == 404
 
 
-def test_proxy_hls_segment_success(override_streams_config):
+def test_proxy_hls_segment_success(override_streams_config, mock_upstream):
     """Test GET /hls/seg proxies a valid googlevideo.com segment."""
     from urllib.parse import quote
     seg_url = "https://rr1.googlevideo.com/videoplayback?expire=123&sq=1"
     encoded = quote(seg_url, safe="")
 
-    mock_http = MagicMock()
-    mock_http.status_code = 200
-    mock_http.content = b"\x00\x01\x02\x03"
-    mock_http.headers = {"content-type": "video/MP2T"}
-
-    with patch("app.routers.streams.httpx.AsyncClient") as mock_client_cls:
-        mock_client_cls.return_value.__aenter__.return_value.get = AsyncMock(return_value=mock_http)
-        response = client.get(f"/api/streams/kanyo-harvard/hls/seg?u={encoded}")
+    body = ChunkedStream(b"\x00\x01", b"\x02\x03")
+    requests_seen = mock_upstream(
+        lambda request: httpx.Response(
+            200,
+            stream=body,
+            headers={"content-type": "video/MP2T", "content-length": "4"},
+        )
+    )
+    response = client.get(f"/api/streams/kanyo-harvard/hls/seg?u={encoded}")
 
     assert response.status_code == 200
     assert response.content == b"\x00\x01\x02\x03"
+    assert response.headers["content-length"] == "4"
+    assert response.headers["content-type"] == "video/MP2T"
+    assert str(requests_seen[0].url) == seg_url
+    assert body.closed
 
 
 def test_proxy_hls_segment_blocks_disallowed_domain(override_streams_config):
@@ -266,3 +502,215 @@ def test_proxy_hls_segment_blocks_disallowed_domain(override_streams_config):
     encoded = quote(bad_url, safe="")
     response = client.get(f"/api/streams/kanyo-harvard/hls/seg?u={encoded}")
     assert response.status_code == 403
+
+
+def test_proxy_hls_segment_upstream_error_closes_response(override_streams_config, mock_upstream):
+    """A non-200 upstream segment is reported as 502 and its stream released."""
+    from urllib.parse import quote
+
+    seg_url = "https://rr1.googlevideo.com/videoplayback?sq=9"
+    body = ChunkedStream(b"gone")
+    mock_upstream(lambda request: httpx.Response(404, stream=body))
+
+    response = client.get(f"/api/streams/kanyo-harvard/hls/seg?u={quote(seg_url, safe='')}")
+
+    assert response.status_code == 502
+    assert body.closed
+
+
+async def test_proxy_hls_segment_closes_upstream_on_client_disconnect(
+    override_streams_config, mock_upstream
+):
+    """If the viewer goes away mid-segment the upstream stream is closed, not drained."""
+    from urllib.parse import quote
+
+    body = ChunkedStream(*[b"x" * 1024] * 100)
+    mock_upstream(lambda request: httpx.Response(200, stream=body))
+
+    seg_url = quote("https://rr1.googlevideo.com/videoplayback?sq=1", safe="")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/api/streams/kanyo-harvard/hls/seg",
+        "raw_path": b"/api/streams/kanyo-harvard/hls/seg",
+        "query_string": f"u={seg_url}".encode(),
+        "headers": [(b"host", b"test")],
+        "client": ("127.0.0.1", 1234),
+        "server": ("test", 80),
+    }
+    messages = iter([{"type": "http.request", "body": b"", "more_body": False}])
+    sent = []
+
+    async def receive():
+        try:
+            return next(messages)
+        except StopIteration:
+            # Viewer disconnects once the response has started
+            while not sent:
+                await asyncio.sleep(0)
+            return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+        await asyncio.sleep(0)
+
+    await app(scope, receive, send)
+
+    assert sent[0]["type"] == "http.response.start"
+    assert body.closed
+    assert body.sent < len(body.chunks)
+
+
+# --- single-flight live URL resolution ---
+
+
+def _counting_ytdlp(calls, returncode=0, delay=0.2):
+    def run(*args, **kwargs):
+        calls.append(args)
+        time.sleep(delay)
+        result = MagicMock()
+        result.returncode = returncode
+        result.stdout = "https://manifest.googlevideo.com/fake/hls/manifest.m3u8\n"
+        result.stderr = "ERROR: rate limited"
+        return result
+
+    return run
+
+
+async def test_concurrent_playlist_requests_resolve_once(override_streams_config, mock_upstream):
+    """50 viewers arriving on a cold cache trigger exactly one yt-dlp run."""
+    streams_router._live_url_cache.clear()
+    mock_upstream(lambda request: httpx.Response(200, text="#EXTM3U\n#EXT-X-VERSION:3\n"))
+    calls = []
+
+    transport = httpx.ASGITransport(app=app)
+    with patch("app.routers.streams.subprocess.run", side_effect=_counting_ytdlp(calls)):
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as viewer:
+            responses = await asyncio.gather(
+                *(viewer.get("/api/streams/kanyo-harvard/hls/playlist.m3u8") for _ in range(50))
+            )
+
+    assert len(calls) == 1
+    assert all(r.status_code == 200 for r in responses)
+    assert not streams_router._live_url_inflight
+
+
+async def test_concurrent_resolution_failure_shared_by_waiters(override_streams_config):
+    """Every waiter sees the single resolution's error; the next request retries."""
+    streams_router._live_url_cache.clear()
+    calls = []
+
+    transport = httpx.ASGITransport(app=app)
+    with patch(
+        "app.routers.streams.subprocess.run", side_effect=_counting_ytdlp(calls, returncode=1)
+    ):
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as viewer:
+            responses = await asyncio.gather(
+                *(viewer.get("/api/streams/kanyo-harvard/live-url") for _ in range(10))
+            )
+            assert len(calls) == 1
+            assert all(r.status_code == 502 for r in responses)
+
+            await viewer.get("/api/streams/kanyo-harvard/live-url")
+            assert len(calls) == 2
+
+
+# --- background pre-refresh of live URLs ---
+
+OLD_URL = "https://manifest.googlevideo.com/old/hls/manifest.m3u8"
+NEW_URL = "https://manifest.googlevideo.com/fake/hls/manifest.m3u8"
+
+
+def _seed_live_url(stream_id, age_seconds, refresh_due=True):
+    now = time.time()
+    streams_router._live_url_cache[stream_id] = {
+        "url": OLD_URL,
+        "resolved_at": now - age_seconds,
+        "refresh_at": now - 1 if refresh_due else now + 3600,
+    }
+
+
+async def test_stale_url_served_while_refresh_runs(override_streams_config):
+    """A due (even expired) URL is returned immediately and refreshed in the background."""
+    streams_router._live_url_cache.clear()
+    _seed_live_url("kanyo-harvard", streams_router._LIVE_URL_TTL_SECONDS + 60)
+    calls = []
+
+    transport = httpx.ASGITransport(app=app)
+    with patch("app.routers.streams.subprocess.run", side_effect=_counting_ytdlp(calls)):
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as viewer:
+            start = time.perf_counter()
+            response = await viewer.get("/api/streams/kanyo-harvard/live-url")
+            assert time.perf_counter() - start < 0.15
+
+            data = response.json()
+            assert data["url"] == OLD_URL
+            assert data["cached"] is True
+            assert data["refresh"]["in_progress"] is True
+
+            await streams_router._live_url_inflight["kanyo-harvard"]
+
+    assert len(calls) == 1
+    assert streams_router._live_url_cache["kanyo-harvard"]["url"] == NEW_URL
+    assert streams_router._live_url_refresh_status["kanyo-harvard"]["outcome"] == "ok"
+
+
+async def test_refresher_only_refreshes_watched_streams(override_streams_config):
+    streams_router._live_url_cache.clear()
+    now = time.time()
+    _seed_live_url("kanyo-harvard", 3600)
+    _seed_live_url("kanyo-nsw", 3600)
+    streams_router._live_url_activity["kanyo-harvard"] = now
+    streams_router._live_url_activity["kanyo-nsw"] = (
+        now - streams_router._LIVE_URL_ACTIVE_WINDOW_SECONDS - 1
+    )
+    calls = []
+
+    with patch("app.routers.streams.subprocess.run", side_effect=_counting_ytdlp(calls, delay=0)):
+        await streams_router.refresh_live_urls()
+
+    assert len(calls) == 1
+    assert streams_router._live_url_cache["kanyo-harvard"]["url"] == NEW_URL
+    assert streams_router._live_url_cache["kanyo-nsw"]["url"] == OLD_URL
+
+
+async def test_refresh_schedule_is_jittered_before_expiry(override_streams_config):
+    streams_router._live_url_cache.clear()
+    with patch("app.routers.streams.subprocess.run", side_effect=_counting_ytdlp([], delay=0)):
+        await streams_router._resolve_or_get_live_url("kanyo-harvard")
+
+    entry = streams_router._live_url_cache["kanyo-harvard"]
+    earliest = (
+        entry["resolved_at"]
+        + streams_router._LIVE_URL_TTL_SECONDS
+        - streams_router._LIVE_URL_REFRESH_LEAD_SECONDS
+        - streams_router._LIVE_URL_REFRESH_JITTER_SECONDS
+    )
+    jitter = streams_router._LIVE_URL_REFRESH_JITTER_SECONDS
+    assert earliest <= entry["refresh_at"] <= earliest + jitter
+
+
+async def test_failed_refresh_keeps_old_url_and_reports_error(override_streams_config):
+    streams_router._live_url_cache.clear()
+    _seed_live_url("kanyo-harvard", 3600)
+    streams_router._live_url_activity["kanyo-harvard"] = time.time()
+
+    with patch(
+        "app.routers.streams.subprocess.run",
+        side_effect=_counting_ytdlp([], returncode=1, delay=0),
+    ):
+        await streams_router.refresh_live_urls()
+
+    entry = streams_router._live_url_cache["kanyo-harvard"]
+    assert entry["url"] == OLD_URL
+    assert entry["refresh_at"] > time.time()
+
+    response = client.get("/api/streams/kanyo-harvard/live-url")
+    refresh = response.json()["refresh"]
+    assert response.json()["url"] == OLD_URL
+    assert refresh["last_outcome"] == "error"
+    assert "rate limited" in refresh["last_error"]
+    assert refresh["scheduled_in"] > 0
@@ -0,0 +1,285 @@
+"""Tests for app.thumbnails and the thumbnail and day sprite endpoints."""
+import asyncio
+import io
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app.main import app
+from app.thumbnails import (
+    ThumbnailCache,
+    get_thumbnail_cache,
+    render,
+    render_sprite,
+    size_bucket,
+    sprite_grid,
+)
+
+client = TestClient(app)
+
+FRAME_URL = "/api/clips/kanyo-harvard/2026-01-14/thumbnails/{size}/falcon_072315_arrival.{ext}"
+
+
+def _write_frame(path, size=(1280, 720), color=(0, 0, 0)):
+    image = Image.new("RGB", size, color)
+    for x in range(0, size[0], 40):
+        image.paste((x % 256, 90, 200), (x, 0, x + 20, size[1]))
+    image.save(path, "JPEG", quality=90)
+    # Backdated past the settle window, as a finished frame would be
+    old = os.stat(path).st_mtime - 3600
+    os.utime(path, (old, old))
+    return path
+
+
+@pytest.fixture
+def frame(tmp_path):
+    return _write_frame(tmp_path / "falcon_072315_arrival.jpg")
+
+
+@pytest.fixture
+def clip_frame(override_streams_config, test_data_dir):
+    path = test_data_dir / "kanyo-harvard" / "clips" / "2026-01-14" / "falcon_072315_arrival.jpg"
+    return _write_frame(path)
+
+
+@pytest.mark.parametrize(
+    "width, bucket", [(1, 160), (160, 160), (161, 320), (640, 640), (4000, 640)]
+)
+def test_size_bucket(width, bucket):
+    assert size_bucket(width) == bucket
+
+
+@pytest.mark.parametrize("fmt, pil_format", [("jpg", "JPEG"), ("webp", "WEBP")])
+def test_render_scales_down_keeping_aspect(frame, fmt, pil_format):
+    data = render(frame, 320, fmt)
+    with Image.open(io.BytesIO(data)) as image:
+        assert image.format == pil_format
+        assert image.size == (320, 180)
+    assert len(data) < frame.stat().st_size
+
+
+def test_render_never_upscales(tmp_path):
+    small = _write_frame(tmp_path / "small.jpg", (100, 50))
+    with Image.open(io.BytesIO(render(small, 640, "jpg"))) as image:
+        assert image.size == (100, 50)
+
+
+async def test_cache_renders_once_and_then_hits(frame, tmp_path):
+    cache = ThumbnailCache(tmp_path / "cache", max_bytes=10 * 1024 * 1024)
+    st = frame.stat()
+    path, variant = await cache.get(frame, st, 160, "webp")
+    assert path.read_bytes()[8:12] == b"WEBP"
+    assert variant.st_size == path.stat().st_size
+
+    again, _ = await cache.get(frame, st, 160, "webp")
+    assert again == path
+    stats = cache.stats()
+    assert (stats["misses"], stats["hits"], stats["generated"]) == (1, 1, 1)
+    assert stats["hit_ratio"] == 0.5
+    assert stats["bytes_held"] == variant.st_size
+
+
+async def test_cache_coalesces_concurrent_misses(frame, tmp_path):
+    cache = ThumbnailCache(tmp_path / "cache", max_bytes=10 * 1024 * 1024)
+    results = await asyncio.gather(*(cache.get(frame, frame.stat(), 320, "jpg") for _ in range(5)))
+    assert len({path for path, _ in results}) == 1
+    assert cache.stats()["generated"] == 1
+    assert cache.stats()["coalesced"] == 4
+
+
+async def test_changed_source_gets_a_new_variant(frame, tmp_path):
+    cache = ThumbnailCache(tmp_path / "cache", max_bytes=10 * 1024 * 1024)
+    first, _ = await cache.get(frame, frame.stat(), 160, "jpg")
+    _write_frame(frame, (640, 480))
+    os.utime(frame, None)
+    second, _ = await cache.get(frame, frame.stat(), 160, "jpg")
+    assert first != second
+
+
+async def test_cache_evicts_least_recently_used_past_budget(frame, tmp_path):
+    # Same pixels under three names give three variants of the same size
+    frames = [frame]
+    for name in ("falcon_080000_visit.jpg", "falcon_090000_visit.jpg"):
+        copy = tmp_path / name
+        copy.write_bytes(frame.read_bytes())
+        frames.append(copy)
+    one = len(render(frame, 160, "jpg"))
+
+    cache = ThumbnailCache(tmp_path / "cache", max_bytes=int(one * 2.5), grace_seconds=0)
+    a, _ = await cache.get(frames[0], frames[0].stat(), 160, "jpg")
+    b, _ = await cache.get(frames[1], frames[1].stat(), 160, "jpg")
+    await cache.get(frames[0], frames[0].stat(), 160, "jpg")  # a is now the most recently used
+    c, _ = await cache.get(frames[2], frames[2].stat(), 160, "jpg")
+
+    assert a.exists() and c.exists()
+    assert not b.exists()
+    stats = cache.stats()
+    assert (stats["evictions"], stats["entries"], stats["bytes_held"]) == (1, 2, one * 2)
+
+
+async def test_recently_served_variants_outlive_the_budget(frame, tmp_path):
+    copy = tmp_path / "falcon_080000_visit.jpg"
+    copy.write_bytes(frame.read_bytes())
+    one = len(render(frame, 160, "jpg"))
+
+    cache = ThumbnailCache(tmp_path / "cache", max_bytes=int(one * 1.5), grace_seconds=60)
+    a, _ = await cache.get(frame, frame.stat(), 160, "jpg")
+    b, _ = await cache.get(copy, copy.stat(), 160, "jpg")
+
+    # a may still be being streamed, so it isn't unlinked yet
+    assert a.exists() and b.exists()
+    stats = cache.stats()
+    assert (stats["evictions"], stats["bytes_held"]) == (0, one * 2)
+
+    cache.grace_seconds = 0
+    await cache.get(frame, frame.stat(), 320, "jpg")
+    assert not a.exists() and not b.exists()
+
+
+async def test_cache_adopts_existing_variants_and_rerenders_missing(frame, tmp_path):
+    root = tmp_path / "cache"
+    first = ThumbnailCache(root, max_bytes=10 * 1024 * 1024)
+    path, _ = await first.get(frame, frame.stat(), 160, "jpg")
+
+    # Adopted on the worker pool at the first lookup, not in the constructor
+    second = ThumbnailCache(root, max_bytes=10 * 1024 * 1024)
+    assert second.stats()["entries"] == 0
+    await second.get(frame, frame.stat(), 160, "jpg")
+    assert (second.stats()["entries"], second.stats()["hits"]) == (1, 1)
+
+    path.unlink()
+    again, _ = await second.get(frame, frame.stat(), 160, "jpg")
+    assert again.exists()
+    assert second.stats()["generated"] == 1
+
+
+def test_thumbnail_endpoint_serves_resized_webp(clip_frame):
+    response = client.get(FRAME_URL.format(size=200, ext="webp"))
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/webp"
+    assert "immutable" in response.headers["cache-control"]
+    with Image.open(io.BytesIO(response.content)) as image:
+        assert image.size == (320, 180)
+
+    etag = response.headers["etag"]
+    cached = client.get(FRAME_URL.format(size=200, ext="webp"), headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert get_thumbnail_cache().stats()["hits"] == 1
+
+
+def test_thumbnail_endpoint_serves_jpeg(clip_frame):
+    response = client.get(FRAME_URL.format(size=160, ext="jpg"))
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/jpeg"
+    with Image.open(io.BytesIO(response.content)) as image:
+        assert image.size == (160, 90)
+
+
+def test_thumbnail_endpoint_rejects_bad_requests(clip_frame):
+    url = "/api/clips/kanyo-harvard/2026-01-14/thumbnails"
+    assert client.get(f"{url}/160/falcon_072315_arrival.mp4").status_code == 400
+    assert client.get(f"{url}/160/falcon_072315_arrival.png").status_code == 400
+    assert client.get(f"{url}/0/falcon_072315_arrival.jpg").status_code == 400
+    assert client.get(f"{url}/big/falcon_072315_arrival.jpg").status_code == 422
+    assert client.get(f"{url}/160/falcon_999999_arrival.jpg").status_code == 404
+
+
+def test_thumbnail_endpoint_unreadable_frame(override_streams_config):
+    # The fixture's frames are placeholder bytes, not JPEGs
+    response = client.get(FRAME_URL.format(size=160, ext="jpg"))
+    assert response.status_code == 500
+
+
+SPRITE_URL = "/api/streams/kanyo-harvard/days/2026-01-14/sprite"
+
+
+@pytest.fixture
+def day_frames(override_streams_config, test_data_dir):
+    day_dir = test_data_dir / "kanyo-harvard" / "clips" / "2026-01-14"
+    frames = [
+        _write_frame(day_dir / "falcon_072315_visit.jpg", color=(200, 0, 0)),
+        _write_frame(day_dir / "falcon_093000_visit.jpg", color=(0, 0, 200)),
+    ]
+    old = os.stat(day_dir).st_mtime - 3600
+    os.utime(day_dir, (old, old))
+    return frames
+
+
+@pytest.mark.parametrize("count, grid", [(0, (1, 1)), (1, (1, 1)), (3, (3, 1)), (25, (10, 3))])
+def test_sprite_grid(count, grid):
+    assert sprite_grid(count) == grid
+
+
+def test_render_sprite_tiles_frames_in_order(tmp_path):
+    red, broken, blue = tmp_path / "red.jpg", tmp_path / "broken.jpg", tmp_path / "blue.jpg"
+    Image.new("RGB", (640, 480), (255, 0, 0)).save(red)
+    broken.write_bytes(b"not a jpeg")
+    Image.new("RGB", (1280, 720), (0, 0, 255)).save(blue)
+
+    with Image.open(io.BytesIO(render_sprite([red, broken, blue], "webp"))) as sheet:
+        assert sheet.format == "WEBP"
+        assert sheet.size == (480, 90)
+        sheet = sheet.convert("RGB")
+        assert sheet.getpixel((80, 45))[0] > 200
+        assert sum(sheet.getpixel((240, 45))) < 30
+        assert sheet.getpixel((400, 45))[2] > 200
+
+
+def test_day_sprite_map(day_frames):
+    response = client.get(SPRITE_URL)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["version"]
+    assert (body["tile_width"], body["tile_height"], body["columns"], body["rows"]) == (
+        160,
+        90,
+        2,
+        1,
+    )
+    assert body["tiles"] == {
+        "20260114_072315": {"x": 0, "y": 0},
+        "20260114_093000": {"x": 160, "y": 0},
+    }
+    # A finished day's map doesn't change until its files do
+    assert "immutable" in response.headers["cache-control"]
+    cached = client.get(SPRITE_URL, headers={"If-None-Match": response.headers["etag"]})
+    assert cached.status_code == 304
+
+
+def test_day_sprite_image_is_built_once(day_frames):
+    version = client.get(SPRITE_URL).json()["version"]
+    response = client.get(f"{SPRITE_URL}.webp", params={"v": version})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/webp"
+    assert "immutable" in response.headers["cache-control"]
+    with Image.open(io.BytesIO(response.content)) as sheet:
+        assert sheet.size == (320, 90)
+
+    # Unversioned URLs are revalidated; the sheet isn't composited again
+    again = client.get(f"{SPRITE_URL}.webp")
+    assert again.headers["cache-control"] == "no-cache"
+    assert again.content == response.content
+    stats = get_thumbnail_cache().stats()
+    assert (stats["generated"], stats["hits"]) == (1, 1)
+
+
+def test_day_sprite_changes_with_the_day(day_frames):
+    from app.clip_index import clip_index
+
+    before = client.get(SPRITE_URL).json()["version"]
+    _write_frame(day_frames[0], color=(0, 200, 0))
+    clip_index.forget()
+    after = client.get(SPRITE_URL).json()["version"]
+    assert after != before
+
+
+def test_day_sprite_errors(override_streams_config):
+    empty = client.get("/api/streams/kanyo-nsw/days/2026-01-14/sprite")
+    assert empty.status_code == 200
+    assert empty.json()["version"] is None and empty.json()["tiles"] == {}
+    assert client.get("/api/streams/kanyo-nsw/days/2026-01-14/sprite.webp").status_code == 404
+    assert client.get(f"{SPRITE_URL}.gif").status_code == 404
+    assert client.get("/api/streams/kanyo-harvard/days/20260114/sprite").status_code == 400
+    assert client.get("/api/streams/nonexistent/days/2026-01-14/sprite").status_code == 404
@@ -0,0 +1,302 @@
+"""Tests for app.timezone_lookup against a local stand-in geolocation server."""
+import asyncio
+import ipaddress
+import json
+import threading
+import time
+from contextlib import asynccontextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app import timezone_lookup, upstream
+from app.main import app
+from app.timezone_lookup import Provider, TimezoneLookup, parse_json, parse_text
+
+
+class GeoServer:
+    """Answers like ipapi.co (/ipapi/<ip>/timezone/) and geojs.io (/geojs/<ip>.json).
+
+    modes[provider] is "ok", "unknown", "error" (HTTP 503) or "slow" (answers
+    after delay seconds).
+    """
+
+    def __init__(self, zones):
+        self.zones = zones
+        self.modes = {"ipapi": "ok", "geojs": "ok"}
+        self.delay = 1.0
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                provider, _, rest = self.path.lstrip("/").partition("/")
+                ip = rest.split("/")[0].removesuffix(".json")
+                server.requests.append((provider, ip))
+                mode = server.modes[provider]
+                if mode == "slow":
+                    time.sleep(server.delay)
+                if mode == "error":
+                    self.respond(503, b"unavailable", "text/plain")
+                elif provider == "ipapi":
+                    zone = server.zones.get(ip) if mode != "unknown" else None
+                    self.respond(200, (zone or "Undefined").encode(), "text/plain")
+                else:
+                    zone = server.zones.get(ip) if mode != "unknown" else None
+                    body = json.dumps({"ip": ip, "timezone": zone}).encode()
+                    self.respond(200, body, "application/json")
+
+            def respond(self, status, body, content_type):
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", content_type)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except OSError:
+                    pass  # the client gave up (timeout tests)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(
+            target=self.httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+        self.thread.start()
+
+    def providers(self, timeout=0.3, failure_threshold=2, cooldown_seconds=60.0):
+        return [
+            Provider(
+                "ipapi",
+                self.url + "/ipapi/{ip}/timezone/",
+                parse_text,
+                timeout,
+                failure_threshold,
+                cooldown_seconds,
+            ),
+            Provider(
+                "geojs",
+                self.url + "/geojs/{ip}.json",
+                parse_json,
+                timeout,
+                failure_threshold,
+                cooldown_seconds,
+            ),
+        ]
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+ZONES = {
+    "1.2.3.4": "Europe/London",
+    "1.2.3.5": "Europe/London",
+    "5.6.7.8": "Asia/Tokyo",
+    "9.9.9.9": "America/Denver",
+    "2a02:1::1": "Europe/Berlin",
+}
+
+
+@pytest.fixture
+def geo_server():
+    server = GeoServer(ZONES)
+    yield server
+    server.close()
+
+
+@asynccontextmanager
+async def local_client(monkeypatch):
+    """The shared upstream client, bypassing any configured proxies."""
+    async with httpx.AsyncClient(trust_env=False) as client:
+        monkeypatch.setattr(upstream, "_client", client)
+        yield client
+
+
+def _lookup(server, **kwargs):
+    breaker_options = ("timeout", "failure_threshold", "cooldown_seconds")
+    breaker = {name: kwargs.pop(name) for name in breaker_options if name in kwargs}
+    options = {"max_entries": 100, "ttl_seconds": 60.0, "negative_ttl_seconds": 60.0}
+    options.update(kwargs)
+    return TimezoneLookup(server.providers(**breaker), **options)
+
+
+def ip(value):
+    return ipaddress.ip_address(value)
+
+
+async def test_answers_are_cached_per_prefix(geo_server, monkeypatch):
+    lookup = _lookup(geo_server)
+    async with local_client(monkeypatch):
+        assert await lookup.lookup(ip("1.2.3.4")) == "Europe/London"
+        # Same /24: answered from the cache
+        assert await lookup.lookup(ip("1.2.3.5")) == "Europe/London"
+        assert await lookup.lookup(ip("2a02:1::1")) == "Europe/Berlin"
+        assert await lookup.lookup(ip("2a02:1:0:ffff::2")) == "Europe/Berlin"
+    assert geo_server.requests == [("ipapi", "1.2.3.4"), ("ipapi", "2a02:1::1")]
+    stats = lookup.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 2, 2)
+    assert stats["providers"]["ipapi"]["calls"] == 2
+    assert stats["providers"]["ipapi"]["latency_ms_avg"] > 0
+
+
+async def test_per_address_keys(geo_server, monkeypatch):
+    lookup = _lookup(geo_server, by_prefix=False)
+    async with local_client(monkeypatch):
+        await lookup.lookup(ip("1.2.3.4"))
+        await lookup.lookup(ip("1.2.3.5"))
+        await lookup.lookup(ip("1.2.3.5"))
+    assert len(geo_server.requests) == 2
+    assert lookup.stats()["hits"] == 1
+
+
+async def test_concurrent_lookups_share_one_request(geo_server, monkeypatch):
+    lookup = _lookup(geo_server)
+    async with local_client(monkeypatch):
+        results = await asyncio.gather(*(lookup.lookup(ip("5.6.7.8")) for _ in range(5)))
+    assert results == ["Asia/Tokyo"] * 5
+    assert geo_server.requests == [("ipapi", "5.6.7.8")]
+    assert lookup.stats()["coalesced"] == 4
+
+
+async def test_falls_back_to_next_provider(geo_server, monkeypatch):
+    geo_server.modes["ipapi"] = "error"
+    lookup = _lookup(geo_server)
+    async with local_client(monkeypatch):
+        assert await lookup.lookup(ip("9.9.9.9")) == "America/Denver"
+    assert [provider for provider, _ in geo_server.requests] == ["ipapi", "geojs"]
+    assert lookup.stats()["providers"]["ipapi"]["failures"] == 1
+
+
+async def test_failures_are_cached_briefly(geo_server, monkeypatch):
+    geo_server.modes = {"ipapi": "unknown", "geojs": "error"}
+    lookup = _lookup(geo_server, negative_ttl_seconds=0.2)
+    async with local_client(monkeypatch):
+        assert await lookup.lookup(ip("1.2.3.4")) is None
+        assert await lookup.lookup(ip("1.2.3.4")) is None
+        assert len(geo_server.requests) == 2
+        assert lookup.stats()["negative_hits"] == 1
+
+        await asyncio.sleep(0.25)
+        geo_server.modes["ipapi"] = "ok"
+        assert await lookup.lookup(ip("1.2.3.4")) == "Europe/London"
+    assert lookup.stats()["expired"] == 1
+
+
+async def test_lru_evicts_beyond_max_entries(geo_server, monkeypatch):
+    lookup = _lookup(geo_server, max_entries=2)
+    async with local_client(monkeypatch):
+        await lookup.lookup(ip("1.2.3.4"))
+        await lookup.lookup(ip("5.6.7.8"))
+        await lookup.lookup(ip("1.2.3.4"))  # most recently used
+        await lookup.lookup(ip("9.9.9.9"))
+        await lookup.lookup(ip("1.2.3.4"))
+        await lookup.lookup(ip("5.6.7.8"))
+    assert [addr for _, addr in geo_server.requests] == [
+        "1.2.3.4",
+        "5.6.7.8",
+        "9.9.9.9",
+        "5.6.7.8",
+    ]
+    assert lookup.stats()["evictions"] == 2
+
+
+async def test_circuit_breaker_skips_a_timing_out_provider(geo_server, monkeypatch):
+    geo_server.modes["ipapi"] = "slow"
+    lookup = _lookup(geo_server, timeout=0.1, failure_threshold=2, cooldown_seconds=0.5)
+    ipapi = lookup.providers[0]
+    async with local_client(monkeypatch):
+        assert await lookup.lookup(ip("1.2.3.4")) == "Europe/London"
+        assert await lookup.lookup(ip("5.6.7.8")) == "Asia/Tokyo"
+        assert ipapi.state == "open"
+
+        # Open: answered by geojs alone, without waiting for ipapi to time out
+        start = time.monotonic()
+        assert await lookup.lookup(ip("9.9.9.9")) == "America/Denver"
+        assert time.monotonic() - start < 0.1
+        assert geo_server.requests[-1] == ("geojs", "9.9.9.9")
+
+        # After the cooldown one trial request goes through; success closes the breaker
+        await asyncio.sleep(0.55)
+        geo_server.modes["ipapi"] = "ok"
+        assert ipapi.state == "half-open"
+        assert await lookup.lookup(ip("2a02:1::1")) == "Europe/Berlin"
+        assert geo_server.requests[-1] == ("ipapi", "2a02:1::1")
+    stats = lookup.stats()["providers"]["ipapi"]
+    assert stats["state"] == "closed"
+    assert (stats["timeouts"], stats["trips"], stats["skipped"]) == (2, 1, 1)
+
+
+async def test_failed_trial_reopens_the_breaker(geo_server, monkeypatch):
+    geo_server.modes["ipapi"] = "error"
+    lookup = _lookup(geo_server, failure_threshold=1, cooldown_seconds=0.2)
+    ipapi = lookup.providers[0]
+    async with local_client(monkeypatch):
+        await lookup.lookup(ip("1.2.3.4"))
+        assert ipapi.state == "open"
+        await asyncio.sleep(0.25)
+        await lookup.lookup(ip("5.6.7.8"))
+        assert ipapi.state == "open"
+    assert [p for p, _ in geo_server.requests] == ["ipapi", "geojs", "ipapi", "geojs"]
+
+
+async def test_cancelled_trial_frees_the_trial_slot(geo_server, monkeypatch):
+    geo_server.modes["ipapi"] = "error"
+    lookup = _lookup(geo_server, failure_threshold=1, cooldown_seconds=0.2)
+    ipapi = lookup.providers[0]
+    async with local_client(monkeypatch) as client:
+        await lookup.lookup(ip("1.2.3.4"))
+        await asyncio.sleep(0.25)
+        geo_server.modes["ipapi"] = "slow"
+        assert ipapi.allow()
+        trial = asyncio.ensure_future(ipapi.lookup(client, "5.6.7.8"))
+        await asyncio.sleep(0.05)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+        # Still half-open, and the next request may be the trial
+        geo_server.modes["ipapi"] = "ok"
+        assert ipapi.state == "half-open"
+        assert await lookup.lookup(ip("9.9.9.9")) == "America/Denver"
+        assert geo_server.requests[-1] == ("ipapi", "9.9.9.9")
+    assert ipapi.state == "closed"
+
+
+async def test_nothing_cached_when_every_breaker_is_open(geo_server, monkeypatch):
+    geo_server.modes = {"ipapi": "error", "geojs": "error"}
+    lookup = _lookup(geo_server, failure_threshold=1)
+    async with local_client(monkeypatch):
+        assert await lookup.lookup(ip("1.2.3.4")) is None
+        assert await lookup.lookup(ip("5.6.7.8")) is None
+    assert len(geo_server.requests) == 2
+    assert lookup.stats()["entries"] == 1
+
+
+def test_visitor_endpoint_uses_cached_online_lookup(geo_server, monkeypatch, tmp_path):
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "GEOIP_DB", tmp_path / "missing.bin")
+    monkeypatch.setattr(settings, "VISITOR_TZ_ONLINE_FALLBACK", True)
+    monkeypatch.setitem(
+        timezone_lookup.PROVIDERS,
+        "ipapi",
+        (geo_server.url + "/ipapi/{ip}/timezone/", parse_text),
+    )
+    monkeypatch.setitem(
+        timezone_lookup.PROVIDERS, "geojs", (geo_server.url + "/geojs/{ip}.json", parse_json)
+    )
+    monkeypatch.setattr(upstream, "_client", None)
+
+    with TestClient(app) as client:
+        for forwarded in ("1.2.3.4", "1.2.3.5"):
+            response = client.get("/api/visitor/timezone", headers={"X-Forwarded-For": forwarded})
+            assert response.json()["timezone"] == "Europe/London"
+        health = client.get("/health").json()["caches"]["visitor_timezones"]
+    assert len(geo_server.requests) == 1
+    assert (health["hits"], health["misses"]) == (1, 1)
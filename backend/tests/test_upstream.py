@@ -0,0 +1,34 @@
+"""Tests for the shared upstream HTTP client."""
+from fastapi.testclient import TestClient
+from app.main import app
+from app import upstream
+from app.config import settings
+
+
+def test_get_client_reuses_instance():
+    """Every caller gets the same pooled client."""
+    assert upstream.get_client() is upstream.get_client()
+
+
+def test_client_uses_configured_pool_limits(monkeypatch):
+    monkeypatch.setattr(settings, "UPSTREAM_MAX_CONNECTIONS", 7)
+    monkeypatch.setattr(settings, "UPSTREAM_MAX_KEEPALIVE", 3)
+    monkeypatch.setattr(settings, "UPSTREAM_KEEPALIVE_EXPIRY", 12.5)
+
+    client = upstream.create_client()
+    pool = client._transport._pool
+    assert pool._max_connections == 7
+    assert pool._max_keepalive_connections == 3
+    assert pool._keepalive_expiry == 12.5
+
+
+def test_lifespan_opens_and_closes_client(override_streams_config):
+    """The app lifespan owns the client: open while serving, closed on shutdown."""
+    with TestClient(app) as client:
+        shared = upstream._client
+        assert shared is not None and not shared.is_closed
+        client.get("/health")
+        assert upstream._client is shared
+
+    assert shared.is_closed
+    assert upstream._client is None
@@ -1,22 +1,50 @@
 """Tests for visitor timezone detection."""
-from unittest.mock import Mock, patch
+import httpx
+import pytest
 from fastapi.testclient import TestClient
 from app.main import app
+from app.geoip import build_table
 from app.routers.visitor import detect_timezone_from_ip
 
 
 client = TestClient(app)
 
 
-def test_visitor_timezone_detection():
+@pytest.fixture
+def geoip_db(tmp_path, monkeypatch):
+    """A local IP range table, with the online fallback switched off."""
+    from app.config import settings
+
+    path = tmp_path / "ip-timezones.bin"
+    path.write_bytes(
+        build_table(
+            [
+                ("8.8.8.0", "8.8.8.255", "America/Los_Angeles"),
+                ("2001:4860::", "2001:4860:ffff:ffff:ffff:ffff:ffff:ffff", "America/Chicago"),
+            ]
+        )
+    )
+    monkeypatch.setattr(settings, "GEOIP_DB", path)
+    monkeypatch.setattr(settings, "VISITOR_TZ_ONLINE_FALLBACK", False)
+    return path
+
+
+def test_visitor_timezone_detection(geoip_db):
     """Test timezone detection from IP."""
-    # Mock a real IP (not localhost)
     response = client.get("/api/visitor/timezone", headers={"X-Forwarded-For": "8.8.8.8"})
     assert response.status_code == 200
 
     data = response.json()
-    # May return timezone or null depending on API availability
-    assert "timezone" in data or "error" in data
+    assert data == {"ip": "8.8.8.8", "timezone": "America/Los_Angeles", "detected": True}
+
+
+async def test_detect_timezone_from_local_table(geoip_db, mock_upstream):
+    """Addresses in the table are answered without any network request."""
+    requests = mock_upstream(lambda request: httpx.Response(500))
+    assert await detect_timezone_from_ip("2001:4860:4860::8888") == "America/Chicago"
+    assert await detect_timezone_from_ip("::ffff:8.8.8.8") == "America/Los_Angeles"
+    assert await detect_timezone_from_ip("1.2.3.4") is None
+    assert requests == []
 
 
 def test_visitor_timezone_localhost():
@@ -37,46 +65,58 @@ def test_visitor_timezone_x_real_ip():
     assert response.json()["timezone"] is None
 
 
-def test_detect_timezone_from_ip_private():
+async def test_detect_timezone_from_ip_private():
     """Private IPs return None without making API calls."""
-    assert detect_timezone_from_ip("127.0.0.1") is None
-    assert detect_timezone_from_ip("192.168.1.1") is None
-    assert detect_timezone_from_ip("10.0.0.1") is None
-    assert detect_timezone_from_ip("unknown") is None
+    assert await detect_timezone_from_ip("127.0.0.1") is None
+    assert await detect_timezone_from_ip("192.168.1.1") is None
+    assert await detect_timezone_from_ip("10.0.0.1") is None
+    assert await detect_timezone_from_ip("172.16.0.1") is None
+    assert await detect_timezone_from_ip("::1") is None
+    assert await detect_timezone_from_ip("unknown") is None
 
 
-def test_detect_timezone_from_ip_ipapi_success():
-    """detect_timezone_from_ip returns timezone from ipapi.co."""
-    mock_response = Mock()
-    mock_response.status_code = 200
-    mock_response.text = "America/New_York"
+async def test_detect_timezone_from_ip_ipapi_success(geoip_db, mock_upstream, monkeypatch):
+    """Addresses missing from the table fall back to ipapi.co."""
+    from app.config import settings
 
-    with patch("app.routers.visitor.requests.get", return_value=mock_response):
-        result = detect_timezone_from_ip("8.8.8.8")
+    monkeypatch.setattr(settings, "VISITOR_TZ_ONLINE_FALLBACK", True)
+    requests = mock_upstream(lambda request: httpx.Response(200, text="America/New_York\n"))
+    assert await detect_timezone_from_ip("1.2.3.4") == "America/New_York"
+    assert [r.url.host for r in requests] == ["ipapi.co"]
 
-    assert result == "America/New_York"
+    # Found locally: the APIs aren't asked
+    assert await detect_timezone_from_ip("8.8.8.8") == "America/Los_Angeles"
+    assert len(requests) == 1
 
 
-def test_detect_timezone_from_ip_ipapi_fails_geojs_succeeds():
+async def test_detect_timezone_from_ip_ipapi_fails_geojs_succeeds(
+    geoip_db, mock_upstream, monkeypatch
+):
     """Falls back to geojs.io when ipapi.co fails."""
+    from app.config import settings
 
-    def side_effect(url, timeout):
-        if "ipapi.co" in url:
-            raise Exception("timeout")
-        mock = Mock()
-        mock.status_code = 200
-        mock.json.return_value = {"timezone": "Europe/London"}
-        return mock
-
-    with patch("app.routers.visitor.requests.get", side_effect=side_effect):
-        result = detect_timezone_from_ip("1.2.3.4")
+    def handler(request):
+        if request.url.host == "ipapi.co":
+            raise httpx.ConnectTimeout("timeout", request=request)
+        return httpx.Response(200, json={"timezone": "Europe/London"})
 
-    assert result == "Europe/London"
+    monkeypatch.setattr(settings, "VISITOR_TZ_ONLINE_FALLBACK", True)
+    mock_upstream(handler)
+    assert await detect_timezone_from_ip("1.2.3.4") == "Europe/London"
 
 
-def test_detect_timezone_from_ip_both_fail():
+async def test_detect_timezone_from_ip_both_fail(geoip_db, mock_upstream, monkeypatch):
     """Returns None when both APIs fail."""
-    with patch("app.routers.visitor.requests.get", side_effect=Exception("error")):
-        result = detect_timezone_from_ip("1.2.3.4")
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "VISITOR_TZ_ONLINE_FALLBACK", True)
+    requests = mock_upstream(lambda request: httpx.Response(429, text="rate limited"))
+    assert await detect_timezone_from_ip("1.2.3.4") is None
+    assert len(requests) == 2
+
 
-    assert result is None
+async def test_online_fallback_can_be_disabled(geoip_db, mock_upstream):
+    """With the fallback off, only the local table is used."""
+    requests = mock_upstream(lambda request: httpx.Response(200, text="America/New_York"))
+    assert await detect_timezone_from_ip("1.2.3.4") is None
+    assert requests == []
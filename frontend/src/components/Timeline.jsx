@@ -16,6 +16,33 @@ export default function Timeline({
   const [isTransitioning, setIsTransitioning] = useState(false);
   const [slideDirection, setSlideDirection] = useState('none');
   const [startHour, setStartHour] = useState(0); // 0 for 12 AM, 12 for 12 PM
+  const [sprite, setSprite] = useState(null);
+
+  // One sprite sheet per day instead of one thumbnail request per event.
+  // Refetched when events change; unchanged layouts are a cheap 304.
+  useEffect(() => {
+    if (!streamId || !selectedDate) return;
+    let cancelled = false;
+    api.getDaySprite(streamId, selectedDate)
+      .then((data) => { if (!cancelled) setSprite(data.version ? data : null); })
+      .catch(() => { if (!cancelled) setSprite(null); });
+    return () => { cancelled = true; };
+  }, [streamId, selectedDate, events]);
+
+  // Background styles that show one sprite tile like an object-cover image
+  const spriteTileStyle = (eventId) => {
+    const tile = sprite?.tiles[eventId];
+    if (!tile || sprite.date !== selectedDate) return null;
+    const col = tile.x / sprite.tile_width;
+    const row = tile.y / sprite.tile_height;
+    return {
+      backgroundImage: `url(${api.getDaySpriteUrl(streamId, sprite.date, sprite.version)})`,
+      backgroundSize: `${sprite.columns * 100}% ${sprite.rows * 100}%`,
+      backgroundPosition: `${sprite.columns > 1 ? (col / (sprite.columns - 1)) * 100 : 0}% ${
+        sprite.rows > 1 ? (row / (sprite.rows - 1)) * 100 : 0
+      }%`,
+    };
+  };
 
   // Auto-scroll to selected event
   useEffect(() => {
@@ -297,6 +324,7 @@ export default function Timeline({
               }
 
               const isSelected = selectedEvent?.event_id === event.event_id;
+              const tileStyle = spriteTileStyle(event.event_id);
 
               return (
                 <button
@@ -317,10 +345,18 @@ export default function Timeline({
                     zIndex: isSelected ? 20 : index + 1,
                   }}
                 >
-                  {/* Thumbnail with fallback */}
-                  {event.thumbnail ? (
+                  {/* Thumbnail from the day's sprite sheet, else its own image with fallback */}
+                  {tileStyle ? (
+                    <div
+                      className="absolute top-1/2 left-1/2 -translate-x-1/2 -translate-y-1/2 aspect-video"
+                      style={{ width: 'max(100%, 5.34rem)', ...tileStyle }}
+                    />
+                  ) : event.thumbnail ? (
                     <img
-                      src={api.getClipUrl(streamId, selectedDate, event.thumbnail)}
+                      src={api.getThumbnailUrl(streamId, selectedDate, event.thumbnail, 160)}
+                      srcSet={`${api.getThumbnailUrl(streamId, selectedDate, event.thumbnail, 160)} 1x, ${api.getThumbnailUrl(streamId, selectedDate, event.thumbnail, 320)} 2x`}
+                      loading="lazy"
+                      decoding="async"
                       alt=""
                       className="w-full h-full object-cover"
                       onError={(e) => {
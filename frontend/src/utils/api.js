@@ -53,6 +53,22 @@ export const api = {
     return response.json();
   },
 
+  /**
+   * Get the day's sprite sheet layout (event_id -> tile offset)
+   */
+  async getDaySprite(streamId, date) {
+    const response = await fetch(`${API_BASE}/streams/${streamId}/days/${date}/sprite`);
+    if (!response.ok) throw new Error('Failed to fetch day sprite');
+    return response.json();
+  },
+
+  /**
+   * Get URL of the day's sprite sheet image for a layout version
+   */
+  getDaySpriteUrl(streamId, date, version) {
+    return `${API_BASE}/streams/${streamId}/days/${date}/sprite.webp?v=${version}`;
+  },
+
   /**
    * Detect visitor timezone from IP
    */
@@ -72,5 +88,13 @@ export const api = {
    */
   getClipUrl(streamId, date, filename) {
     return `${API_BASE}/clips/${streamId}/${date}/${filename}`;
+  },
+
+  /**
+   * Get URL of a frame resized to `width` px (snapped to 160/320/640) as WebP
+   */
+  getThumbnailUrl(streamId, date, filename, width = 160) {
+    const name = filename.replace(/\.jpg$/, '.webp');
+    return `${API_BASE}/clips/${streamId}/${date}/thumbnails/${width}/${name}`;
   }
 };